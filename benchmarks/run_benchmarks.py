@@ -0,0 +1,364 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from statistics import median
+from tests import baseline_merge_solr
+from tests.fake_solr import FakeSolr
+from tests.synthetic import COLLECTIONS, generate_articles, generate_solr_documents
+
+import generate_dedup_keys
+import merge_solr
+
+from utils import string_processor
+from utils.field_cleaner import disable_cache
+from utils.raw_document import RawArticle
+from utils.solr_client import PooledSolr
+from xylose.scielodocument import Article
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def measure(function, items, repeat=3, setup=None):
+    """
+    Executa function repeat vezes e registra os tempos.
+
+    :param function: Funçao medida (sem argumentos)
+    :param items: Quantidade de itens processados por execuçao
+    :param repeat: Quantidade de execuçoes
+    :param setup: Funçao executada antes de cada execuçao, fora da mediçao (opcional)
+    :return: Dicionario com o melhor tempo, o tempo mediano e a vazao (itens por segundo) no melhor tempo
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    best = min(times)
+    return {'items': items,
+            'repeat': repeat,
+            'best_seconds': best,
+            'median_seconds': median(times),
+            'items_per_second': items / best if best else None}
+
+
+@contextmanager
+def quiet(directory=None):
+    """
+    Suprime a saida padrao e, opcionalmente, executa o bloco em directory (os scripts gravam arquivos no diretorio
+    corrente).
+    """
+    cwd = os.getcwd()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        if directory:
+            os.chdir(directory)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+def get_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_micro_benchmarks(documents, solr_docs, repeat):
+    """
+    Mede as funçoes de limpeza, extraçao, hash e conversao de chaves e a mesclagem de grupos em memoria.
+
+    :param documents: Documentos citantes sinteticos
+    :param solr_docs: Documentos Solr correspondentes
+    :param repeat: Quantidade de execuçoes de cada mediçao
+    :return: Dicionario composto pelos pares nome: resultado de measure
+    """
+    results = {}
+
+    disable_cache()
+    generate_dedup_keys.citation_types = {'article', 'book'}
+
+    citations = [c for d in documents for c in d.get('citations', [])]
+    titles = [c[f][0]['_'] for c in citations for f in ('v12', 'v18') if f in c]
+    authors = [a['s'] + ' ' + a.get('n', '') for c in citations for f in ('v10', 'v16') for a in c.get(f, [])]
+    journals = [c['v30'][0]['_'] for c in citations if 'v30' in c]
+
+    results['string_processor.preprocess_default'] = measure(
+        lambda: [string_processor.preprocess_default(t) for t in titles], len(titles), repeat)
+    results['string_processor.preprocess_default_batch'] = measure(
+        lambda: [string_processor.preprocess_default_batch(titles[i:i + 100]) for i in range(0, len(titles), 100)], len(titles), repeat)
+    results['string_processor.preprocess_author_name'] = measure(
+        lambda: [string_processor.preprocess_author_name(a) for a in authors], len(authors), repeat)
+    results['string_processor.preprocess_journal_title'] = measure(
+        lambda: [string_processor.preprocess_journal_title(j) for j in journals], len(journals), repeat)
+
+    results['extract_citations_ids_keys (xylose)'] = measure(
+        lambda: [generate_dedup_keys.extract_citations_ids_keys(Article(d), {}) for d in documents], len(citations), repeat)
+    results['extract_citations_ids_keys (raw)'] = measure(
+        lambda: [generate_dedup_keys.extract_citations_ids_keys(RawArticle(d), {}) for d in documents], len(citations), repeat)
+
+    # hash_keys foi substituida pelo calculo dos hashes de todas as bases de uma citaçao (SchemaHasher.hash)
+    cits_data = [(c.publication_type, generate_dedup_keys.extract_citation_data(c))
+                 for d in documents for c in RawArticle(d).citations or [] if c.publication_type in generate_dedup_keys.hashers]
+    results['SchemaHasher.hash'] = measure(
+        lambda: [generate_dedup_keys.hashers[t].hash(cit_data) for t, cit_data in cits_data], len(cits_data), repeat)
+
+    data = [('-'.join([d.publisher_id, d.collection_acronym]), generate_dedup_keys.extract_citations_ids_keys(d, {}))
+            for d in (RawArticle(d) for d in documents)]
+    results['convert_to_mongodoc'] = measure(
+        lambda: generate_dedup_keys.convert_to_mongodoc(data), sum(len(keys) for _, keys in data), repeat)
+
+    solr_index = {d['id']: d for d in solr_docs}
+    clusters = [(dc, [solr_index[i] for i in dc['cit_full_ids']])
+                for base, mgdocs in generate_dedup_keys.convert_to_mongodoc(data).items()
+                for dc in mgdocs.values() if len(dc['cit_full_ids']) > 1]
+    results['merge_solr.merge_cluster'] = measure(
+        lambda: [merge_solr.merge_cluster(dc, docs, merge_solr.CROSS_BASE_NAME) for dc, docs in clusters], len(clusters), repeat)
+
+    # Em grupos grandes, a mesclagem original (tests/baseline_merge_solr.py) e quadratica na quantidade de membros
+    for size in (1000, 5000):
+        cluster = generate_large_cluster(size)
+        first = dict(cluster[0])
+
+        def restore_first():
+            # A mesclagem original estende as listas do primeiro documento
+            cluster[0] = {k: list(v) if isinstance(v, list) else v for k, v in first.items()}
+
+        results['merge_solr.merge_cluster (%d members)' % size] = measure(
+            lambda: merge_solr.merge_cluster({}, cluster, merge_solr.CROSS_BASE_NAME), size, repeat, restore_first)
+        results['baseline merge_cluster (%d members)' % size] = measure(
+            lambda: baseline_merge_solr.merge_cluster({}, cluster, merge_solr.CROSS_BASE_NAME), size, repeat, restore_first)
+
+    return results
+
+
+def generate_large_cluster(size, seed=1):
+    """
+    Gera os documentos Solr de um grupo de size citaçoes duplicadas, citadas por documentos de varias coleçoes.
+
+    :param size: Quantidade de citaçoes do grupo
+    :param seed: Semente do gerador
+    :return: Lista de documentos Solr de citaçao
+    """
+    r = random.Random(seed)
+
+    cluster = []
+    for i in range(size):
+        citation = {'id': 'c%d' % i,
+                    'entity': 'citation',
+                    'document_fk': ['d%d' % r.randrange(3 * size) for _ in range(r.randint(1, 3))],
+                    'in': [r.choice(COLLECTIONS)],
+                    'total_received': '1'}
+        if r.random() < 0.5:
+            citation['document_fk_au'] = ['a%d' % r.randrange(3 * size)]
+        cluster.append(citation)
+
+    return cluster
+
+
+def run_end_to_end_benchmarks(documents, solr_docs, repeat, latency=0.0):
+    """
+    Executa generate_dedup_keys.py sobre um Mongo local em memoria (mongomock) e, em seguida, merge_solr.py sobre os
+    grupos gerados e um Solr local (FakeSolr).
+    A escrita incremental (upserts) nas coleçoes de de-duplicaçao nao e medida: no mongomock, cada upsert percorre a
+    coleçao, e esse custo dominaria a mediçao. As chaves sao gravadas com --rebuild ou em arquivos (--output_dir).
+
+    :param documents: Documentos citantes sinteticos
+    :param solr_docs: Documentos Solr correspondentes
+    :param repeat: Quantidade de execuçoes de cada mediçao
+    :param latency: Atraso, em segundos, de cada requisiçao ao Solr local
+    :return: Dicionario composto pelos pares nome: resultado de measure
+    """
+    results = {}
+
+    client = mongomock.MongoClient()
+    client[generate_dedup_keys.MONGO_DB_ARTICLES][generate_dedup_keys.MONGO_COLLECTION_ARTICLES].insert_many(documents)
+
+    def drop_dedup_collections():
+        db = client[generate_dedup_keys.MONGO_DB_SEARCH_SCIELO]
+        for name in db.list_collection_names():
+            if name.startswith(generate_dedup_keys.MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX):
+                db.drop_collection(name)
+
+    def generate_keys(args):
+        generate_dedup_keys.dedup_writer = None
+        generate_dedup_keys.keys_writer = None
+        sys.argv = ['generate_dedup_keys.py', '-a', '-b'] + args
+        with quiet():
+            generate_dedup_keys.main()
+
+    mongo_client = generate_dedup_keys.MongoClient
+    argv = sys.argv
+    generate_dedup_keys.MongoClient = lambda *args, **kwargs: client
+    try:
+        # A ultima execuçao deixa as coleçoes de de-duplicaçao usadas na mesclagem
+        for name, args in [('generate_dedup_keys (stream, output_dir)', ['--stream', '--output_dir', tempfile.mkdtemp()]),
+                           ('generate_dedup_keys (chunks, rebuild)', ['--rebuild']),
+                           ('generate_dedup_keys (stream, rebuild, raw extractor)', ['--stream', '--rebuild', '--raw_extractor']),
+                           ('generate_dedup_keys (stream, rebuild)', ['--stream', '--rebuild'])]:
+            results[name] = measure(lambda: generate_keys(args), len(documents), repeat, setup=drop_dedup_collections)
+    finally:
+        generate_dedup_keys.MongoClient = mongo_client
+        sys.argv = argv
+
+    plan = merge_solr.build_merge_plan(client, merge_solr.BASES)
+    state = {}
+
+    def start_solr():
+        if state.get('solr'):
+            state['solr'].stop()
+        state['solr'] = FakeSolr(solr_docs, latency).start()
+
+    def merge(max_inflight):
+        solr = PooledSolr(state['solr'].url, timeout=100, pool_size=2 * max_inflight)
+        try:
+            with quiet(tempfile.mkdtemp()):
+                merge_solr.merge_citations(solr, plan, merge_solr.CROSS_BASE_NAME,
+                                           max_inflight_selects=max_inflight, max_inflight_updates=max_inflight)
+        finally:
+            solr.close()
+
+    try:
+        for max_inflight in (1, 4):
+            name = 'merge_solr.merge_citations (%d in flight)' % max_inflight
+            results[name] = measure(lambda: merge(max_inflight), len(plan), repeat, setup=start_solr)
+            results[name]['solr_requests'] = dict(state['solr'].requests)
+    finally:
+        state['solr'].stop()
+
+    return results
+
+
+def compare(results, previous):
+    """
+    Imprime a razao entre a vazao de cada mediçao e a da execuçao anterior.
+    """
+    for name, result in sorted(results['benchmarks'].items()):
+        old = previous.get('benchmarks', {}).get(name)
+        if old and old.get('items_per_second') and result.get('items_per_second'):
+            print('%-50s %8.2fx' % (name, result['items_per_second'] / old['items_per_second']))
+
+
+def main():
+    usage = 'Mede, sobre um corpus sintetico reprodutivel, o desempenho das etapas de geraçao de chaves e de ' \
+            'mesclagem e grava os resultados em JSON'
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '--docs',
+        default='500',
+        help='Quantidade de documentos citantes do corpus sintetico (padrao: 500)'
+    )
+
+    parser.add_argument(
+        '--seed',
+        default='1',
+        help='Semente do corpus sintetico (padrao: 1)'
+    )
+
+    parser.add_argument(
+        '--duplication_rate',
+        default='0.3',
+        help='Probabilidade de uma citaçao referir uma obra ja citada (padrao: 0.3)'
+    )
+
+    parser.add_argument(
+        '--repeat',
+        default='3',
+        help='Quantidade de execuçoes de cada mediçao; o melhor tempo e usado na vazao (padrao: 3)'
+    )
+
+    parser.add_argument(
+        '--solr_latency',
+        default='0',
+        help='Atraso, em milissegundos, de cada requisiçao ao Solr local (padrao: 0)'
+    )
+
+    parser.add_argument(
+        '--only',
+        choices=['micro', 'e2e'],
+        default=None,
+        help='Executa apenas os micro-benchmarks ou apenas as execuçoes de ponta a ponta'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        default=None,
+        help='Arquivo JSON de resultados (padrao: benchmark-<data>.json)'
+    )
+
+    parser.add_argument(
+        '--compare',
+        default=None,
+        help='Arquivo JSON de uma execuçao anterior, com o qual a vazao de cada mediçao e comparada'
+    )
+
+    args = parser.parse_args()
+
+    docs = int(args.docs) if args.docs.isdigit() and int(args.docs) > 0 else 500
+    seed = int(args.seed) if args.seed.isdigit() else 1
+    repeat = int(args.repeat) if args.repeat.isdigit() and int(args.repeat) > 0 else 3
+    latency = int(args.solr_latency) / 1000 if args.solr_latency.isdigit() else 0.0
+    duplication_rate = float(args.duplication_rate)
+
+    print('[1] Generating %d documents (seed %d)...' % (docs, seed))
+    documents = generate_articles(docs, seed, duplication_rate=duplication_rate)
+    solr_docs = generate_solr_documents(documents)
+
+    results = {'revision': get_revision(),
+               'date': datetime.now().isoformat(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'cpu_count': os.cpu_count(),
+               'params': {'docs': docs,
+                          'citations': sum(len(d.get('citations', [])) for d in documents),
+                          'seed': seed,
+                          'duplication_rate': duplication_rate,
+                          'repeat': repeat,
+                          'solr_latency': latency},
+               'benchmarks': {}}
+
+    if args.only != 'e2e':
+        print('[2] Running micro-benchmarks...')
+        results['benchmarks'].update(run_micro_benchmarks(documents, solr_docs, repeat))
+
+    if args.only != 'micro':
+        if mongomock is None:
+            print('[3] Skipping end-to-end benchmarks (mongomock is not installed)')
+        else:
+            print('[3] Running end-to-end benchmarks...')
+            results['benchmarks'].update(run_end_to_end_benchmarks(documents, solr_docs, repeat, latency))
+
+    for name, result in sorted(results['benchmarks'].items()):
+        print('%-50s %12.1f items/s %10.3f s' % (name, result['items_per_second'] or 0, result['best_seconds']))
+
+    output = args.output or 'benchmark-%s.json' % datetime.now().strftime('%Y-%m-%d-%H%M%S')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print('Results written to %s' % output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,27 @@
 import argparse
+import json
+import logging
 import os
+import random
 import textwrap
+import threading
 import time
 
+from collections import namedtuple
 from datetime import datetime
-from hashlib import sha3_224
 from multiprocessing import Pool
-from pymongo import MongoClient, UpdateOne
-from utils.field_cleaner import get_cleaned_default, get_cleaned_publication_date, get_cleaned_first_author_name, get_cleaned_journal_title
+from queue import Queue
+from pymongo import MongoClient
+from utils.checkpoint import FileStateStore, MongoStateStore, RunCheckpoint
+from utils.dump_files import KeysFileWriter, decode_raw_record, find_keys_files, get_dump_format, get_shard, iter_raw_records, read_keys_file
+from utils.keys_aggregator import KeysAggregator
+from utils.hashing import SchemaHasher
+from utils.field_cleaner import enable_cache, get_cache_stats, get_cleaned_default, get_cleaned_publication_date, get_cleaned_first_author_name, get_cleaned_journal_title
+from utils.metrics import Metrics, MetricsReporter
+from utils.mongo_writer import DedupCollectionsWriter
+from utils.profiling import ProfileAggregator, profile_call
+from utils.raw_document import RawArticle
+from utils.standardizer import StandardizedCitations, StandardizedCitationsSnapshot, export_snapshot, get_snapshot_age
 from xylose.scielodocument import Article, Citation
 
 
@@ -17,9 +31,12 @@ MONGO_DB_SEARCH_SCIELO = os.environ.get('MONGO_DB_SEARCH_SCIELO', 'citations')
 
 MONGO_COLLECTION_STANDARDIZED_CITATIONS = os.environ.get('MONGO_COLLECTION_STANDARDIZED_CITATIONS', 'standardized')
 MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX = os.environ.get('MONGO_DEDUP_COLLECTION_PREFIX', 'dedup-')
+MONGO_COLLECTION_REBUILD_SUFFIX = os.environ.get('MONGO_COLLECTION_REBUILD_SUFFIX', '-rebuild')
+MONGO_COLLECTION_KEYS_GENERATION_STATE = os.environ.get('MONGO_COLLECTION_KEYS_GENERATION_STATE', 'keys-generation-state')
 
 MONGO_DB_ARTICLES = os.environ.get('MONGO_DB_ARTICLES', 'ami')
 MONGO_COLLECTION_ARTICLES = os.environ.get('MONGO_COLLECTION_ARTICLES', 'articles-issues')
+MONGO_ARTICLES_WATERMARK_FIELD = os.environ.get('MONGO_ARTICLES_WATERMARK_FIELD', 'processing_date')
 
 ARTICLE_KEYS = ['cleaned_publication_date',
                 'cleaned_first_author',
@@ -32,10 +49,125 @@ BOOK_KEYS = ['cleaned_publication_date',
              'cleaned_publisher',
              'cleaned_publisher_address']
 
+CHAPTER_KEYS = BOOK_KEYS + ['cleaned_chapter_title', 'cleaned_chapter_first_author']
+
+# Bases de de-duplicaçao: tipo de citaçao e lista ordenada dos campos que formam o hash.
+# Pode ser substituida por um arquivo JSON no mesmo formato (--bases_config)
+DEFAULT_BASES_CONFIG = {'article-issue': {'citation_type': 'article', 'keys': ARTICLE_KEYS + ['cleaned_issue']},
+                        'article-start_page': {'citation_type': 'article', 'keys': ARTICLE_KEYS + ['cleaned_start_page']},
+                        'article-volume': {'citation_type': 'article', 'keys': ARTICLE_KEYS + ['cleaned_volume']},
+                        'book': {'citation_type': 'book', 'keys': BOOK_KEYS},
+                        'chapter': {'citation_type': 'book', 'keys': CHAPTER_KEYS}}
+
+CITATION_TYPES = ['article', 'book']
+
+BASES_KEYS = {}
+
+BASES_BY_CITATION_TYPE = {}
+
+hashers = {}
+
+ARTICLE_PROJECTION = {'collection': 1,
+                      'article.v880': 1,
+                      'article.v992': 1,
+                      'title.v992': 1,
+                      'citations': 1}
+
+KEY_FORMATS = ['hex', 'binary', 'fp128']
+
 chunk_size = 2000
 
+batch_size = 100
+
+max_pending_batches = 2 * os.cpu_count()
+
+standardizer_cache_size = 0
+
+cleaner_cache_size = 0
+
+use_standardizer = True
+
+standardizer_snapshot = None
+
+partitions = 16
+
+write_batch_size = 1000
+
 citation_types = set()
 
+key_format = 'hex'
+
+shard_index = 0
+shard_count = 1
+
+raw_extractor = False
+check_raw_extractor = False
+
+articles_collection = None
+standardizer = None
+
+keys_writer = None
+
+dedup_writer = None
+
+# Metricas do processo (None desativa a instrumentaçao); cada worker mantem as suas e as envia a cada lote
+metrics = None
+
+# Ultimos contadores de acertos e falhas dos caches do worker, para o envio incremental
+_last_cache_counts = {}
+
+# Fraçao dos lotes executados sob o cProfile nos workers (0 desativa o profiling)
+profile_rate = 0.0
+
+# Estatisticas do cProfile recebidas dos workers (processo principal)
+profile_aggregator = None
+
+
+class CitationKey(namedtuple('CitationKey', ['cit_full_id', 'base', 'hash', 'values'])):
+    """
+    Chave de de-duplicaçao de uma citaçao em uma base.
+    Os valores dos campos sao mantidos em uma tupla, na ordem de BASES_KEYS[base], o que torna o registro
+    compacto para a transferencia entre processos.
+    """
+    __slots__ = ()
+
+    @property
+    def cit_keys(self):
+        """
+        :return: Dicionario composto pelos pares nome de campo: valor de campo usados no hash
+        """
+        return dict(zip(BASES_KEYS[self.base], self.values))
+
+
+def load_bases_config(config):
+    """
+    Define as bases de de-duplicaçao e prepara um calculador de hashes por tipo de citaçao.
+    BASES_KEYS e BASES_BY_CITATION_TYPE sao atualizados no proprio objeto, para que os modulos que os importaram
+    vejam a nova configuraçao.
+
+    :param config: Dicionario composto pelos pares nome da base: {'citation_type': tipo, 'keys': lista de campos}
+    """
+    for base, base_config in config.items():
+        if base_config.get('citation_type') not in CITATION_TYPES:
+            raise ValueError('Tipo de citaçao invalido para a base %s: %s' % (base, base_config.get('citation_type')))
+        if not base_config.get('keys'):
+            raise ValueError('Base sem campos: %s' % base)
+
+    BASES_KEYS.clear()
+    BASES_BY_CITATION_TYPE.clear()
+    BASES_BY_CITATION_TYPE.update({t: [] for t in CITATION_TYPES})
+    hashers.clear()
+
+    for base, base_config in config.items():
+        BASES_KEYS[base] = list(base_config['keys'])
+        BASES_BY_CITATION_TYPE.setdefault(base_config['citation_type'], []).append(base)
+
+    for citation_type, bases in BASES_BY_CITATION_TYPE.items():
+        hashers[citation_type] = SchemaHasher({b: BASES_KEYS[b] for b in bases})
+
+
+load_bases_config(DEFAULT_BASES_CONFIG)
+
 
 def _extract_citation_fields_by_list(citation: Citation, fields):
     """
@@ -141,101 +273,119 @@ def mount_citation_id(citation: Citation, collection_acronym):
     return cit_full_id
 
 
-def hash_keys(cit_data, keys):
+def format_digest(digest: bytes, key_format='hex'):
     """
-    Cria um codigo hash dos dados de uma citaçao, com base na lista de keys.
+    Formata o digest SHA3_224 de uma citaçao.
 
-    :param cit_data: Dicionario de pares de nome de campo e valor de campo de citaçao
-    :param keys: Nomes dos campos a serem considerados para formar o codigo hash
-    :return: Codigo hash SHA3_256 para os dados da citaçao
+    :param digest: Digest SHA3_224 (28 bytes)
+    :param key_format: 'hex' (texto hexadecimal de 56 caracteres), 'binary' (digest completo, armazenado como BSON binary)
+    ou 'fp128' (fingerprint formado pelos primeiros 128 bits do digest)
+    :return: Codigo hash no formato indicado
     """
-    data = []
-    for k in keys:
-        if k in cit_data:
-            if cit_data[k]:
-                data.append(k + cit_data[k])
-            else:
-                return
-        else:
-            return
+    if key_format == 'hex':
+        return digest.hex()
+    if key_format == 'binary':
+        return digest
+    if key_format == 'fp128':
+        return digest[:16]
+    raise ValueError('Formato de chave invalido: %s' % key_format)
 
-    if data:
-        return sha3_224(''.join(data).encode()).hexdigest()
 
+def convert_key(cit_hash, key_format):
+    """
+    Converte um codigo hash existente (texto hexadecimal ou digest binario completo) para key_format.
 
-def extract_citations_ids_keys(document: Article, standardizer):
+    :param cit_hash: Codigo hash em formato 'hex' ou 'binary'
+    :param key_format: Formato de destino
+    :return: Codigo hash no formato indicado
     """
-    Extrai as quadras (id de citaçao, pares de campos de citaçao, hash da citaçao, base) para todos as citaçoes.
+    if isinstance(cit_hash, str):
+        cit_hash = bytes.fromhex(cit_hash)
+    return format_digest(cit_hash, key_format)
+
+
+def get_article_citations_ids(citations, collection_acronym):
+    """
+    Obtem os ids completos das citaçoes de artigos de um documento, que sao consultados no padronizador.
+
+    :param citations: Citaçoes do documento citante
+    :param collection_acronym: Acronimo da coleçao do documento citante
+    :return: Lista de ids completos de citaçoes de artigos
+    """
+    if 'article' not in citation_types or not citations:
+        return []
+
+    return [mount_citation_id(c, collection_acronym) for c in citations if c.publication_type == 'article']
+
+
+def extract_citations_ids_keys(document: Article, standardized_data: dict, citations=None, timed=True):
+    """
+    Extrai as chaves (id de citaçao, base, hash da citaçao, valores dos campos de citaçao) para todos as citaçoes.
     Sao contemplados livros, capitulos de livros e artigos.
 
     :param document: Documento do qual a lista de citaçoes sera convertida para hash
-    :param standardizer: Normalizador de titulo de periodico citado
-    :return: Quadra composta por id de citacao, dicionario de nomes de campos e valores, hash de citaçao e base
+    :param standardized_data: Dados do normalizador de titulo de periodico citado (id completo de citaçao: registro)
+    :param citations: Citaçoes do documento ja obtidas (padrao: document.citations)
+    :param timed: Indica se os tempos de limpeza e de hash sao registrados nas metricas
+    :return: Lista de CitationKey
     """
     citations_ids_keys = []
+    clean_seconds = 0.0
+    hash_seconds = 0.0
 
-    if document.citations:
-        for cit in [c for c in document.citations if c.publication_type in citation_types]:
+    if citations is None:
+        citations = document.citations
+    if citations:
+        for cit in [c for c in citations if c.publication_type in citation_types]:
             cit_full_id = mount_citation_id(cit, document.collection_acronym)
 
+            start = time.perf_counter()
             if cit.publication_type == 'article':
-                cit_standardized_data = standardizer.find_one({'_id': cit_full_id, 'status': {'$gt': 0}})
-                cit_data = extract_citation_data(cit, cit_standardized_data)
-
-                for extra_key in ['volume', 'start_page', 'issue']:
-                    keys_i = ARTICLE_KEYS + ['cleaned_' + extra_key]
-
-                    article_hash_i = hash_keys(cit_data, keys_i)
-                    if article_hash_i:
-                        citations_ids_keys.append((cit_full_id,
-                                                   {k: cit_data[k] for k in keys_i if k in cit_data},
-                                                   article_hash_i,
-                                                   'article-' + extra_key))
-
+                cit_data = extract_citation_data(cit, standardized_data.get(cit_full_id))
             else:
                 cit_data = extract_citation_data(cit)
+            end = time.perf_counter()
+            clean_seconds += end - start
 
-                book_hash = hash_keys(cit_data, BOOK_KEYS)
-                if book_hash:
-                    citations_ids_keys.append((cit_full_id,
-                                               {k: cit_data[k] for k in BOOK_KEYS if k in cit_data},
-                                               book_hash,
-                                               'book'))
-
-                    chapter_keys = BOOK_KEYS + ['cleaned_chapter_title', 'cleaned_chapter_first_author']
+            digests = hashers[cit.publication_type].hash(cit_data)
+            for base in BASES_BY_CITATION_TYPE[cit.publication_type]:
+                digest = digests.get(base)
+                if digest:
+                    citations_ids_keys.append(CitationKey(cit_full_id, base, format_digest(digest, key_format), tuple(cit_data[k] for k in BASES_KEYS[base])))
+            hash_seconds += time.perf_counter() - end
 
-                    chapter_hash = hash_keys(cit_data, chapter_keys)
-                    if chapter_hash:
-                        citations_ids_keys.append((cit_full_id,
-                                                   {k: cit_data[k] for k in chapter_keys if k in cit_data},
-                                                   chapter_hash,
-                                                   'chapter'))
+    if metrics and timed:
+        metrics.incr('clean_seconds_total', clean_seconds)
+        metrics.incr('hash_seconds_total', hash_seconds)
 
     return citations_ids_keys
 
 
-def convert_to_mongodoc(data):
+def convert_to_mongodoc(data, update_date=None):
     """
     Converte dados de citaçao para registro em formato Mongo.
 
-    :param data: Dados a serem convertidos (lista de quadras no formato: id de citacao, dados de citaçao, hash, base)
+    :param data: Dados a serem convertidos (lista de pares id do documento citante, lista de CitationKey)
+    :param update_date: Data de atualizaçao atribuida aos registros (padrao: data corrente)
     :return: Dados convertidos
     """
-    mgdocs = {'article-issue': {}, 'article-start_page': {}, 'article-volume': {}, 'book': {}, 'chapter': {}}
+    if update_date is None:
+        update_date = datetime.now().strftime('%Y-%m-%d')
+
+    mgdocs = {base: {} for base in BASES_KEYS}
 
     for doc_id, citations_data in [d for d in data if d]:
         for cit in citations_data:
-            cit_full_id = cit[0]
-            cit_keys = cit[1]
-            cit_sha3_256 = cit[2]
-            cit_hash_mode = cit[3]
+            cit_full_id = cit.cit_full_id
+            cit_sha3_256 = cit.hash
+            cit_hash_mode = cit.base
 
             if cit_sha3_256 not in mgdocs[cit_hash_mode]:
-                mgdocs[cit_hash_mode][cit_sha3_256] = {'cit_full_ids': [], 'citing_docs': [], 'cit_keys': cit_keys}
+                mgdocs[cit_hash_mode][cit_sha3_256] = {'cit_full_ids': [], 'citing_docs': [], 'cit_keys': cit.cit_keys}
 
             mgdocs[cit_hash_mode][cit_sha3_256]['cit_full_ids'].append(cit_full_id)
             mgdocs[cit_hash_mode][cit_sha3_256]['citing_docs'].append(doc_id)
-            mgdocs[cit_hash_mode][cit_sha3_256]['update_date'] = datetime.now().strftime('%Y-%m-%d')
+            mgdocs[cit_hash_mode][cit_sha3_256]['update_date'] = update_date
 
     return mgdocs
 
@@ -245,53 +395,586 @@ def save_data_to_mongo(data):
     Persiste na base Mongo os dados das chaves de de-duplicaçao.
 
     :param data: Dados a serem persistidos
-    :param mongo_uri: String de conexao a base Mongo na qual os dados serao persistidos
     """
-    mongo_data = convert_to_mongodoc(data)
+    global dedup_writer
+
+    if dedup_writer is None:
+        dedup_writer = DedupCollectionsWriter(MongoClient(MONGO_URI),
+                                              MONGO_DB_SEARCH_SCIELO,
+                                              MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX,
+                                              batch_size=write_batch_size,
+                                              metrics=metrics)
+
+    dedup_writer.write(convert_to_mongodoc(data))
+
+
+def _insert_documents(collection, documents):
+    start = time.perf_counter()
+    collection.insert_many(documents, ordered=False)
+
+    if metrics:
+        metrics.incr('mongo_write_requests_total')
+        metrics.incr('mongo_write_operations_total', len(documents))
+        metrics.observe('mongo_write_seconds', time.perf_counter() - start)
+
+
+def save_aggregated_data_to_mongo(aggregator, bases):
+    """
+    Persiste na base Mongo os documentos de de-duplicaçao produzidos pelo agregador externo.
+    Cada documento e inserido uma unica vez em uma coleçao nova, que ao final substitui a coleçao atual da base.
+    Por isso, o agregador deve conter as chaves de todo o corpus: chaves de um subconjunto dos documentos (por exemplo,
+    filtrado por data) substituiriam as coleçoes completas.
+
+    :param aggregator: Agregador com todos os registros de chaves da execuçao
+    :param bases: Bases cujas coleçoes serao reconstruidas
+    """
+    update_date = datetime.now().strftime('%Y-%m-%d')
+
+    client = MongoClient(MONGO_URI)
+    db = client[MONGO_DB_SEARCH_SCIELO]
+
+    writers = {}
+    for base in bases:
+        name = MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX + base + MONGO_COLLECTION_REBUILD_SUFFIX
+        db.drop_collection(name)
+        writers[base] = db.create_collection(name)
+
+    documents = {base: [] for base in bases}
+    for base, cit_hash, cit_full_ids, citing_docs, cit_keys in aggregator.iter_groups():
+        documents[base].append({'_id': cit_hash,
+                                'cit_keys': cit_keys,
+                                'cit_full_ids': cit_full_ids,
+                                'citing_docs': citing_docs,
+                                'update_date': update_date})
+
+        if len(documents[base]) == 1000:
+            _insert_documents(writers[base], documents[base])
+            documents[base] = []
+
+    for base in bases:
+        if documents[base]:
+            _insert_documents(writers[base], documents[base])
+
+        writers[base].rename(MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX + base, dropTarget=True)
+
+    client.close()
+
+
+def iter_keys_records(data):
+    """
+    Converte dados de citaçao em registros planos de chaves de de-duplicaçao.
+
+    :param data: Dados a serem convertidos (lista de pares id do documento citante, lista de CitationKey)
+    :return: Gerador de quintuplas (hash, base, id completo de citaçao, id do documento citante, campos da citaçao)
+    """
+    for doc_id, citations_data in [d for d in data if d]:
+        for cit in citations_data:
+            yield cit.hash, cit.base, cit.cit_full_id, doc_id, cit.cit_keys
+
+
+def save_data(data):
+    """
+    Persiste os dados das chaves de de-duplicaçao em arquivos locais, caso keys_writer esteja definido, ou no Mongo.
+
+    :param data: Dados a serem persistidos
+    """
+    start = time.perf_counter()
+
+    if keys_writer:
+        keys_writer.write(iter_keys_records(data))
+    else:
+        save_data_to_mongo(data)
+
+    if metrics:
+        elapsed = time.perf_counter() - start
+        metrics.incr('written_documents_total', len(data))
+        metrics.incr('write_seconds_total', elapsed)
+        metrics.observe('write_seconds', elapsed)
+
+
+class BackgroundWriter(threading.Thread):
+    """
+    Estagio de escrita executado em segundo plano, que persiste os resultados enquanto os workers extraem novas chaves.
+    A fila de entrada e limitada, de modo que a extraçao aguarda quando a escrita esta atrasada.
+    """
+
+    def __init__(self, flush_size, queue_size, checkpoint=None):
+        """
+        :param flush_size: Quantidade de documentos citantes acumulados antes de cada escrita
+        :param queue_size: Quantidade maxima de lotes de resultados aguardando escrita
+        :param checkpoint: Controle de progresso notificado apos cada escrita (opcional)
+        """
+        super().__init__(daemon=True)
+        self.flush_size = flush_size
+        self.queue = Queue(maxsize=queue_size)
+        self.checkpoint = checkpoint
+        self.total_written = 0
+        self.error = None
+
+    def put(self, number, results):
+        self.queue.put((number, results))
+
+    def close(self):
+        """
+        Sinaliza o fim dos resultados, aguarda a escrita dos dados pendentes e propaga eventual erro de escrita.
+        """
+        self.queue.put(None)
+        self.join()
+
+        if self.error:
+            raise self.error
+
+    def _flush(self, buffer, numbers):
+        save_data(buffer)
+        print('\t%d to %d' % (self.total_written, self.total_written + len(buffer)))
+        self.total_written += len(buffer)
+
+        if self.checkpoint:
+            self.checkpoint.complete_batches(numbers)
+
+    def run(self):
+        buffer = []
+        numbers = []
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            # Apos um erro, apenas esvazia a fila para nao bloquear a extraçao
+            if self.error:
+                continue
+
+            number, results = item
+            buffer.extend(results)
+            numbers.append(number)
+            if len(buffer) >= self.flush_size:
+                try:
+                    self._flush(buffer, numbers)
+                except Exception as e:
+                    self.error = e
+                buffer = []
+                numbers = []
+
+        if numbers and not self.error:
+            try:
+                self._flush(buffer, numbers)
+            except Exception as e:
+                self.error = e
+
+
+def iter_batches(items, size):
+    """
+    Agrupa os itens de um iteravel em listas de tamanho size, sem materializar o iteravel.
+
+    :param items: Iteravel de itens
+    :param size: Tamanho de cada lote
+    :return: Gerador de lotes
+    """
+    batch = []
+    for i in items:
+        batch.append(i)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _numbered_batches(docs, checkpoint=None, first_number=0):
+    """
+    Agrupa os documentos em lotes de batch_size ids, numerados na ordem de leitura.
+
+    :param docs: Iteravel de documentos com o campo _id
+    :param checkpoint: Controle de progresso no qual os lotes sao registrados (opcional)
+    :param first_number: Numero do primeiro lote
+    :return: Gerador de pares (numero do lote, ('mongo', lista de ids))
+    """
+    for number, batch in enumerate(iter_batches(docs, batch_size), first_number):
+        if checkpoint:
+            checkpoint.register_batch(number, batch)
+        yield number, ('mongo', [d['_id'] for d in batch])
+
+
+def _numbered_dump_batches(paths):
+    """
+    Agrupa os registros brutos de arquivos de dump em lotes de batch_size registros, sem misturar arquivos.
+
+    :param paths: Caminhos dos arquivos de dump
+    :return: Gerador de pares (numero do lote, (formato do dump, lista de registros))
+    """
+    number = 0
+    for path in paths:
+        dump_format = get_dump_format(path)
+        for records in iter_batches(iter_raw_records(path), batch_size):
+            yield number, (dump_format, records)
+            number += 1
+
+
+def _in_shard(doc):
+    return shard_count == 1 or get_shard(doc['_id'], shard_count) == shard_index
+
+
+def _bounded(batches, semaphore, stop):
+    """
+    Entrega lotes apenas enquanto houver vaga no semaforo, limitando a quantidade de lotes em processamento.
+    A entrega e interrompida quando stop e sinalizado (por exemplo, apos um erro), liberando a thread do Pool que
+    consome os lotes.
+    """
+    for b in batches:
+        semaphore.acquire()
+        if stop.is_set():
+            return
+        yield b
+
+
+def init_worker():
+    """
+    Abre a conexao Mongo do worker, que e mantida durante toda a vida do processo.
+    """
+    global articles_collection
+    global standardizer
+    global metrics
+
+    # O registro herdado do processo principal e substituido, para que cada worker envie apenas as suas metricas
+    if metrics is not None:
+        metrics = Metrics()
+
+    client = MongoClient(MONGO_URI)
+    articles_collection = client[MONGO_DB_ARTICLES][MONGO_COLLECTION_ARTICLES]
+
+    if use_standardizer and standardizer_snapshot:
+        standardizer = StandardizedCitationsSnapshot(standardizer_snapshot, cache_size=standardizer_cache_size)
+    elif use_standardizer:
+        standardizer = StandardizedCitations(client[MONGO_DB_SEARCH_SCIELO][MONGO_COLLECTION_STANDARDIZED_CITATIONS],
+                                             cache_size=standardizer_cache_size)
+    else:
+        standardizer = StandardizedCitations(None)
+
+    if cleaner_cache_size:
+        enable_cache(cleaner_cache_size)
+
+
+def get_mismatched_citations(citations_keys, expected_keys):
+    """
+    Compara as chaves obtidas pelo extrator de registros brutos com as obtidas pelo xylose.
+
+    :param citations_keys: Lista de CitationKey do extrator de registros brutos
+    :param expected_keys: Lista de CitationKey do xylose
+    :return: Lista ordenada de pares (id completo de citaçao, base) cujas chaves diferem
+    """
+    if citations_keys == expected_keys:
+        return []
+
+    keys = {(k.cit_full_id, k.base): k for k in citations_keys}
+    expected = {(k.cit_full_id, k.base): k for k in expected_keys}
+
+    return sorted(c for c in keys.keys() | expected.keys() if keys.get(c) != expected.get(c))
+
+
+def extract_documents_ids_keys(raws):
+    """
+    Extrai as chaves das citaçoes de um lote de documentos brutos.
+    Os dados do padronizador de todas as citaçoes de artigos do lote sao obtidos com uma unica consulta.
+
+    :param raws: Iteravel de documentos brutos
+    :return: Lista de pares (id do documento citante, lista de CitationKey)
+    """
+    results = []
+
+    start = time.perf_counter()
+    document_class = RawArticle if raw_extractor else Article
+    docs = [document_class(raw) for raw in raws]
+
+    # O xylose reconstroi todas as citaçoes a cada acesso a Article.citations: cada documento as obtem uma unica vez
+    docs_citations = [(doc, doc.citations) for doc in docs]
+    articles_citations_ids = [cit_id for doc, citations in docs_citations for cit_id in get_article_citations_ids(citations, doc.collection_acronym)]
+    end = time.perf_counter()
+
+    lookups = standardizer.lookups
+    standardized_data = standardizer.get_many(articles_citations_ids)
+
+    if metrics:
+        metrics.incr('parse_seconds_total', end - start)
+        if standardizer.lookups > lookups:
+            metrics.incr('standardizer_lookups_total')
+            metrics.observe('standardizer_lookup_seconds', time.perf_counter() - end)
+        metrics.incr('documents_total', len(docs))
+        metrics.incr('citations_total', sum(len(citations or []) for _, citations in docs_citations))
+
+    for doc, citations in docs_citations:
+        citations_keys = extract_citations_ids_keys(doc, standardized_data, citations)
+
+        if check_raw_extractor:
+            mismatches = get_mismatched_citations(citations_keys, extract_citations_ids_keys(Article(doc.data), standardized_data, timed=False))
+            if mismatches:
+                if metrics:
+                    metrics.incr('raw_extractor_mismatches_total')
+                logging.warning('Raw extractor mismatch for %s: %s' % (doc.publisher_id, ', '.join('%s (%s)' % m for m in mismatches)))
+
+        if citations_keys:
+            results.append(('-'.join([doc.publisher_id, doc.collection_acronym]), citations_keys))
+
+    return results
+
+
+def parallel_extract_citations_ids_keys(docs_ids):
+    """
+    Obtem, com uma unica consulta, os documentos de um lote de ids e extrai as chaves de suas citaçoes.
+
+    :param docs_ids: Lista de ids de documentos
+    :return: Lista de pares (id do documento citante, lista de CitationKey)
+    """
+    start = time.perf_counter()
+    raws = list(articles_collection.find({'_id': {'$in': docs_ids}}, ARTICLE_PROJECTION))
+
+    if metrics:
+        elapsed = time.perf_counter() - start
+        metrics.incr('mongo_fetch_requests_total')
+        metrics.incr('fetch_seconds_total', elapsed)
+        metrics.observe('mongo_fetch_seconds', elapsed)
+
+    return extract_documents_ids_keys(raws)
+
+
+def parallel_extract_citations_ids_keys_from_records(records, dump_format):
+    """
+    Decodifica um lote de registros de arquivo de dump e extrai as chaves de suas citaçoes.
+
+    :param records: Lista de registros brutos em bytes
+    :param dump_format: Formato do arquivo de origem ('bson' ou 'jsonl')
+    :return: Lista de pares (id do documento citante, lista de CitationKey)
+    """
+    start = time.perf_counter()
+    raws = [d for d in (decode_raw_record(r, dump_format) for r in records) if _in_shard(d)]
+
+    if metrics:
+        metrics.incr('fetch_seconds_total', time.perf_counter() - start)
+
+    return extract_documents_ids_keys(raws)
+
+
+def _collect_cache_metrics():
+    """
+    Registra os acertos e falhas dos caches do worker desde o ultimo registro.
+    """
+    caches = {'cleaner_' + name: stats for name, stats in get_cache_stats().items()}
+    if standardizer is not None and standardizer.cache is not None:
+        caches['standardizer_cache'] = standardizer.stats()
+
+    for name, stats in caches.items():
+        for k in ('hits', 'misses'):
+            last = _last_cache_counts.get((name, k), 0)
+            metrics.incr('%s_%s_total' % (name, k), stats[k] - last)
+            _last_cache_counts[(name, k)] = stats[k]
+
+
+def _extract_batch(source, items):
+    if source == 'mongo':
+        return parallel_extract_citations_ids_keys(items)
+    return parallel_extract_citations_ids_keys_from_records(items, source)
+
+
+def _parallel_extract_numbered_batch(numbered_batch):
+    """
+    Extrai as chaves de um lote numerado. Uma fraçao profile_rate dos lotes e executada sob o cProfile.
+
+    :return: Tripla (numero do lote, resultados do lote, relatorio do worker ou None). O relatorio contem as metricas
+    do worker desde o lote anterior ('metrics') e/ou as estatisticas do cProfile do lote ('profile')
+    """
+    number, (source, items) = numbered_batch
+
+    report = {}
+    if profile_rate and random.random() < profile_rate:
+        results, report['profile'] = profile_call(_extract_batch, source, items)
+    else:
+        results = _extract_batch(source, items)
+
+    if metrics:
+        _collect_cache_metrics()
+        report['metrics'] = metrics.snapshot(reset=True)
+
+    return number, results, report or None
+
+
+def _merge_worker_report(report):
+    """
+    Acumula, no processo principal, as metricas e as estatisticas do cProfile enviadas por um worker.
+    """
+    if report:
+        if 'metrics' in report:
+            metrics.merge(report['metrics'])
+        if 'profile' in report:
+            profile_aggregator.add(report['profile'])
+
+
+def generate_keys_by_chunks(docs, checkpoint=None):
+    """
+    Gera e persiste as chaves de de-duplicaçao em slices de chunk_size documentos.
 
-    for k, v in mongo_data.items():
-        client = MongoClient(MONGO_URI)
-        writer = client[MONGO_DB_SEARCH_SCIELO][MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX + k]
+    :param docs: Lista de documentos com o campo _id
+    :param checkpoint: Controle de progresso, atualizado apos a persistencia de cada slice (opcional)
+    """
+    total_docs = len(docs)
+
+    chunks = range(0, total_docs, chunk_size)
+    with Pool(os.cpu_count(), initializer=init_worker) as p:
+        first_number = 0
+        for slice_start in chunks:
+            slice_end = slice_start + chunk_size
+            if slice_end > total_docs:
+                slice_end = total_docs
+
+            print('\t%d to %d' % (slice_start, slice_end))
+            batches = list(_numbered_batches(docs[slice_start:slice_end], checkpoint, first_number))
+            first_number += len(batches)
+
+            results = []
+            for number, batch_results, report in p.map(_parallel_extract_numbered_batch, batches):
+                results.extend(batch_results)
+                _merge_worker_report(report)
+
+            save_data(results)
+
+            if checkpoint:
+                checkpoint.complete_batches([number for number, b in batches])
+
+
+def generate_keys_by_stream(batches, checkpoint=None):
+    """
+    Gera e persiste as chaves de de-duplicaçao em fluxo continuo.
+    Os lotes sao consumidos sob demanda, no maximo max_pending_batches lotes ficam em processamento
+    e a escrita ocorre em paralelo a extraçao.
+
+    :param batches: Iteravel de lotes numerados (ver _numbered_batches e _numbered_dump_batches)
+    :param checkpoint: Controle de progresso, atualizado apos cada escrita (opcional)
+    """
+    semaphore = threading.Semaphore(max_pending_batches)
+    stop = threading.Event()
+
+    writer = BackgroundWriter(flush_size=chunk_size, queue_size=max_pending_batches, checkpoint=checkpoint)
+    writer.start()
+
+    try:
+        with Pool(os.cpu_count(), initializer=init_worker) as p:
+            try:
+                for number, batch_results, report in p.imap_unordered(_parallel_extract_numbered_batch, _bounded(batches, semaphore, stop)):
+                    semaphore.release()
+                    _merge_worker_report(report)
+
+                    # Apos um erro de escrita, a extraçao do restante do corpus seria descartada
+                    if writer.error:
+                        break
+                    writer.put(number, batch_results)
+            finally:
+                # Libera a thread do Pool eventualmente bloqueada em _bounded, sem a qual o encerramento do Pool
+                # aguardaria indefinidamente apos um erro em um worker
+                stop.set()
+                semaphore.release()
+    finally:
+        writer.close()
+
+
+def generate_keys_from_mongo(args, mongo_filter):
+    """
+    Gera as chaves de de-duplicaçao dos documentos da coleçao Mongo de artigos que atendem a mongo_filter.
+
+    :param args: Argumentos de linha de comando
+    :param mongo_filter: Filtro Mongo dos documentos
+    """
+    main_client = MongoClient(MONGO_URI, maxPoolSize=None)
+
+    checkpoint = None
+    projection = {'_id': 1}
+    if args.incremental or args.checkpoint:
+        if args.state_file:
+            state_store = FileStateStore(args.state_file)
+        else:
+            state_id = 'generate_dedup_keys'
+            if shard_count > 1:
+                state_id += '-shard-%d-of-%d' % (shard_index, shard_count)
+            state_store = MongoStateStore(main_client[MONGO_DB_SEARCH_SCIELO][MONGO_COLLECTION_KEYS_GENERATION_STATE], state_id)
+
+        checkpoint = RunCheckpoint(state_store, args.watermark_field if args.incremental else None)
+        mongo_filter = checkpoint.start(mongo_filter)
+        projection = checkpoint.projection()
+
+        if checkpoint.resumed_from is not None:
+            print('[Checkpoint] resuming after document %s' % checkpoint.resumed_from)
+
+    print('[Settings] citation types: %s, chunk size: %d, batch size: %d, mongo filter: %s, shard: %d/%d' % (citation_types, chunk_size, batch_size, mongo_filter, shard_index, shard_count))
+    print('[1] Getting documents\' ids...')
+    start = time.time()
 
-        operations = []
-        for cit_sha3_256 in v:
-            new_doc = v[cit_sha3_256]
-            operations.append(UpdateOne(
-                filter={'_id': str(cit_sha3_256)},
-                update={
-                    '$set': {
-                        'cit_keys': new_doc['cit_keys'],
-                        'update_date': new_doc['update_date']
-                    },
-                    '$addToSet': {
-                        'cit_full_ids': {'$each': new_doc['cit_full_ids']},
-                        'citing_docs': {'$each': new_doc['citing_docs']},
-                    }
-                },
-                upsert=True
-            ))
+    ids_cursor = main_client[MONGO_DB_ARTICLES][MONGO_COLLECTION_ARTICLES].find(mongo_filter, projection, no_cursor_timeout=args.stream)
+    if checkpoint:
+        ids_cursor = ids_cursor.sort('_id', 1)
 
-            if len(operations) == 1000:
-                writer.bulk_write(operations)
-                operations = []
+    docs = (d for d in ids_cursor if _in_shard(d))
+    if not args.stream:
+        docs = list(docs)
 
-        if len(operations) > 0:
-            writer.bulk_write(operations)
+    end = time.time()
+    print('\tDone after %.2f seconds' % (end - start))
+
+    start = time.time()
+
+    print('[2] Generating keys...')
+    try:
+        if args.stream:
+            generate_keys_by_stream(_numbered_batches(docs, checkpoint), checkpoint)
+        else:
+            generate_keys_by_chunks(docs, checkpoint)
 
-        client.close()
+        if checkpoint:
+            checkpoint.finish()
+    finally:
+        ids_cursor.close()
+        main_client.close()
 
+    end = time.time()
+    print('\tDone after %.2f seconds' % (end - start))
 
-def parallel_extract_citations_ids_keys(doc_id):
-    client = MongoClient(MONGO_URI, maxPoolSize=None)
-    articles = client[MONGO_DB_ARTICLES][MONGO_COLLECTION_ARTICLES]
-    standardizer = client[MONGO_DB_SEARCH_SCIELO][MONGO_COLLECTION_STANDARDIZED_CITATIONS]
 
-    raw = articles.find_one({'_id': doc_id})
-    doc = Article(raw)
+def generate_keys_from_dumps(paths):
+    """
+    Gera as chaves de de-duplicaçao dos documentos lidos sequencialmente de arquivos de dump (JSONL, JSONL gzip ou BSON).
 
-    citations_keys = extract_citations_ids_keys(doc, standardizer)
-    if citations_keys:
-        return '-'.join([doc.publisher_id, doc.collection_acronym]), citations_keys
+    :param paths: Caminhos dos arquivos de dump
+    """
+    print('[Settings] citation types: %s, chunk size: %d, batch size: %d, dump files: %d, shard: %d/%d' % (citation_types, chunk_size, batch_size, len(paths), shard_index, shard_count))
+    print('[1] Generating keys from dump files...')
+    start = time.time()
+
+    generate_keys_by_stream(_numbered_dump_batches(paths))
+
+    end = time.time()
+    print('\tDone after %.2f seconds' % (end - start))
+
+
+def merge_keys_files(dirs, aggregator):
+    """
+    Une as chaves gravadas em arquivos (por exemplo, pelos diferentes shards) e recria as coleçoes de de-duplicaçao.
+    O resultado e identico ao de uma unica execuçao com --rebuild sobre todos os documentos.
+
+    :param dirs: Diretorios de saida das execuçoes com --output_dir
+    :param aggregator: Agregador externo das chaves (KeysAggregator)
+    """
+    paths = find_keys_files(dirs)
+    print('[Settings] citation types: %s, keys files: %d' % (citation_types, len(paths)))
+    print('[1] Reading keys files...')
+    start = time.time()
+
+    bases = {b for t in citation_types for b in BASES_BY_CITATION_TYPE[t]}
+    for path in paths:
+        records = (r for r in read_keys_file(path) if r[1] in bases)
+        if key_format != 'hex':
+            records = ((convert_key(r[0], key_format),) + r[1:] for r in records)
+        aggregator.write(records)
+
+    end = time.time()
+    print('\tDone after %.2f seconds' % (end - start))
 
 
 def main():
@@ -301,7 +984,7 @@ def main():
 
     parser.add_argument(
         '-f', '--from_date',
-        type=lambda x: datetime.strftime(x, '%Y-%m-%d'),
+        type=lambda x: datetime.strptime(x, '%Y-%m-%d').strftime('%Y-%m-%d'),
         nargs='?',
         help='Obtem apenas os PIDs de artigos publicados a partir da data especificada (use o formato YYYY-MM-DD)'
     )
@@ -325,14 +1008,230 @@ def main():
         help='Tamanho de cada slice Mongo'
     )
 
+    parser.add_argument(
+        '-n', '--batch_size',
+        help='Quantidade de documentos obtidos por consulta Mongo em cada worker'
+    )
+
+    parser.add_argument(
+        '--standardizer_cache_size',
+        help='Quantidade de registros do padronizador mantidos em cache LRU por worker (padrao: sem cache)'
+    )
+
+    parser.add_argument(
+        '--cleaner_cache_size',
+        help='Quantidade de valores limpos mantidos em cache LRU por funçao de limpeza e por worker (padrao: sem cache)'
+    )
+
+    parser.add_argument(
+        '-s', '--stream',
+        action='store_true',
+        default=False,
+        help='Processa os documentos em fluxo continuo, lendo ids sob demanda e escrevendo em paralelo a extraçao'
+    )
+
+    parser.add_argument(
+        '--max_pending_batches',
+        help='Quantidade maxima de lotes em processamento no modo em fluxo continuo'
+    )
+
+    parser.add_argument(
+        '-i', '--incremental',
+        action='store_true',
+        default=False,
+        help='Processa apenas os documentos incluidos ou atualizados desde a ultima execuçao concluida (implica --checkpoint)'
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        action='store_true',
+        default=False,
+        help='Registra o progresso a cada slice persistido, permitindo retomar uma execuçao interrompida'
+    )
+
+    parser.add_argument(
+        '--state_file',
+        default=None,
+        help='Arquivo local no qual o estado de execuçao e registrado (padrao: coleçao Mongo %s)' % MONGO_COLLECTION_KEYS_GENERATION_STATE
+    )
+
+    parser.add_argument(
+        '--watermark_field',
+        default=MONGO_ARTICLES_WATERMARK_FIELD,
+        help='Campo de data de atualizaçao dos documentos usado no modo incremental'
+    )
+
+    parser.add_argument(
+        '--input_files',
+        nargs='+',
+        default=None,
+        help='Le os documentos de arquivos de dump (.jsonl, .jsonl.gz ou .bson do mongodump) em vez da coleçao Mongo de artigos (implica --stream)'
+    )
+
+    parser.add_argument(
+        '--output_dir',
+        default=None,
+        help='Escreve as chaves em arquivos JSONL locais, particionados por base e por hash, em vez das coleçoes Mongo'
+    )
+
+    parser.add_argument(
+        '--partitions',
+        help='Quantidade de arquivos de partiçao por base no diretorio de saida'
+    )
+
+    parser.add_argument(
+        '--compress',
+        action='store_true',
+        default=False,
+        help='Compacta com gzip os arquivos de saida'
+    )
+
+    parser.add_argument(
+        '--raw_extractor',
+        action='store_true',
+        help='Le os campos das citaçoes diretamente dos registros brutos, sem construir objetos xylose'
+    )
+
+    parser.add_argument(
+        '--check_raw_extractor',
+        action='store_true',
+        help='Compara, documento a documento, as chaves do extrator de registros brutos com as do xylose '
+             '(implica --raw_extractor e dobra o custo de extraçao)'
+    )
+
+    parser.add_argument(
+        '--bases_config',
+        default=None,
+        help='Arquivo JSON com as bases de de-duplicaçao, no formato {"base": {"citation_type": "article" ou "book", '
+             '"keys": [campos]}} (padrao: bases article-issue, article-start_page, article-volume, book e chapter)'
+    )
+
+    parser.add_argument(
+        '--key_format',
+        choices=KEY_FORMATS,
+        default='hex',
+        help='Formato das chaves: hex (texto de 56 caracteres), binary (digest SHA3_224 como BSON binary) ou fp128 '
+             '(fingerprint de 128 bits como BSON binary). Use migrate_dedup_keys.py para converter coleçoes existentes'
+    )
+
+    parser.add_argument(
+        '--write_batch_size',
+        help='Quantidade de operaçoes por bulk write nas coleçoes de de-duplicaçao'
+    )
+
+    parser.add_argument(
+        '--shard_index',
+        help='Indice (a partir de 0) do shard processado por esta execuçao. Os documentos sao distribuidos entre os '
+             'shards pelo hash do _id, sem coordenaçao entre as maquinas'
+    )
+
+    parser.add_argument(
+        '--shard_count',
+        help='Quantidade total de shards'
+    )
+
+    parser.add_argument(
+        '--merge_keys_files',
+        nargs='+',
+        default=None,
+        help='Une os arquivos de chaves dos diretorios indicados (gerados com --output_dir, um por shard) e recria as '
+             'coleçoes de de-duplicaçao'
+    )
+
+    parser.add_argument(
+        '--rebuild',
+        action='store_true',
+        default=False,
+        help='Reconstroi as coleçoes de de-duplicaçao: as chaves sao agregadas por ordenaçao externa em disco e cada '
+             'documento e inserido uma unica vez em uma coleçao nova, que substitui a atual ao final'
+    )
+
+    parser.add_argument(
+        '--run_size',
+        help='Quantidade de registros de chaves mantidos em memoria antes de cada gravaçao em disco no modo --rebuild'
+    )
+
+    parser.add_argument(
+        '--tmp_dir',
+        default=None,
+        help='Diretorio dos arquivos temporarios do modo --rebuild'
+    )
+
+    parser.add_argument(
+        '--standardizer_snapshot',
+        default=None,
+        help='Arquivo SQLite local com os registros validos do padronizador, consultado pelos workers em vez do Mongo. '
+             'O arquivo e exportado a partir da coleçao a cada execuçao (ver --standardizer_snapshot_max_age)'
+    )
+
+    parser.add_argument(
+        '--standardizer_snapshot_max_age',
+        help='Reutiliza o arquivo de --standardizer_snapshot exportado ha no maximo esta quantidade de horas. Por '
+             'padrao, o arquivo e exportado novamente a cada execuçao'
+    )
+
+    parser.add_argument(
+        '--skip_standardizer',
+        action='store_true',
+        default=False,
+        help='Nao consulta o padronizador de titulos de periodicos (permite execuçao sem acesso ao Mongo)'
+    )
+
+    parser.add_argument(
+        '--metrics_file',
+        default=None,
+        help='Arquivo JSON lines ao qual as metricas da execuçao (vazao, tempo por etapa, latencias Mongo, taxas de '
+             'acerto dos caches) sao acrescentadas periodicamente'
+    )
+
+    parser.add_argument(
+        '--metrics_interval',
+        help='Intervalo, em segundos, entre os registros de metricas (padrao: 10)'
+    )
+
+    parser.add_argument(
+        '--metrics_port',
+        help='Porta local na qual as metricas sao servidas no formato de texto do Prometheus (/metrics)'
+    )
+
+    parser.add_argument(
+        '--profile',
+        default=None,
+        help='Executa a extraçao das chaves nos workers sob o cProfile e grava, neste arquivo, as estatisticas de '
+             'todos os workers unidas (formato pstats). As funçoes de maior custo sao exibidas ao final'
+    )
+
+    parser.add_argument(
+        '--profile_sample_rate',
+        help='Fraçao (entre 0 e 1) dos lotes de documentos executados sob o cProfile (padrao: 1). Valores baixos, '
+             'como 0.01, mantem o custo do profiling desprezivel'
+    )
+
     args = parser.parse_args()
 
     global citation_types
     global chunk_size
+    global batch_size
+    global standardizer_cache_size
+    global cleaner_cache_size
+    global max_pending_batches
+    global use_standardizer
+    global standardizer_snapshot
+    global partitions
+    global keys_writer
+    global write_batch_size
+    global key_format
+    global raw_extractor
+    global check_raw_extractor
+    global shard_index
+    global shard_count
+    global metrics
+    global profile_rate
+    global profile_aggregator
 
     mongo_filter = {}
     if args.from_date:
-        mongo_filter.update({'publication_date': args.from_date})
+        mongo_filter.update({'publication_date': {'$gte': args.from_date}})
 
     if args.book:
         citation_types.add('book')
@@ -342,34 +1241,152 @@ def main():
     if args.chunk_size and args.chunk_size.isdigit() and int(args.chunk_size) > 0:
         chunk_size = int(args.chunk_size)
 
-    print('[Settings] citation types: %s, chunk size: %d, mongo filter: %s' % (citation_types, chunk_size, mongo_filter))
-    print('[1] Getting documents\' ids...')
-    start = time.time()
+    if args.batch_size and args.batch_size.isdigit() and int(args.batch_size) > 0:
+        batch_size = int(args.batch_size)
 
-    main_client = MongoClient(MONGO_URI, maxPoolSize=None)
-    docs_ids = [x['_id'] for x in main_client[MONGO_DB_ARTICLES][MONGO_COLLECTION_ARTICLES].find(mongo_filter, {'_id': 1})]
-    total_docs = len(docs_ids)
-    main_client.close()
+    if args.standardizer_cache_size and args.standardizer_cache_size.isdigit():
+        standardizer_cache_size = int(args.standardizer_cache_size)
 
-    end = time.time()
-    print('\tDone after %.2f seconds' % (end - start))
+    if args.cleaner_cache_size and args.cleaner_cache_size.isdigit():
+        cleaner_cache_size = int(args.cleaner_cache_size)
 
-    start = time.time()
+    if args.max_pending_batches and args.max_pending_batches.isdigit() and int(args.max_pending_batches) > 0:
+        max_pending_batches = int(args.max_pending_batches)
 
-    print('[2] Generating keys...')
-    chunks = range(0, total_docs, chunk_size)
-    for slice_start in chunks:
-        slice_end = slice_start + chunk_size
-        if slice_end > total_docs:
-            slice_end = total_docs
+    if args.skip_standardizer:
+        use_standardizer = False
 
-        print('\t%d to %d' % (slice_start, slice_end))
-        with Pool(os.cpu_count()) as p:
-            results = p.map(parallel_extract_citations_ids_keys, docs_ids[slice_start:slice_end])
+    if use_standardizer and args.standardizer_snapshot and 'article' in citation_types:
+        standardizer_snapshot = args.standardizer_snapshot
 
-        save_data_to_mongo(results)
-    end = time.time()
-    print('\tDone after %.2f seconds' % (end - start))
+        age = None
+        if args.standardizer_snapshot_max_age and args.standardizer_snapshot_max_age.isdigit():
+            age = get_snapshot_age(standardizer_snapshot)
+            if age is not None and age > int(args.standardizer_snapshot_max_age) * 3600:
+                age = None
+
+        if age is not None:
+            print('[0] Reusing standardizer snapshot %s (exported %.1f hours ago)' % (standardizer_snapshot, age / 3600))
+        else:
+            print('[0] Exporting standardizer snapshot to %s...' % standardizer_snapshot)
+            start = time.time()
+
+            snapshot_client = MongoClient(MONGO_URI)
+            try:
+                total = export_snapshot(snapshot_client[MONGO_DB_SEARCH_SCIELO][MONGO_COLLECTION_STANDARDIZED_CITATIONS], standardizer_snapshot)
+            finally:
+                snapshot_client.close()
+
+            end = time.time()
+            print('\tDone after %.2f seconds (%d records)' % (end - start, total))
+
+    if args.partitions and args.partitions.isdigit() and int(args.partitions) > 0:
+        partitions = int(args.partitions)
+
+    key_format = args.key_format
+
+    if args.bases_config:
+        with open(args.bases_config) as f:
+            load_bases_config(json.load(f))
+
+    check_raw_extractor = args.check_raw_extractor
+    raw_extractor = args.raw_extractor or check_raw_extractor
+
+    if args.write_batch_size and args.write_batch_size.isdigit() and int(args.write_batch_size) > 0:
+        write_batch_size = int(args.write_batch_size)
+
+    if args.shard_count and args.shard_count.isdigit() and int(args.shard_count) > 0:
+        shard_count = int(args.shard_count)
+
+    if args.shard_index and args.shard_index.isdigit():
+        shard_index = int(args.shard_index)
+
+    if shard_index >= shard_count:
+        parser.error('--shard_index deve ser menor que --shard_count')
+
+    if args.merge_keys_files and (args.input_files or args.output_dir or args.incremental or args.checkpoint or shard_count > 1):
+        parser.error('--merge_keys_files nao pode ser combinado com --input_files, --output_dir, --incremental, --checkpoint ou --shard_count')
+
+    if args.input_files and (args.from_date or args.incremental or args.checkpoint):
+        parser.error('--from_date, --incremental e --checkpoint nao se aplicam a leitura de arquivos de dump')
+
+    # O modo --rebuild substitui as coleçoes inteiras e, portanto, deve processar todo o corpus
+    if args.rebuild and (args.from_date or args.incremental or args.checkpoint or args.output_dir):
+        parser.error('--rebuild nao pode ser combinado com --from_date, --incremental, --checkpoint ou --output_dir')
+
+    # Cada shard substituiria as coleçoes pelo seu resultado parcial, apagando as chaves dos demais shards
+    if args.rebuild and shard_count > 1:
+        parser.error('--rebuild nao pode ser combinado com --shard_count. Gere as chaves de cada shard com --output_dir '
+                     'e reconstrua as coleçoes com --merge_keys_files')
+
+    if args.profile:
+        profile_rate = 1.0
+        if args.profile_sample_rate:
+            try:
+                profile_rate = float(args.profile_sample_rate)
+            except ValueError:
+                parser.error('--profile_sample_rate deve ser um numero entre 0 e 1')
+            if not 0 < profile_rate <= 1:
+                parser.error('--profile_sample_rate deve ser um numero entre 0 e 1')
+
+        profile_aggregator = ProfileAggregator()
+
+    reporter = None
+    metrics_port = int(args.metrics_port) if args.metrics_port and args.metrics_port.isdigit() else None
+    if args.metrics_file or metrics_port:
+        metrics_interval = 10
+        if args.metrics_interval and args.metrics_interval.isdigit() and int(args.metrics_interval) > 0:
+            metrics_interval = int(args.metrics_interval)
+
+        metrics = Metrics()
+        reporter = MetricsReporter(metrics, 'generate_dedup_keys', args.metrics_file, metrics_interval, metrics_port)
+        reporter.start()
+
+    if args.output_dir:
+        prefix = 'part'
+        if shard_count > 1:
+            prefix = 'shard-%05d-part' % shard_index
+        keys_writer = KeysFileWriter(args.output_dir, partitions=partitions, compress=args.compress, prefix=prefix)
+
+    if args.rebuild or args.merge_keys_files:
+        run_size = 500000
+        if args.run_size and args.run_size.isdigit() and int(args.run_size) > 0:
+            run_size = int(args.run_size)
+        keys_writer = KeysAggregator(run_size=run_size, tmp_dir=args.tmp_dir)
+
+    try:
+        if args.merge_keys_files:
+            merge_keys_files(args.merge_keys_files, keys_writer)
+        elif args.input_files:
+            generate_keys_from_dumps(args.input_files)
+        else:
+            generate_keys_from_mongo(args, mongo_filter)
+
+        if args.rebuild or args.merge_keys_files:
+            print('[3] Writing aggregated keys...')
+            start = time.time()
+
+            bases = [b for t in sorted(citation_types) for b in BASES_BY_CITATION_TYPE[t]]
+            save_aggregated_data_to_mongo(keys_writer, bases)
+
+            end = time.time()
+            print('\tDone after %.2f seconds' % (end - start))
+    finally:
+        if keys_writer:
+            keys_writer.close()
+
+        if dedup_writer:
+            for name, stats in sorted(dedup_writer.stats().items()):
+                print('[Writer] %s: %d operations in %d flushes and %d bulk writes, %.2f seconds (max %.2f seconds per flush)' % (name, stats['operations'], stats['flushes'], stats['requests'], stats['seconds'], stats['max_seconds']))
+            dedup_writer.close()
+
+        if reporter:
+            reporter.close()
+
+        if profile_aggregator and profile_aggregator.samples:
+            profile_aggregator.dump(args.profile)
+            print('[Profile] %d batches profiled, statistics written to %s' % (profile_aggregator.samples, args.profile))
+            print(profile_aggregator.report())
 
 
 if __name__ == '__main__':
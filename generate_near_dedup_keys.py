@@ -0,0 +1,325 @@
+import argparse
+import os
+import textwrap
+import threading
+import time
+
+from datetime import datetime
+from multiprocessing import Pool
+from generate_dedup_keys import BASES_KEYS, MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX, MONGO_COLLECTION_REBUILD_SUFFIX, MONGO_DB_SEARCH_SCIELO, MONGO_URI, _bounded, iter_batches
+from pymongo import MongoClient
+from utils.near_duplicates import MinHasher, NearDuplicateClusters
+
+
+MONGO_NEAR_DEDUP_PREFIX = os.environ.get('MONGO_NEAR_DEDUP_PREFIX', 'near-')
+
+# Campos textuais, comparados por similaridade. Os demais campos das chaves (ano, volume, numero, pagina inicial)
+# devem coincidir exatamente e definem os blocos
+FUZZY_FIELDS = ['cleaned_first_author',
+                'cleaned_chapter_first_author',
+                'cleaned_title',
+                'cleaned_chapter_title',
+                'cleaned_journal_title',
+                'cleaned_source',
+                'cleaned_publisher',
+                'cleaned_publisher_address']
+
+TEXT_SEPARATOR = '|'
+
+num_perm = 40
+bands = 10
+threshold = 0.8
+shingle_size = 4
+max_bucket_size = 50
+max_block_size = 5000
+
+max_pending_batches = 2 * os.cpu_count()
+
+
+def get_base_fields(base):
+    """
+    Separa os campos das chaves de uma base em campos exatos (que definem os blocos) e campos textuais.
+
+    :param base: Nome da base
+    :return: Par (lista de campos exatos, lista de campos textuais), na ordem de BASES_KEYS[base]
+    """
+    exact_fields = [k for k in BASES_KEYS[base] if k not in FUZZY_FIELDS]
+    text_fields = [k for k in BASES_KEYS[base] if k in FUZZY_FIELDS]
+    return exact_fields, text_fields
+
+
+def iter_blocks(collection, exact_fields, text_fields, batch_size=1000, max_block_size=5000):
+    """
+    Le os grupos de citaçoes de uma coleçao de de-duplicaçao ordenados pelos campos exatos e os agrupa em blocos de
+    grupos com os mesmos valores nesses campos.
+
+    Alguns blocos podem ser muito grandes (por exemplo, na base book, todos os livros de um mesmo ano). Por isso, os
+    grupos de um bloco sao lidos ordenados tambem pelos campos textuais e o bloco e dividido em partes de no maximo
+    max_block_size grupos consecutivos. Quase duplicados separados pela divisao nao sao unidos, mas a ordenaçao
+    mantem proximos os grupos com o mesmo inicio de texto (mesmo primeiro autor, no caso de book e chapter).
+
+    :param collection: Coleçao de de-duplicaçao
+    :param exact_fields: Campos exatos da base
+    :param text_fields: Campos textuais da base
+    :param batch_size: Quantidade de documentos obtidos por lote do cursor
+    :param max_block_size: Quantidade maxima de grupos por bloco
+    :return: Gerador de blocos (listas de documentos com mais de um grupo)
+    """
+    sort = {'cit_keys.' + k: 1 for k in exact_fields + text_fields}
+    sort['_id'] = 1
+
+    cursor = collection.aggregate([{'$project': {'cit_keys': 1, 'cit_full_ids': 1, 'citing_docs': 1}},
+                                   {'$sort': sort}],
+                                  allowDiskUse=True,
+                                  batchSize=batch_size)
+    try:
+        block = []
+        block_values = None
+        for doc in cursor:
+            values = tuple(doc['cit_keys'].get(k) for k in exact_fields)
+            if values != block_values or len(block) >= max_block_size:
+                if len(block) > 1:
+                    yield block
+                block = []
+                block_values = values
+            block.append(doc)
+
+        if len(block) > 1:
+            yield block
+    finally:
+        cursor.close()
+
+
+def iter_block_batches(blocks, size):
+    """
+    Agrupa os blocos em lotes de aproximadamente size grupos, para reduzir a comunicaçao com os workers.
+    """
+    batch = []
+    total = 0
+    for block in blocks:
+        batch.append(block)
+        total += len(block)
+        if total >= size:
+            yield batch
+            batch = []
+            total = 0
+
+    if batch:
+        yield batch
+
+
+def merge_groups(groups, update_date):
+    """
+    Une os grupos de citaçoes quase duplicadas em um unico documento de de-duplicaçao.
+    O documento recebe o _id e os campos do maior grupo, e os _ids de todos os grupos em near_ids.
+
+    :param groups: Documentos de de-duplicaçao do componente
+    :param update_date: Data de atualizaçao do documento
+    :return: Documento de de-duplicaçao
+    """
+    groups = sorted(groups, key=lambda g: (-len(g['cit_full_ids']), g['_id']))
+
+    cit_full_ids = {}
+    citing_docs = {}
+    for g in groups:
+        cit_full_ids.update(dict.fromkeys(g['cit_full_ids']))
+        citing_docs.update(dict.fromkeys(g['citing_docs']))
+
+    return {'_id': groups[0]['_id'],
+            'cit_keys': groups[0]['cit_keys'],
+            'cit_full_ids': list(cit_full_ids),
+            'citing_docs': list(citing_docs),
+            'near_ids': [g['_id'] for g in groups],
+            'update_date': update_date}
+
+
+def find_near_duplicates(blocks, text_fields, update_date):
+    """
+    Encontra os grupos quase duplicados de cada bloco (ver NearDuplicateClusters).
+
+    :param blocks: Lista de blocos de documentos de de-duplicaçao
+    :param text_fields: Campos textuais comparados
+    :param update_date: Data de atualizaçao dos documentos gerados
+    :return: Par (documentos de de-duplicaçao gerados, estatisticas de comparaçao)
+    """
+    hasher = MinHasher(num_perm)
+
+    results = []
+    stats = {}
+    for block in blocks:
+        clusters = NearDuplicateClusters(hasher, bands, threshold, shingle_size, max_bucket_size)
+        for doc in block:
+            clusters.add(TEXT_SEPARATOR.join(doc['cit_keys'].get(k) or '' for k in text_fields))
+
+        for component in clusters.components():
+            results.append(merge_groups([block[i] for i in component], update_date))
+
+        for k, v in clusters.stats.items():
+            stats[k] = stats.get(k, 0) + v
+
+    return results, stats
+
+
+def _find_near_duplicates(args):
+    return find_near_duplicates(*args)
+
+
+def generate_near_dedup_keys(client, base, batch_size=1000):
+    """
+    Gera a coleçao de quase duplicados de uma base a partir de sua coleçao de de-duplicaçao exata.
+    Cada documento gerado une grupos exatos cujos campos exatos coincidem e cujos campos textuais sao similares.
+    Os documentos sao gravados em uma coleçao nova, que ao final substitui a atual. Alem do bloco em leitura, ate
+    max_pending_batches lotes de blocos ficam em memoria aguardando os workers.
+
+    :param client: Cliente Mongo
+    :param base: Nome da base
+    :param batch_size: Quantidade de grupos por lote enviado aos workers e por escrita
+    :return: Par (quantidade de documentos gerados, estatisticas de comparaçao)
+    """
+    exact_fields, text_fields = get_base_fields(base)
+    if not text_fields:
+        raise ValueError('Base sem campos textuais: %s' % base)
+
+    update_date = datetime.now().strftime('%Y-%m-%d')
+
+    db = client[MONGO_DB_SEARCH_SCIELO]
+    target_name = MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX + MONGO_NEAR_DEDUP_PREFIX + base
+    db.drop_collection(target_name + MONGO_COLLECTION_REBUILD_SUFFIX)
+    writer = db.create_collection(target_name + MONGO_COLLECTION_REBUILD_SUFFIX)
+
+    blocks = iter_blocks(db[MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX + base], exact_fields, text_fields, batch_size, max_block_size)
+    tasks = ((b, text_fields, update_date) for b in iter_block_batches(blocks, batch_size))
+
+    total = 0
+    stats = {}
+    semaphore = threading.Semaphore(max_pending_batches)
+    stop = threading.Event()
+    with Pool(os.cpu_count()) as p:
+        try:
+            for results, batch_stats in p.imap_unordered(_find_near_duplicates, _bounded(tasks, semaphore, stop)):
+                semaphore.release()
+
+                for documents in iter_batches(results, batch_size):
+                    writer.insert_many(documents, ordered=False)
+                total += len(results)
+
+                for k, v in batch_stats.items():
+                    stats[k] = stats.get(k, 0) + v
+        finally:
+            # Libera a thread do Pool eventualmente bloqueada em _bounded (ver generate_dedup_keys.generate_keys_by_stream)
+            stop.set()
+            semaphore.release()
+
+    writer.rename(target_name, dropTarget=True)
+
+    return total, stats
+
+
+def main():
+    usage = 'Gera coleçoes de citaçoes quase duplicadas (MinHash/LSH sobre os campos textuais limpos) a partir das ' \
+            'coleçoes de de-duplicaçao exata. Os resultados sao gravados em coleçoes separadas (%s%s<base>), que ' \
+            'podem ser mescladas com merge_solr.py --base %s<base>' % (MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX, MONGO_NEAR_DEDUP_PREFIX, MONGO_NEAR_DEDUP_PREFIX)
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '--bases',
+        default=','.join(BASES_KEYS),
+        help='Bases a serem processadas, separadas por virgula'
+    )
+
+    parser.add_argument(
+        '--threshold',
+        help='Indice de Jaccard minimo entre os shingles de dois grupos para que sejam unidos (padrao: 0.8)'
+    )
+
+    parser.add_argument(
+        '--bands',
+        help='Quantidade de faixas LSH das assinaturas (padrao: 10). Mais faixas encontram mais candidatos'
+    )
+
+    parser.add_argument(
+        '--rows',
+        help='Quantidade de permutaçoes MinHash por faixa (padrao: 4). Mais linhas encontram menos candidatos'
+    )
+
+    parser.add_argument(
+        '--shingle_size',
+        help='Tamanho, em caracteres, dos shingles (padrao: 4)'
+    )
+
+    parser.add_argument(
+        '--max_bucket_size',
+        help='Quantidade maxima de grupos comparados por bucket LSH (padrao: 50)'
+    )
+
+    parser.add_argument(
+        '--max_block_size',
+        help='Quantidade maxima de grupos com os mesmos campos exatos comparados entre si (padrao: 5000). Blocos '
+             'maiores sao divididos em partes de grupos consecutivos na ordem dos campos textuais'
+    )
+
+    parser.add_argument(
+        '--batch_size',
+        help='Quantidade de grupos por lote enviado aos workers e por escrita'
+    )
+
+    args = parser.parse_args()
+
+    global num_perm
+    global bands
+    global threshold
+    global shingle_size
+    global max_bucket_size
+    global max_block_size
+
+    rows = num_perm // bands
+    if args.bands and args.bands.isdigit() and int(args.bands) > 0:
+        bands = int(args.bands)
+
+    if args.rows and args.rows.isdigit() and int(args.rows) > 0:
+        rows = int(args.rows)
+
+    num_perm = bands * rows
+
+    if args.threshold:
+        try:
+            threshold = float(args.threshold)
+        except ValueError:
+            parser.error('--threshold deve ser um numero entre 0 e 1')
+        if not 0 < threshold <= 1:
+            parser.error('--threshold deve ser um numero entre 0 e 1')
+
+    if args.shingle_size and args.shingle_size.isdigit() and int(args.shingle_size) > 0:
+        shingle_size = int(args.shingle_size)
+
+    if args.max_bucket_size and args.max_bucket_size.isdigit() and int(args.max_bucket_size) > 0:
+        max_bucket_size = int(args.max_bucket_size)
+
+    if args.max_block_size and args.max_block_size.isdigit() and int(args.max_block_size) > 1:
+        max_block_size = int(args.max_block_size)
+
+    batch_size = 1000
+    if args.batch_size and args.batch_size.isdigit() and int(args.batch_size) > 0:
+        batch_size = int(args.batch_size)
+
+    client = MongoClient(MONGO_URI)
+    try:
+        for base in [b.strip() for b in args.bases.split(',') if b.strip()]:
+            if base not in BASES_KEYS:
+                print('Base invalida: %s' % base)
+                continue
+
+            print('Finding near duplicates of %s (threshold %.2f, %d bands x %d rows)...' % (base, threshold, bands, rows))
+            start = time.time()
+
+            total, stats = generate_near_dedup_keys(client, base, batch_size)
+
+            end = time.time()
+            print('\t%d documents, %d groups in blocks, %d comparisons, %d matches, %d full buckets' % (total, stats.get('texts', 0), stats.get('comparisons', 0), stats.get('matches', 0), stats.get('full_buckets', 0)))
+            print('\tDone after %.2f seconds' % (end - start))
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,14 @@ import argparse
 import datetime
 import logging
 import os
-import SolrAPI
 import textwrap
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
+from utils.metrics import SIZE_BUCKETS, Metrics, MetricsReporter
+from utils.solr_client import PooledSolr, SubmissionBuffer, UpdateDispatcher, json_loads
+from utils.union_find import KeyClusters
 
 
 MONGO_COLLECTION_DEDUP_PREFIX = os.environ.get('MONGO_DEDUP_COLLECTION_PREFIX', 'dedup')
@@ -15,178 +19,591 @@ MONGO_ARTICLES_ISSUES_COLLECTION = os.environ.get('MONGO_ARTICLES_ISSUES_COLLECT
 SOLR_URL = os.environ.get('SOLR_URL', 'http://localhost:8983/solr/articles')
 SOLR_ROWS_LIMIT = 2000
 
+BASES = ['article-issue', 'article-start_page', 'article-volume', 'book', 'chapter']
 
-def dump_deduping_data(data, filename, base):
-    with open(base + '-' + filename + '-' + datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S') + '.json', 'w') as f:
-        f.write(data)
+CROSS_BASE_NAME = 'cross-base'
 
+# Metricas da execuçao (None desativa a instrumentaçao)
+metrics = None
 
-def get_ids_for_merging(client: MongoClient, base):
-    logging.info('Getting IDs for merging...')
 
-    ids_for_merging = []
-
-    for j in client[MONGO_DB_DEDUP][MONGO_COLLECTION_DEDUP_PREFIX + '-' + base].find({'cit_full_ids.1': {'$exists': True}}):
+def dump_deduping_data(data, filename, base):
+    with open(base + '-' + filename + '-' + datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S.%f') + '.json', 'w') as f:
+        f.write(data)
 
-        item = {
-            '_id': j['_id'],
-            'cit_full_ids': j['cit_full_ids'],
-            'citing_docs': j['citing_docs']
-        }
 
-        if base == 'article-issue':
-            item.update({'cit_issue': j['cit_keys']['cleaned_issue']})
+BASES_EXTRA_KEYS = {'article-issue': ('cit_issue', 'cleaned_issue'),
+                    'article-start_page': ('cit_start_page', 'cleaned_start_page'),
+                    'article-volume': ('cit_volume', 'cleaned_volume')}
 
-        if base == 'article-start_page':
-            item.update({'cit_start_page': j['cit_keys']['cleaned_start_page']})
 
-        if base == 'article-volume':
-            item.update({'cit_volume': j['cit_keys']['cleaned_volume']})
+def get_ids_for_merging(client: MongoClient, base, batch_size=1000, update_date=None):
+    """
+    Obtem, sob demanda, os grupos de citaçoes (com mais de um membro) a serem mesclados.
+    Apenas os campos usados na mesclagem sao lidos, em lotes de batch_size documentos.
 
-        ids_for_merging.append(item)
+    :param client: Cliente Mongo
+    :param base: Nome da base de de-duplicaçao
+    :param batch_size: Quantidade de documentos obtidos por lote do cursor
+    :param update_date: Data (AAAA-MM-DD) a partir da qual os grupos atualizados sao considerados (opcional)
+    :return: Gerador de grupos de citaçoes
+    """
+    logging.info('Getting IDs for merging...')
 
-    logging.info('%d' % len(ids_for_merging))
-    return ids_for_merging
+    mongo_filter = {'cit_full_ids.1': {'$exists': True}}
+    if update_date:
+        mongo_filter['update_date'] = {'$gte': update_date}
+
+    projection = {'cit_full_ids': 1, 'citing_docs': 1}
+    if base in BASES_EXTRA_KEYS:
+        projection['cit_keys.' + BASES_EXTRA_KEYS[base][1]] = 1
+
+    total = 0
+    cursor = client[MONGO_DB_DEDUP][MONGO_COLLECTION_DEDUP_PREFIX + '-' + base].find(mongo_filter, projection, no_cursor_timeout=True).batch_size(batch_size)
+    try:
+        for j in cursor:
 
+            item = {
+                '_id': j['_id'],
+                'cit_full_ids': j['cit_full_ids'],
+                'citing_docs': j['citing_docs']
+            }
+
+            if base in BASES_EXTRA_KEYS:
+                item_key, cit_key = BASES_EXTRA_KEYS[base]
+                item[item_key] = j['cit_keys'][cit_key]
+
+            total += 1
+            yield item
+    finally:
+        cursor.close()
+
+    logging.info('%d' % total)
+
+
+def build_merge_plan(client: MongoClient, bases, batch_size=1000, update_date=None):
+    """
+    Une os grupos de citaçoes de varias bases em componentes conexos (uma citaçao presente em grupos de bases
+    diferentes une esses grupos), de modo que cada citaçao seja mesclada uma unica vez e o resultado nao dependa
+    da ordem das bases.
+
+    :param client: Cliente Mongo
+    :param bases: Nomes das bases de de-duplicaçao
+    :param batch_size: Quantidade de documentos obtidos por lote do cursor
+    :param update_date: Data (AAAA-MM-DD) a partir da qual os grupos atualizados sao considerados (opcional)
+    :return: Lista de grupos de citaçoes (no formato de get_ids_for_merging), um por componente
+    """
+    logging.info('Building cross-base merge plan...')
+
+    clusters = KeyClusters()
+    citing_docs_by_group = {}
+
+    total_groups = 0
+    for base in bases:
+        for dc in get_ids_for_merging(client, base, batch_size, update_date):
+            clusters.add_group(dc['cit_full_ids'])
+
+            first = clusters.indexes[dc['cit_full_ids'][0]]
+            citing_docs_by_group.setdefault(first, {}).update(dict.fromkeys(dc['citing_docs']))
+            total_groups += 1
+
+    citing_docs_by_component = {}
+    for first, citing_docs in citing_docs_by_group.items():
+        citing_docs_by_component.setdefault(clusters.union_find.find(first), {}).update(citing_docs)
+
+    plan = []
+    for root, cit_full_ids in clusters.components().items():
+        cit_full_ids = sorted(cit_full_ids)
+        plan.append({'_id': cit_full_ids[0],
+                     'cit_full_ids': cit_full_ids,
+                     'citing_docs': sorted(citing_docs_by_component[root])})
+
+    logging.info('%d groups, %d citations, %d components' % (total_groups, len(clusters.keys), len(plan)))
+    return plan
+
+
+def iter_batches(items, size):
+    """
+    Agrupa os itens de um iteravel em listas de tamanho size, sem materializar o iteravel.
+    """
+    batch = []
+    for i in items:
+        batch.append(i)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def select_by_ids(solr, ids):
+    """
+    Obtem os documentos Solr de uma lista de ids, com uma consulta (terms query parser, enviada via POST) a cada
+    SOLR_ROWS_LIMIT ids.
+
+    :param solr: Cliente Solr (PooledSolr)
+    :param ids: Ids dos documentos
+    :return: Lista de documentos, na ordem devolvida pelo Solr
+    """
+    docs = []
+
+    unique_ids = list(dict.fromkeys(ids))
+    for i in range(0, len(unique_ids), SOLR_ROWS_LIMIT):
+        chunk = unique_ids[i:i + SOLR_ROWS_LIMIT]
+        params = {'q': '{!terms f=id}' + ','.join(chunk), 'rows': len(chunk)}
+
+        response = solr.select(params)
+        dic = json_loads(response)
+
+        docs.extend(dic['response']['docs'])
+
+    return docs
+
+
+def group_by_ids(docs, groups_ids):
+    """
+    Separa os documentos obtidos em lote pelos grupos que os solicitaram, preservando a ordem devolvida pelo Solr.
+
+    :param docs: Documentos Solr
+    :param groups_ids: Lista com os ids de cada grupo
+    :return: Lista com os documentos de cada grupo
+    """
+    group_by_id = {}
+    for g, ids in enumerate(groups_ids):
+        for i in ids:
+            group_by_id.setdefault(i, []).append(g)
+
+    grouped = [[] for _ in groups_ids]
+    for d in docs:
+        for g in group_by_id.get(d['id'], []):
+            grouped[g].append(d)
+
+    return grouped
+
+
+def merge_cluster(dc, docs, base):
+    """
+    Mescla os documentos Solr de um grupo de citaçoes duplicadas.
+    Os valores dos campos multivalorados sao acumulados sem repetiçao (na ordem em que aparecem) e as listas finais
+    sao montadas uma unica vez por grupo.
+
+    :param dc: Grupo de citaçoes (ver get_ids_for_merging)
+    :param docs: Documentos Solr das citaçoes do grupo
+    :param base: Nome da base de de-duplicaçao
+    :return: Par (citaçao mesclada, ids das citaçoes a serem removidas)
+    """
+    ids_to_remove = set()
+    merged_citation = dict(docs[0])
+
+    if base == 'articles-start_page':
+        merged_citation['start_page'] = dc['cit_start_page']
+    elif base == 'articles-volume':
+        merged_citation['volume'] = dc['cit_volume']
+    elif base == 'articles-issue':
+        merged_citation['issue'] = dc['cit_issue']
 
-def merge_citations(solr, deduplicated_citations, base):
+    document_fk = dict.fromkeys(merged_citation['document_fk'])
+    collections = dict.fromkeys(merged_citation['in'])
+    document_fk_au = None
+    document_fk_ta = None
+
+    for d in docs[1:]:
+        document_fk.update(dict.fromkeys(d['document_fk']))
+        collections.update(dict.fromkeys(d['in']))
+
+        if 'document_fk_au' in d:
+            if document_fk_au is None:
+                document_fk_au = dict.fromkeys(merged_citation.get('document_fk_au', []))
+            document_fk_au.update(dict.fromkeys(d['document_fk_au']))
+
+        if 'document_fk_ta' in d:
+            if document_fk_ta is None:
+                document_fk_ta = dict.fromkeys(merged_citation.get('document_fk_ta', []))
+            document_fk_ta.update(dict.fromkeys(d['document_fk_ta']))
+
+        ids_to_remove.add(d['id'])
+
+    merged_citation['document_fk'] = list(document_fk)
+    merged_citation['total_received'] = str(len(document_fk))
+    merged_citation['in'] = list(collections)
+
+    if document_fk_au is not None:
+        merged_citation['document_fk_au'] = list(document_fk_au)
+
+    if document_fk_ta is not None:
+        merged_citation['document_fk_ta'] = list(document_fk_ta)
+
+    return merged_citation, ids_to_remove
+
+
+def merge_batch(solr, batch, base):
+    """
+    Obtem as citaçoes de um lote de grupos, mescla os grupos com mais de uma citaçao no Solr e obtem seus
+    documentos citantes.
+
+    :param solr: Cliente Solr
+    :param batch: Lista de grupos de citaçoes (ver get_ids_for_merging)
+    :param base: Nome da base de de-duplicaçao
+    :return: Lista de triplas (citaçao mesclada, ids das citaçoes a serem removidas, documentos citantes a serem
+    atualizados), uma por grupo mesclado
+    """
+    cits_docs = group_by_ids(select_by_ids(solr, [i for dc in batch for i in dc['cit_full_ids']]),
+                             [dc['cit_full_ids'] for dc in batch])
+
+    merged = []
+    for dc, docs in zip(batch, cits_docs):
+        if len(docs) > 1:
+            merged_citation, ids_to_remove = merge_cluster(dc, docs, base)
+            merged.append((dc, merged_citation, ids_to_remove))
+
+    citing_docs = group_by_ids(select_by_ids(solr, [i for dc, _, _ in merged for i in dc['citing_docs']]),
+                               [dc['citing_docs'] for dc, _, _ in merged])
+
+    results = []
+    for (dc, merged_citation, ids_to_remove), docs in zip(merged, citing_docs):
+        docs_for_updating = []
+        for d in docs:
+            updated_doc = {}
+            updated_doc['entity'] = 'document'
+            updated_doc['id'] = d['id']
+            updated_doc['citation_fk'] = {'remove': list(ids_to_remove), 'add': merged_citation['id']}
+
+            docs_for_updating.append(updated_doc)
+
+        results.append((merged_citation, ids_to_remove, docs_for_updating))
+
+    return results
+
+
+def iter_merged_batches(solr, deduplicated_citations, base, lookup_batch_size=100, max_inflight_selects=1):
+    """
+    Mescla os lotes de grupos de citaçoes com ate max_inflight_selects lotes em processamento simultaneo.
+    Os resultados sao entregues na ordem dos lotes.
+
+    :return: Gerador de pares (lote, resultado de merge_batch)
+    """
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_inflight_selects) as executor:
+        for batch in iter_batches(deduplicated_citations, lookup_batch_size):
+            pending.append((batch, executor.submit(merge_batch, solr, batch, base)))
+
+            if len(pending) >= max_inflight_selects:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+
+def get_flush_function(dispatcher, base, filename, delete=False):
+    """
+    Cria a funçao de envio de um SubmissionBuffer, que registra os dados enviados (dump_deduping_data) e os repassa
+    ao dispatcher.
+
+    :param dispatcher: UpdateDispatcher
+    :param base: Nome da base de de-duplicaçao
+    :param filename: Nome usado no arquivo de registro
+    :param delete: Indica se os itens sao ids de documentos a serem removidos
+    """
+    def flush(items):
+        encoded = b','.join(e for _, e in items)
+        if delete:
+            dump_deduping_data((b'{"delete":[' + encoded + b']}').decode('utf-8'), filename, base)
+            dispatcher.delete(items)
+        else:
+            dump_deduping_data((b'[' + encoded + b']').decode('utf-8'), filename, base)
+            dispatcher.update(items)
+
+    return flush
+
+
+def merge_citations(solr, deduplicated_citations, base, lookup_batch_size=100, max_inflight_selects=1, max_inflight_updates=1,
+                    flush_sizes=(1000, 1000, 1000), flush_bytes=10 * 1024 * 1024, commit_within=None, soft_commit=False):
+    """
+    Mescla, no Solr, as citaçoes de cada grupo de duplicadas e atualiza os documentos citantes.
+    Os grupos sao processados em lotes de lookup_batch_size: as citaçoes de todos os grupos do lote sao obtidas com
+    uma unica consulta, assim como os documentos citantes dos grupos mesclados.
+    As citaçoes mescladas, as atualizaçoes dos documentos citantes e as citaçoes removidas sao acumuladas em buffers
+    independentes, cada um enviado ao atingir seu tamanho maximo (em itens ou em bytes). As remoçoes sao enviadas
+    apenas apos a confirmaçao de todos os envios anteriores dos demais buffers.
+
+    :param solr: Cliente Solr (PooledSolr)
+    :param deduplicated_citations: Iteravel de grupos de citaçoes (ver get_ids_for_merging)
+    :param base: Nome da base de de-duplicaçao
+    :param lookup_batch_size: Quantidade de grupos por lote de consultas
+    :param max_inflight_selects: Quantidade maxima de lotes consultados simultaneamente
+    :param max_inflight_updates: Quantidade maxima de requisiçoes de atualizaçao simultaneas
+    :param flush_sizes: Quantidade maxima de citaçoes mescladas, de documentos atualizados e de citaçoes removidas por envio
+    :param flush_bytes: Tamanho maximo, em bytes, de cada envio
+    :param commit_within: Prazo, em milissegundos, para que o Solr efetive cada envio (dispensa o commit final)
+    :param soft_commit: Indica se o commit final deve ser um soft commit
+    """
     logging.info('Merging Solr documents...')
     counter = 1
 
-    cits_for_merging = []
-    docs_for_updating = []
-    cits_for_removing = set()
+    dispatcher = UpdateDispatcher(solr, max_inflight_updates, commit_within)
 
-    for dc in deduplicated_citations:
-        print('\r%d' % counter, end='')
-        counter += 1
-        key = dc['_id']
-        cit_full_ids = dc['cit_full_ids']
-        citing_docs = dc['citing_docs']
+    merged_size, updated_size, removed_size = flush_sizes
+    cits_for_merging = SubmissionBuffer(get_flush_function(dispatcher, base, 'cits_for_merging'), merged_size, flush_bytes)
+    docs_for_updating = SubmissionBuffer(get_flush_function(dispatcher, base, 'docs_for_updating'), updated_size, flush_bytes)
+    remove = get_flush_function(dispatcher, base, 'cits_for_removing', delete=True)
 
-        logging.info('Merging data for ID %s (CIT %s) (ART %s)' % (key, '#'.join(cit_full_ids), '#'.join(citing_docs)))
+    def flush_removals(items):
+        # As citaçoes so sao removidas apos a confirmaçao das citaçoes mescladas e das atualizaçoes dos documentos
+        # citantes dos seus grupos, que podem estar em outros buffers ou em outras filas do dispatcher
+        cits_for_merging.flush()
+        docs_for_updating.flush()
+        dispatcher.wait()
+        remove(items)
 
-        query = 'id:(%s)' % ' OR '.join(cit_full_ids)
+    cits_for_removing = SubmissionBuffer(flush_removals, removed_size, flush_bytes)
 
-        response = solr.select({'q': query, 'rows': SOLR_ROWS_LIMIT})
-        dic = eval(response)
+    try:
+        for batch, results in iter_merged_batches(solr, deduplicated_citations, base, lookup_batch_size, max_inflight_selects):
+            for dc in batch:
+                print('\r%d' % counter, end='')
+                counter += 1
 
-        ids_to_remove = set()
-        merged_citation = {}
+                logging.info('Merging data for ID %s (CIT %s) (ART %s)' % (dc['_id'], '#'.join(dc['cit_full_ids']), '#'.join(dc['citing_docs'])))
 
-        if len(dic['response']['docs']) > 1:
+            if metrics:
+                metrics.incr('clusters_total', len(batch))
+                metrics.incr('merged_clusters_total', len(results))
+                for dc in batch:
+                    metrics.observe('cluster_size', len(dc['cit_full_ids']), SIZE_BUCKETS)
 
-            merged_citation.update(dic['response']['docs'][0])
+            for merged_citation, ids_to_remove, updated_docs in results:
+                if metrics:
+                    metrics.incr('removed_citations_total', len(ids_to_remove))
+                    metrics.incr('updated_documents_total', len(updated_docs))
 
-            if base == 'articles-start_page':
-                merged_citation['start_page'] = dc['cit_start_page']
-            elif base == 'articles-volume':
-                merged_citation['volume'] = dc['cit_volume']
-            elif base == 'articles-issue':
-                merged_citation['issue'] = dc['cit_issue']
+                logging.debug('Adding id %s' % merged_citation['id'])
+                cits_for_merging.add(merged_citation['id'], merged_citation)
 
-            for d in dic['response']['docs'][1:]:
-                raw_d = d.copy()
-                merged_citation['document_fk'].extend(raw_d['document_fk'])
-                merged_citation['document_fk'] = list(set(merged_citation['document_fk']))
-                merged_citation['total_received'] = str(len(merged_citation['document_fk']))
+                for d in updated_docs:
+                    logging.debug('Updating id %s' % d['id'])
+                    docs_for_updating.add(d['id'], d)
 
-                merged_citation['in'].extend(d['in'])
-                merged_citation['in'] = list(set(merged_citation['in']))
+                for i in ids_to_remove:
+                    logging.debug('Removing id %s' % i)
+                    cits_for_removing.add(i, i)
 
-                if 'document_fk_au' in raw_d:
-                    if 'document_fk_au' not in merged_citation:
-                        merged_citation['document_fk_au'] = []
-                    merged_citation['document_fk_au'].extend(d['document_fk_au'])
-                    merged_citation['document_fk_au'] = list(set(merged_citation['document_fk_au']))
+        cits_for_merging.flush()
+        docs_for_updating.flush()
+        cits_for_removing.flush()
+    finally:
+        # Em caso de erro, as remoçoes ainda nao enviadas sao descartadas: as citaçoes continuam no indice, e uma nova
+        # execuçao pode mescla-las novamente
+        dispatcher.close()
 
-                if 'document_fk_ta' in raw_d:
-                    if 'document_fk_ta' not in merged_citation:
-                        merged_citation['document_fk_ta'] = []
-                    merged_citation['document_fk_ta'].extend(d['document_fk_ta'])
-                    merged_citation['document_fk_ta'] = list(set(merged_citation['document_fk_ta']))
+    if soft_commit:
+        solr.commit(soft=True)
+    elif not commit_within:
+        solr.commit()
 
-                ids_to_remove.add(raw_d['id'])
 
-            if merged_citation:
-                logging.debug('Adding id %s' % merged_citation['id'])
-                cits_for_merging.append(merged_citation)
+def main():
+    usage = """\
+        Mescla documentos Solr do tipo citation.
+        """
 
-            for i in ids_to_remove:
-                logging.debug('Removing id %s' % i)
-                cits_for_removing.add(i)
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
 
-            query = 'id:(%s)' % ' OR '.join(citing_docs)
-            response = solr.select({'q': query})
-            dic = eval(response)
+    parser.add_argument(
+        '--mongo_uri',
+        default=None,
+        dest='mongo_uri',
+        help='String de conexao a base Mongo no formato mongodb://[username:password@]host1[:port1][,...hostN[:portN]][/[defaultauthdb][?options]]'
+    )
 
-            for d in dic['response']['docs']:
-                logging.debug('Updating id %s' % d['id'])
-                updated_doc = {}
-                updated_doc['entity'] = 'document'
-                updated_doc['id'] = d['id']
-                updated_doc['citation_fk'] = {'remove': list(ids_to_remove), 'add': merged_citation['id']}
+    parser.add_argument(
+        '--base',
+        default=None,
+        dest='base'
+    )
 
-                docs_for_updating.append(updated_doc)
+    parser.add_argument(
+        '--bases',
+        default=None,
+        dest='bases',
+        help='Bases, separadas por virgula (ou all), cujos grupos sao unidos em componentes conexos e mesclados em uma '
+             'unica execuçao, em vez de --base'
+    )
 
-        if len(cits_for_merging) == 1000:
-            dump_deduping_data(str(cits_for_merging), 'cits_for_merging', base)
-            solr.update(str(cits_for_merging).encode('utf-8'), headers={'content-type': 'application/json'})
-            cits_for_merging = []
+    parser.add_argument(
+        '--batch_size',
+        default=None,
+        dest='batch_size',
+        help='Quantidade de grupos de citaçoes obtidos por lote do cursor Mongo (padrao: 1000)'
+    )
 
-            dump_deduping_data(str(docs_for_updating), 'docs_for_updating', base)
-            solr.update(str(docs_for_updating).encode('utf-8'), headers={'content-type': 'application/json'})
-            docs_for_updating = []
+    parser.add_argument(
+        '--lookup_batch_size',
+        default=None,
+        dest='lookup_batch_size',
+        help='Quantidade de grupos de citaçoes cujas citaçoes e documentos citantes sao obtidos com uma unica consulta Solr (padrao: 100)'
+    )
 
-            dump_deduping_data(str({'delete': {'query': 'id:(' + ' OR '.join(cits_for_removing) + ')'}}), 'cits_for_removing', base)
-            solr.delete('id:(' + ' OR '.join(cits_for_removing) + ')')
-            cits_for_removing = set()
+    parser.add_argument(
+        '--max_inflight_selects',
+        default=None,
+        dest='max_inflight_selects',
+        help='Quantidade maxima de lotes de grupos consultados no Solr simultaneamente (padrao: 1)'
+    )
 
-    if len(cits_for_merging) > 0:
-        dump_deduping_data(str(cits_for_merging), 'cits_for_merging', base)
-        solr.update(str(cits_for_merging).encode('utf-8'), headers={'content-type': 'application/json'})
+    parser.add_argument(
+        '--max_inflight_updates',
+        default=None,
+        dest='max_inflight_updates',
+        help='Quantidade maxima de requisiçoes de atualizaçao ao Solr simultaneas. Atualizaçoes de um mesmo documento '
+             'sao sempre enviadas em ordem (padrao: 1)'
+    )
 
-    if len(docs_for_updating) > 0:
-        dump_deduping_data(str(docs_for_updating), 'docs_for_updating', base)
-        solr.update(str(docs_for_updating).encode('utf-8'), headers={'content-type': 'application/json'})
+    parser.add_argument(
+        '--merged_flush_size',
+        default=None,
+        dest='merged_flush_size',
+        help='Quantidade de citaçoes mescladas por envio ao Solr (padrao: 1000)'
+    )
 
-    if len(cits_for_removing) > 0:
-        dump_deduping_data(str({'delete': {'query': 'id:(' + ' OR '.join(cits_for_removing) + ')'}}), 'cits_for_removing', base)
-        solr.delete('id:(' + ' OR '.join(cits_for_removing) + ')')
+    parser.add_argument(
+        '--updated_flush_size',
+        default=None,
+        dest='updated_flush_size',
+        help='Quantidade de atualizaçoes de documentos citantes por envio ao Solr (padrao: 1000)'
+    )
 
-    solr.commit()
+    parser.add_argument(
+        '--removed_flush_size',
+        default=None,
+        dest='removed_flush_size',
+        help='Quantidade de ids de citaçoes removidas por envio ao Solr (padrao: 1000)'
+    )
 
+    parser.add_argument(
+        '--flush_bytes',
+        default=None,
+        dest='flush_bytes',
+        help='Tamanho maximo, em bytes, de cada envio ao Solr (padrao: 10485760)'
+    )
 
-def main():
-    usage = """\
-        Mescla documentos Solr do tipo citation.
-        """
+    parser.add_argument(
+        '--commit_within',
+        default=None,
+        dest='commit_within',
+        help='Prazo, em milissegundos, para que o Solr efetive cada envio (commitWithin). Dispensa o commit final'
+    )
 
-    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+    parser.add_argument(
+        '--soft_commit',
+        action='store_true',
+        default=False,
+        dest='soft_commit',
+        help='Efetiva as alteraçoes ao final com um soft commit, em vez de um hard commit'
+    )
 
     parser.add_argument(
-        '--mongo_uri',
+        '--update_date',
         default=None,
-        dest='mongo_uri',
-        help='String de conexao a base Mongo no formato mongodb://[username:password@]host1[:port1][,...hostN[:portN]][/[defaultauthdb][?options]]'
+        dest='update_date',
+        help='Mescla apenas os grupos de citaçoes atualizados a partir desta data (AAAA-MM-DD)'
     )
 
     parser.add_argument(
-        '--base',
+        '--metrics_file',
         default=None,
-        dest='base'
+        dest='metrics_file',
+        help='Arquivo JSON lines ao qual as metricas da execuçao (latencias de consulta e atualizaçao do Solr, '
+             'histograma de tamanho dos grupos) sao acrescentadas periodicamente'
+    )
+
+    parser.add_argument(
+        '--metrics_interval',
+        default=None,
+        dest='metrics_interval',
+        help='Intervalo, em segundos, entre os registros de metricas (padrao: 10)'
+    )
+
+    parser.add_argument(
+        '--metrics_port',
+        default=None,
+        dest='metrics_port',
+        help='Porta local na qual as metricas sao servidas no formato de texto do Prometheus (/metrics)'
     )
 
     params = parser.parse_args()
 
-    logging.basicConfig(filename='merge_solr-' + datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S') + '.log', level=logging.DEBUG)
+    global metrics
 
-    client = MongoClient(params.mongo_uri)
-    ids_to_merge = get_ids_for_merging(client, params.base)
+    if params.base and params.bases:
+        parser.error('--base nao pode ser combinado com --bases')
 
-    solr = SolrAPI.Solr(SOLR_URL, timeout=100)
+    logging.basicConfig(filename='merge_solr-' + datetime.datetime.now().strftime('%Y-%m-%d-%H:%M:%S') + '.log', level=logging.DEBUG)
 
-    merge_citations(solr, ids_to_merge, params.base)
+    client = MongoClient(params.mongo_uri)
+    batch_size = 1000
+    if params.batch_size and params.batch_size.isdigit() and int(params.batch_size) > 0:
+        batch_size = int(params.batch_size)
+
+    base = params.base
+    if params.bases:
+        bases = BASES if params.bases == 'all' else [b.strip() for b in params.bases.split(',') if b.strip()]
+        ids_to_merge = build_merge_plan(client, bases, batch_size, params.update_date)
+        base = CROSS_BASE_NAME
+    else:
+        ids_to_merge = get_ids_for_merging(client, base, batch_size, params.update_date)
+
+    lookup_batch_size = 100
+    if params.lookup_batch_size and params.lookup_batch_size.isdigit() and int(params.lookup_batch_size) > 0:
+        lookup_batch_size = int(params.lookup_batch_size)
+
+    max_inflight_selects = 1
+    if params.max_inflight_selects and params.max_inflight_selects.isdigit() and int(params.max_inflight_selects) > 0:
+        max_inflight_selects = int(params.max_inflight_selects)
+
+    max_inflight_updates = 1
+    if params.max_inflight_updates and params.max_inflight_updates.isdigit() and int(params.max_inflight_updates) > 0:
+        max_inflight_updates = int(params.max_inflight_updates)
+
+    flush_sizes = []
+    for flush_size in [params.merged_flush_size, params.updated_flush_size, params.removed_flush_size]:
+        if flush_size and flush_size.isdigit() and int(flush_size) > 0:
+            flush_sizes.append(int(flush_size))
+        else:
+            flush_sizes.append(1000)
+
+    flush_bytes = 10 * 1024 * 1024
+    if params.flush_bytes and params.flush_bytes.isdigit() and int(params.flush_bytes) > 0:
+        flush_bytes = int(params.flush_bytes)
+
+    commit_within = None
+    if params.commit_within and params.commit_within.isdigit() and int(params.commit_within) > 0:
+        commit_within = int(params.commit_within)
+
+    reporter = None
+    metrics_port = int(params.metrics_port) if params.metrics_port and params.metrics_port.isdigit() else None
+    if params.metrics_file or metrics_port:
+        metrics_interval = 10
+        if params.metrics_interval and params.metrics_interval.isdigit() and int(params.metrics_interval) > 0:
+            metrics_interval = int(params.metrics_interval)
+
+        metrics = Metrics()
+        reporter = MetricsReporter(metrics, 'merge_solr', params.metrics_file, metrics_interval, metrics_port)
+        reporter.start()
+
+    solr = PooledSolr(SOLR_URL, timeout=100, pool_size=max_inflight_selects + max_inflight_updates, metrics=metrics)
+
+    try:
+        merge_citations(solr, ids_to_merge, base, lookup_batch_size, max_inflight_selects, max_inflight_updates,
+                        flush_sizes, flush_bytes, commit_within, params.soft_commit)
+    finally:
+        solr.close()
+
+        if reporter:
+            reporter.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import argparse
+import os
+import textwrap
+
+from generate_dedup_keys import BASES_KEYS, KEY_FORMATS, MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX, MONGO_DB_SEARCH_SCIELO, MONGO_URI, convert_key
+from pymongo import MongoClient
+from utils.mongo_writer import DedupCollectionsWriter
+
+
+MONGO_COLLECTION_MIGRATION_SUFFIX = os.environ.get('MONGO_COLLECTION_MIGRATION_SUFFIX', '-migrated')
+
+
+def migrate_base(client, writer, base, key_format, batch_size=1000):
+    """
+    Converte as chaves (_id) de uma coleçao de de-duplicaçao para key_format, gravando os documentos em uma coleçao
+    temporaria que, ao final, substitui a coleçao original.
+    Documentos cujas chaves convertidas coincidem (possivel no formato fp128) sao unidos.
+
+    :param client: Cliente Mongo
+    :param writer: Escritor das coleçoes de de-duplicaçao (DedupCollectionsWriter)
+    :param base: Nome da base
+    :param key_format: Formato de destino das chaves
+    :param batch_size: Quantidade de documentos convertidos por escrita
+    :return: Quantidade de documentos lidos
+    """
+    source_name = MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX + base
+    migrated_base = base + MONGO_COLLECTION_MIGRATION_SUFFIX
+
+    db = client[MONGO_DB_SEARCH_SCIELO]
+    db.drop_collection(source_name + MONGO_COLLECTION_MIGRATION_SUFFIX)
+
+    total = 0
+    mgdocs = {}
+    for doc in db[source_name].find(no_cursor_timeout=True).batch_size(batch_size):
+        new_doc = mgdocs.setdefault(convert_key(doc['_id'], key_format), {'cit_full_ids': [], 'citing_docs': []})
+        new_doc['cit_full_ids'].extend(doc.get('cit_full_ids', []))
+        new_doc['citing_docs'].extend(doc.get('citing_docs', []))
+        new_doc['cit_keys'] = doc.get('cit_keys')
+        new_doc['update_date'] = doc.get('update_date')
+
+        total += 1
+        if len(mgdocs) >= batch_size:
+            writer.write({migrated_base: mgdocs})
+            mgdocs = {}
+
+    if mgdocs:
+        writer.write({migrated_base: mgdocs})
+
+    if total:
+        db[source_name + MONGO_COLLECTION_MIGRATION_SUFFIX].rename(source_name, dropTarget=True)
+
+    return total
+
+
+def main():
+    usage = 'Converte as chaves das coleçoes de de-duplicaçao existentes para o formato binario'
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '--key_format',
+        choices=[k for k in KEY_FORMATS if k != 'hex'],
+        default='binary',
+        help='Formato de destino das chaves: binary (digest SHA3_224) ou fp128 (fingerprint de 128 bits)'
+    )
+
+    parser.add_argument(
+        '--bases',
+        default=','.join(BASES_KEYS),
+        help='Bases a serem convertidas, separadas por virgula'
+    )
+
+    parser.add_argument(
+        '--write_batch_size',
+        help='Quantidade de documentos convertidos por escrita'
+    )
+
+    args = parser.parse_args()
+
+    batch_size = 1000
+    if args.write_batch_size and args.write_batch_size.isdigit() and int(args.write_batch_size) > 0:
+        batch_size = int(args.write_batch_size)
+
+    client = MongoClient(MONGO_URI)
+    writer = DedupCollectionsWriter(client, MONGO_DB_SEARCH_SCIELO, MONGO_COLLECTION_DEDUPLICATED_CITATIONS_PREFIX, batch_size=batch_size)
+
+    try:
+        for base in [b.strip() for b in args.bases.split(',') if b.strip()]:
+            if base not in BASES_KEYS:
+                print('Base invalida: %s' % base)
+                continue
+
+            print('Migrating %s to %s keys...' % (base, args.key_format))
+            print('%d documents converted' % migrate_base(client, writer, base, args.key_format, batch_size))
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    main()
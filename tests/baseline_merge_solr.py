@@ -0,0 +1,49 @@
+# Copia de referencia de merge_solr.merge_cluster anterior a mesclagem em uma unica passagem, usada apenas nos testes de
+# equivalencia (tests/test_merge_solr.py). Nao deve ser alterada.
+
+
+def merge_cluster(dc, docs, base):
+    """
+    Mescla os documentos Solr de um grupo de citaçoes duplicadas.
+
+    :param dc: Grupo de citaçoes (ver get_ids_for_merging)
+    :param docs: Documentos Solr das citaçoes do grupo
+    :param base: Nome da base de de-duplicaçao
+    :return: Par (citaçao mesclada, ids das citaçoes a serem removidas)
+    """
+    ids_to_remove = set()
+    merged_citation = {}
+
+    merged_citation.update(docs[0])
+
+    if base == 'articles-start_page':
+        merged_citation['start_page'] = dc['cit_start_page']
+    elif base == 'articles-volume':
+        merged_citation['volume'] = dc['cit_volume']
+    elif base == 'articles-issue':
+        merged_citation['issue'] = dc['cit_issue']
+
+    for d in docs[1:]:
+        raw_d = d.copy()
+        merged_citation['document_fk'].extend(raw_d['document_fk'])
+        merged_citation['document_fk'] = list(set(merged_citation['document_fk']))
+        merged_citation['total_received'] = str(len(merged_citation['document_fk']))
+
+        merged_citation['in'].extend(d['in'])
+        merged_citation['in'] = list(set(merged_citation['in']))
+
+        if 'document_fk_au' in raw_d:
+            if 'document_fk_au' not in merged_citation:
+                merged_citation['document_fk_au'] = []
+            merged_citation['document_fk_au'].extend(d['document_fk_au'])
+            merged_citation['document_fk_au'] = list(set(merged_citation['document_fk_au']))
+
+        if 'document_fk_ta' in raw_d:
+            if 'document_fk_ta' not in merged_citation:
+                merged_citation['document_fk_ta'] = []
+            merged_citation['document_fk_ta'].extend(d['document_fk_ta'])
+            merged_citation['document_fk_ta'] = list(set(merged_citation['document_fk_ta']))
+
+        ids_to_remove.add(raw_d['id'])
+
+    return merged_citation, ids_to_remove
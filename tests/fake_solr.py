@@ -0,0 +1,154 @@
+import json
+import re
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeSolr(object):
+    """
+    Servidor HTTP local que simula, em memoria, as operaçoes do Solr usadas por merge_solr.py: consultas por ids
+    (terms query ou id:(... OR ...)), atualizaçoes JSON (documentos completos e atualizaçoes atomicas add/remove),
+    remoçoes por id ou por consulta e commits. Registra a quantidade de requisiçoes por tipo e responde com o status 500
+    quando uma operaçao lança uma exceçao.
+    """
+
+    def __init__(self, docs, latency=0.0):
+        """
+        :param docs: Documentos iniciais do indice
+        :param latency: Atraso, em segundos, aplicado a cada requisiçao
+        """
+        self.index = {d['id']: dict(d) for d in docs}
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = {'select': 0, 'update': 0, 'delete': 0, 'commit': 0}
+        self.server = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/solr/articles' % self.server.server_address[1]
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def select(self, params):
+        query = params.get('q', [''])[0].strip()
+        rows = int(params.get('rows', ['10'])[0])
+
+        if query.startswith('{!terms f=id}'):
+            ids = query[len('{!terms f=id}'):].split(',')
+        else:
+            match = re.match(r'id:\((.*)\)$', query, re.S)
+            ids = match.group(1).split(' OR ') if match else []
+
+        with self.lock:
+            self.requests['select'] += 1
+            docs = [dict(self.index[i]) for i in dict.fromkeys(ids) if i in self.index]
+
+        return {'response': {'numFound': len(docs), 'docs': docs[:rows]}}
+
+    def update(self, body, params):
+        body = body.strip()
+
+        with self.lock:
+            if params.get('commit') or params.get('softCommit') or body.startswith('<commit'):
+                self.requests['commit'] += 1
+
+            if body.startswith('<delete>'):
+                self.requests['delete'] += 1
+                match = re.search(r'<query>\s*id:\((.*)\)\s*</query>', body, re.S)
+                for i in (match.group(1).split(' OR ') if match else []):
+                    self.index.pop(i, None)
+
+            elif body and not body.startswith('<'):
+                data = json.loads(body)
+                if isinstance(data, dict):
+                    self.requests['delete'] += 1
+                    for i in data.get('delete', []):
+                        self.index.pop(i, None)
+                else:
+                    self.requests['update'] += 1
+                    for doc in data:
+                        self._apply(doc)
+
+    def _apply(self, doc):
+        if not any(isinstance(v, dict) for v in doc.values()):
+            self.index[doc['id']] = doc
+            return
+
+        current = self.index.get(doc['id'])
+        if current is None:
+            return
+
+        for field, value in doc.items():
+            if not isinstance(value, dict):
+                current[field] = value
+                continue
+
+            values = list(current.get(field, []))
+            if 'remove' in value:
+                removed = value['remove'] if isinstance(value['remove'], list) else [value['remove']]
+                values = [v for v in values if v not in removed]
+            if 'add' in value:
+                values.extend(value['add'] if isinstance(value['add'], list) else [value['add']])
+            current[field] = values
+
+
+def _make_handler(solr):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, obj):
+            data = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, params, body):
+            if solr.latency:
+                threading.Event().wait(solr.latency)
+
+            path = urlparse(self.path).path
+            try:
+                if path.endswith('/select'):
+                    self._send(solr.select(params))
+                elif path.endswith('/update'):
+                    solr.update(body, params)
+                    self._send({'responseHeader': {'status': 0}})
+                else:
+                    self._send_status(404)
+            except Exception:
+                self._send_status(500)
+
+        def _send_status(self, code):
+            self.send_response(code)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_GET(self):
+            self._handle(parse_qs(urlparse(self.path).query), '')
+
+        def do_POST(self):
+            params = parse_qs(urlparse(self.path).query)
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+
+            if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                params.update(parse_qs(body))
+                body = ''
+
+            self._handle(params, body)
+
+    return Handler
@@ -0,0 +1,59 @@
+import importlib
+import sys
+import threading
+
+import mongomock
+
+from tests.synthetic import generate_articles
+
+
+def load_generate_dedup_keys(client):
+    """
+    Recarrega generate_dedup_keys (cujas configuraçoes sao globais do modulo) apontando as conexoes Mongo para client.
+    """
+    import generate_dedup_keys
+    module = importlib.reload(generate_dedup_keys)
+    module.MongoClient = lambda *args, **kwargs: client
+    return module
+
+
+def make_client(n_docs=60, seed=1):
+    client = mongomock.MongoClient()
+    client['ami']['articles-issues'].insert_many(generate_articles(n_docs=n_docs, seed=seed, citations_per_doc=(2, 6)))
+    return client
+
+
+def run_with_timeout(function, timeout=60):
+    """
+    Executa function em uma thread, falhando caso a execuçao nao termine em timeout segundos.
+
+    :return: Excecao lançada por function ou None
+    """
+    outcome = {}
+
+    def target():
+        try:
+            function()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        raise AssertionError('%s did not finish after %d seconds' % (function.__name__, timeout))
+
+    return outcome.get('error')
+
+
+def run_main(module, argv, timeout=60):
+    """
+    Executa module.main() com os argumentos argv (ver run_with_timeout).
+    """
+    old_argv = sys.argv
+    sys.argv = [module.__name__ + '.py'] + argv
+    try:
+        return run_with_timeout(module.main, timeout)
+    finally:
+        sys.argv = old_argv
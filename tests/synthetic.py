@@ -0,0 +1,184 @@
+import random
+
+
+COLLECTIONS = ['scl', 'arg', 'col', 'mex', 'prt']
+
+SURNAMES = ['Silva', 'Souza', 'Santos', 'Oliveira', 'Pereira', 'Lima', 'Costa', 'Gonçalves', 'Péres', 'Almeida',
+            'Rodríguez', 'García', 'Martínez', 'Smith', 'Jones', 'Müller', 'Ferreira', 'Araújo', 'Barbosa', 'Ribeiro']
+
+GIVEN_NAMES = ['João', 'Ana M', 'Maria', 'José Carlos', 'Luiz', 'Fernanda', 'Paulo R', 'Carla', 'A', 'J M']
+
+JOURNALS = ['Rev. Saúde Pública', 'Cad. Saúde Pública', 'Ciência &amp; Saúde Coletiva', 'J. Biol. Chem.',
+            'Rev. bras. epidemiol.', 'Mem. Inst. Oswaldo Cruz', 'Lancet', 'N. Engl. J. Med.', 'Rev. Latino-Am. Enfermagem',
+            'Arq. Bras. Cardiol.', 'Pesqui. Vet. Bras.', 'Ciênc. Rural']
+
+WORDS = ['estudo', 'análise', 'saúde', 'Brasil', 'população', 'crianças', 'fatores', 'risco', 'avaliação', 'qualidade',
+         'vida', 'hospital', 'escolas', 'água', 'solo', 'milho', 'doença', 'crônica', 'idosos', 'mulheres', 'study',
+         'analysis', 'health', 'effects', 'treatment', 'patients', 'cohort', 'prevalence', 'associated', 'factors']
+
+PUBLISHERS = [('Fiocruz', 'Rio de Janeiro'), ('Hucitec', 'São Paulo'), ('Artmed', 'Porto Alegre'),
+              ('Elsevier', 'Amsterdam'), ('Editora UFMG', 'Belo Horizonte'), ('Guanabara Koogan', 'Rio de Janeiro')]
+
+
+def _title(r, size):
+    return ' '.join(r.choice(WORDS) for _ in range(size)).capitalize()
+
+
+def _vary(r, text):
+    """
+    Variaçoes de grafia removidas pela limpeza (caixa, espaços, pontuaçao final), que nao alteram as chaves.
+    """
+    choice = r.random()
+    if choice < 0.2:
+        return text.upper()
+    if choice < 0.35:
+        return '  ' + text + '.'
+    if choice < 0.45:
+        return text.replace(' ', '  ')
+    return text
+
+
+def _typo(r, text):
+    i = r.randrange(len(text))
+    return text[:i] + r.choice('abcdefghijklmnopqrstuvwxyz') + text[i + 1:]
+
+
+def _new_work(r, article_ratio, chapter_ratio):
+    year = r.randint(1960, 2022)
+    authors = [{'s': r.choice(SURNAMES), 'n': r.choice(GIVEN_NAMES)} for _ in range(r.randint(1, 4))]
+
+    kind = r.random()
+    if kind < article_ratio:
+        first_page = r.randint(1, 900)
+        return {'type': 'article', 'year': year, 'authors': authors, 'title': _title(r, r.randint(4, 14)),
+                'journal': r.choice(JOURNALS), 'volume': str(r.randint(1, 120)), 'issue': str(r.randint(1, 12)),
+                'pages': '%d-%d' % (first_page, first_page + r.randint(1, 20))}
+
+    publisher, city = r.choice(PUBLISHERS)
+    work = {'type': 'book', 'year': year, 'authors': authors, 'title': _title(r, r.randint(2, 8)),
+            'publisher': publisher, 'city': city, 'volume': str(r.randint(1, 3)) if r.random() < 0.2 else None}
+
+    if kind < article_ratio + chapter_ratio:
+        work['type'] = 'chapter'
+        work['chapter_title'] = _title(r, r.randint(3, 10))
+        work['chapter_authors'] = [{'s': r.choice(SURNAMES), 'n': r.choice(GIVEN_NAMES)} for _ in range(r.randint(1, 2))]
+
+    return work
+
+
+def _render_citation(r, work, number, typo_rate):
+    """
+    Monta o registro ISIS (campos v*) de uma citaçao de uma obra.
+    """
+    title = _vary(r, work['title'])
+    if r.random() < typo_rate:
+        title = _typo(r, title)
+
+    citation = {'v880': [{'_': number}], 'v65': [{'_': '%d0000' % work['year']}]}
+
+    if work['type'] == 'article':
+        citation['v10'] = [dict(a) for a in work['authors']]
+        citation['v12'] = [{'_': title}]
+        citation['v30'] = [{'_': _vary(r, work['journal'])}]
+        citation['v31'] = [{'_': work['volume']}]
+        citation['v32'] = [{'_': work['issue']}]
+        citation['v14'] = [{'_': work['pages']}]
+        return citation
+
+    citation['v18'] = [{'_': title}]
+    citation['v62'] = [{'_': work['publisher']}]
+    citation['v66'] = [{'_': work['city']}]
+    if work['volume']:
+        citation['v31'] = [{'_': work['volume']}]
+
+    if work['type'] == 'chapter':
+        citation['v12'] = [{'_': _vary(r, work['chapter_title'])}]
+        citation['v10'] = [dict(a) for a in work['chapter_authors']]
+        citation['v16'] = [dict(a) for a in work['authors']]
+    else:
+        citation['v16'] = [dict(a) for a in work['authors']]
+
+    return citation
+
+
+def generate_articles(n_docs=1000, seed=1, citations_per_doc=(5, 40), duplication_rate=0.3, typo_rate=0.02,
+                      article_ratio=0.7, chapter_ratio=0.1):
+    """
+    Gera, de forma reprodutivel, documentos citantes no formato da coleçao Mongo de artigos (registros ISIS), com
+    citaçoes de artigos, livros e capitulos.
+
+    Cada citaçao refere uma obra nova ou, com probabilidade duplication_rate, uma obra ja citada (escolhida com
+    preferencia pelas mais citadas, como ocorre nas referencias reais). As citaçoes de uma mesma obra variam em caixa,
+    espaços e pontuaçao (variaçoes que a limpeza remove) e, com probabilidade typo_rate, recebem um erro de digitaçao
+    no titulo.
+
+    :param n_docs: Quantidade de documentos citantes
+    :param seed: Semente do gerador
+    :param citations_per_doc: Quantidade minima e maxima de citaçoes por documento
+    :param duplication_rate: Probabilidade de uma citaçao referir uma obra ja citada
+    :param typo_rate: Probabilidade de erro de digitaçao no titulo de uma citaçao
+    :param article_ratio: Proporçao de artigos entre as obras
+    :param chapter_ratio: Proporçao de capitulos entre as obras (as demais sao livros)
+    :return: Lista de documentos
+    """
+    r = random.Random(seed)
+
+    works = []
+    # Indices das obras de todas as citaçoes ja geradas: a escolha uniforme nesta lista favorece as obras mais citadas
+    cited = []
+    documents = []
+    for i in range(n_docs):
+        collection = r.choice(COLLECTIONS)
+        pid = 'S%04d-%04d%04d%09d' % (r.randint(0, 9999), r.randint(0, 9999), r.randint(1990, 2022), i)
+
+        citations = []
+        for j in range(r.randint(*citations_per_doc)):
+            if cited and r.random() < duplication_rate:
+                k = r.choice(cited)
+            else:
+                works.append(_new_work(r, article_ratio, chapter_ratio))
+                k = len(works) - 1
+            cited.append(k)
+
+            citations.append(_render_citation(r, works[k], '%s%05d' % (pid, j + 1), typo_rate))
+
+        document = {'_id': pid + '-' + collection,
+                    'collection': collection,
+                    'processing_date': '%d-%02d-%02d' % (r.randint(2015, 2022), r.randint(1, 12), r.randint(1, 28)),
+                    'publication_date': '%d-%02d-%02d' % (r.randint(1990, 2022), r.randint(1, 12), r.randint(1, 28)),
+                    'article': {'v880': [{'_': pid}], 'v992': [{'_': collection}]},
+                    'title': {'v992': [{'_': collection}]}}
+        if citations:
+            document['citations'] = citations
+
+        documents.append(document)
+
+    return documents
+
+
+def generate_solr_documents(documents):
+    """
+    Gera os documentos Solr (documentos citantes e citaçoes) correspondentes aos documentos citantes sinteticos, com os
+    mesmos ids usados nas chaves de de-duplicaçao.
+
+    :param documents: Documentos gerados por generate_articles
+    :return: Lista de documentos Solr
+    """
+    solr_docs = []
+    for document in documents:
+        doc_id = document['article']['v880'][0]['_'] + '-' + document['collection']
+
+        citation_fk = []
+        for citation in document.get('citations', []):
+            cit_id = citation['v880'][0]['_'] + '-' + document['collection']
+            citation_fk.append(cit_id)
+
+            solr_docs.append({'id': cit_id,
+                              'entity': 'citation',
+                              'document_fk': [doc_id],
+                              'in': [document['collection']],
+                              'total_received': '1'})
+
+        solr_docs.append({'id': doc_id, 'entity': 'document', 'in': [document['collection']], 'citation_fk': citation_fk})
+
+    return solr_docs
@@ -0,0 +1,39 @@
+import unittest
+
+from bson import ObjectId, encode, json_util
+from datetime import datetime
+
+from tests.synthetic import generate_articles
+from utils.dump_files import decode_raw_record, get_shard
+
+
+class DecodeRawRecordTest(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = generate_articles(n_docs=20, seed=2)
+        for document in self.documents:
+            document['_id'] = ObjectId()
+            document['updated_at'] = datetime(2021, 5, 3, 12, 30)
+
+    def test_extended_json(self):
+        for document in self.documents:
+            record = json_util.dumps(document).encode()
+            self.assertEqual(decode_raw_record(record, 'jsonl'), document)
+
+    def test_plain_json(self):
+        document = generate_articles(n_docs=1, seed=2)[0]
+        self.assertEqual(decode_raw_record(json_util.dumps(document).encode() + b'\n', 'jsonl'), document)
+
+    def test_bson(self):
+        for document in self.documents:
+            self.assertEqual(decode_raw_record(encode(document), 'bson'), document)
+
+    def test_shard_matches_mongo_id(self):
+        for document in self.documents:
+            decoded = decode_raw_record(json_util.dumps(document).encode(), 'jsonl')
+            for shard_count in (2, 3, 7):
+                self.assertEqual(get_shard(decoded['_id'], shard_count), get_shard(document['_id'], shard_count))
+
+
+if __name__ == '__main__':
+    unittest.main()
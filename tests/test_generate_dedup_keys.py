@@ -0,0 +1,63 @@
+import unittest
+
+from tests.helpers import load_generate_dedup_keys, make_client, run_main
+
+
+class StreamFailureTest(unittest.TestCase):
+
+    def test_worker_error_is_raised(self):
+        client = make_client()
+        client['ami']['articles-issues'].update_one({}, {'$unset': {'article': ''}})
+        g = load_generate_dedup_keys(client)
+
+        error = run_main(g, ['-a', '--skip_standardizer', '--stream', '-n', '5', '--max_pending_batches', '2'])
+
+        self.assertIsInstance(error, KeyError)
+
+    def test_write_error_stops_extraction(self):
+        client = make_client(n_docs=200)
+        g = load_generate_dedup_keys(client)
+        g.citation_types.add('article')
+        g.use_standardizer = False
+        g.batch_size = 2
+        g.chunk_size = 2
+        g.max_pending_batches = 2
+
+        def fail(data):
+            raise IOError('write failed')
+
+        g.save_data = fail
+
+        served = []
+
+        def batches():
+            for number, batch in g._numbered_batches(client['ami']['articles-issues'].find({}, {'_id': 1})):
+                served.append(number)
+                yield number, batch
+
+        with self.assertRaises(IOError):
+            g.generate_keys_by_stream(batches())
+
+        self.assertLess(len(served), 100)
+
+
+class ArgumentsTest(unittest.TestCase):
+
+    def assertRejected(self, argv):
+        g = load_generate_dedup_keys(make_client(n_docs=1))
+        error = run_main(g, ['-a', '--skip_standardizer'] + argv)
+        self.assertIsInstance(error, SystemExit)
+        self.assertEqual(error.code, 2)
+
+    def test_rebuild_with_shards(self):
+        self.assertRejected(['--rebuild', '--shard_count', '2', '--shard_index', '0'])
+
+    def test_rebuild_with_from_date(self):
+        self.assertRejected(['--rebuild', '--from_date', '2020-01-01'])
+
+    def test_input_files_with_from_date(self):
+        self.assertRejected(['--input_files', 'articles.jsonl', '--from_date', '2020-01-01'])
+
+
+if __name__ == '__main__':
+    unittest.main()
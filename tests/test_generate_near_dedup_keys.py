@@ -0,0 +1,121 @@
+import unittest
+
+import mongomock
+
+import generate_near_dedup_keys as near
+
+from tests.helpers import run_with_timeout
+from utils.near_duplicates import NearDuplicateClusters
+
+
+def make_group(_id, year, author, title):
+    return {'_id': _id,
+            'cit_keys': {'cleaned_publication_date': year, 'cleaned_first_author': author, 'cleaned_source': title,
+                         'cleaned_publisher': 'fiocruz', 'cleaned_publisher_address': 'rio de janeiro'},
+            'cit_full_ids': ['c-' + _id],
+            'citing_docs': ['d-' + _id]}
+
+
+class IterBlocksTest(unittest.TestCase):
+
+    def test_large_blocks_are_split(self):
+        collection = mongomock.MongoClient()['citations']['dedup-book']
+        collection.insert_many([make_group('%03d' % i, '2000', 'silva %03d' % i, 'saude publica') for i in range(25)])
+        collection.insert_many([make_group('x%03d' % i, '2001', 'souza', 'saude coletiva') for i in range(3)])
+
+        exact_fields, text_fields = near.get_base_fields('book')
+        blocks = list(near.iter_blocks(collection, exact_fields, text_fields, max_block_size=10))
+
+        self.assertEqual([len(b) for b in blocks], [10, 10, 5, 3])
+        self.assertEqual([d['_id'] for d in blocks[0]], ['%03d' % i for i in range(10)])
+
+
+class GenerateNearDedupKeysTest(unittest.TestCase):
+
+    def test_worker_error_is_raised(self):
+        client = mongomock.MongoClient()
+        groups = [make_group('%03d' % i, str(1990 + i % 5), 'silva', 'saude publica') for i in range(50)]
+        groups[7]['cit_keys']['cleaned_source'] = 12
+        client['citations']['dedup-book'].insert_many(groups)
+
+        old_max_pending_batches = near.max_pending_batches
+        near.max_pending_batches = 1
+        try:
+            error = run_with_timeout(lambda: near.generate_near_dedup_keys(client, 'book', batch_size=2))
+        finally:
+            near.max_pending_batches = old_max_pending_batches
+
+        self.assertIsInstance(error, TypeError)
+
+
+class ConstantHasher(object):
+    """
+    Atribui a mesma assinatura a todos os textos, que passam a compartilhar todos os buckets.
+    """
+    num_perm = 40
+
+    def signature(self, shingles):
+        return (0,) * self.num_perm
+
+
+class NearDuplicatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mongomock.MongoClient()
+        self.collection = self.client['citations']['dedup-book']
+
+    def near_documents(self):
+        error = run_with_timeout(lambda: near.generate_near_dedup_keys(self.client, 'book'))
+        if error:
+            raise error
+        return list(self.client['citations']['dedup-near-book'].find())
+
+    def test_typo_merges_groups(self):
+        self.collection.insert_many([make_group('a', '2000', 'silva ja', 'manual de vigilancia epidemiologica em saude publica'),
+                                     make_group('b', '2000', 'silva ja', 'manual de vigilancia epidemiologica em saude publca')])
+
+        documents = self.near_documents()
+
+        self.assertEqual(len(documents), 1)
+        self.assertEqual(sorted(documents[0]['near_ids']), ['a', 'b'])
+        self.assertEqual(sorted(documents[0]['cit_full_ids']), ['c-a', 'c-b'])
+        self.assertEqual(sorted(documents[0]['citing_docs']), ['d-a', 'd-b'])
+
+    def test_unrelated_titles_are_kept_apart(self):
+        self.collection.insert_many([make_group('a', '2000', 'silva ja', 'manual de vigilancia epidemiologica em saude publica'),
+                                     make_group('b', '2000', 'silva ja', 'historia social da medicina no brasil imperial')])
+
+        self.assertEqual(self.near_documents(), [])
+
+    def test_exact_fields_define_blocks(self):
+        self.collection.insert_many([make_group('a', '2000', 'silva ja', 'manual de vigilancia epidemiologica em saude publica'),
+                                     make_group('b', '2001', 'silva ja', 'manual de vigilancia epidemiologica em saude publica')])
+
+        self.assertEqual(self.near_documents(), [])
+
+    def test_comparisons_are_bounded(self):
+        self.collection.insert_many([make_group('%03d' % i, '2000', 'silva ja', 'manual de saude %03d' % i) for i in range(300)])
+
+        old_max_bucket_size = near.max_bucket_size
+        near.max_bucket_size = 10
+        try:
+            total, stats = near.generate_near_dedup_keys(self.client, 'book')
+        finally:
+            near.max_bucket_size = old_max_bucket_size
+
+        self.assertEqual(stats['texts'], 300)
+        self.assertLessEqual(stats['comparisons'], 300 * near.bands * 10)
+
+    def test_full_buckets_stop_comparisons(self):
+        clusters = NearDuplicateClusters(ConstantHasher(), bands=10, threshold=1.1, max_bucket_size=10)
+        for i in range(500):
+            clusters.add('texto %03d' % i)
+
+        # Apenas os 10 primeiros textos entram nos buckets: cada um e comparado com os anteriores uma unica vez
+        self.assertEqual(clusters.stats['comparisons'], 10 * 9 // 2)
+        self.assertEqual(clusters.stats['full_buckets'], 490 * 10)
+        self.assertEqual(clusters.components(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import copy
+import random
+import sys
+import unittest
+
+import mongomock
+
+import merge_solr
+
+from tests import baseline_merge_solr as baseline
+from tests.helpers import run_with_timeout
+
+
+BASES = ['articles-start_page', 'articles-volume', 'articles-issue', 'article-issue', 'book']
+
+
+def random_citation(r, number, size):
+    """
+    Gera um documento Solr de citaçao com valores repetidos entre os membros do grupo e campos opcionais.
+    """
+    citation = {'id': 'c%d' % number,
+                'entity': 'citation',
+                'document_fk': ['d%d' % r.randint(0, size) for _ in range(r.randint(1, 4))],
+                'in': r.sample(['scl', 'arg', 'col'], r.randint(1, 2))}
+
+    if r.random() < 0.5:
+        citation['document_fk_au'] = ['a%d' % r.randint(0, size) for _ in range(2)]
+    if r.random() < 0.5:
+        citation['document_fk_ta'] = ['t%d' % r.randint(0, size)]
+    if r.random() < 0.5:
+        citation['total_received'] = '1'
+
+    return citation
+
+
+def normalized(merged):
+    """
+    As listas da implementaçao original seguem a ordem de um set: apenas os valores sao comparados.
+    """
+    merged_citation, ids_to_remove = merged
+    return {k: sorted(v) if isinstance(v, list) else v for k, v in merged_citation.items()}, ids_to_remove
+
+
+class MergeClusterEquivalenceTest(unittest.TestCase):
+    """
+    Compara merge_cluster com a implementaçao original (tests/baseline_merge_solr.py).
+    """
+
+    def test_random_clusters(self):
+        r = random.Random(3)
+        dc = {'cit_start_page': '1', 'cit_volume': '2', 'cit_issue': '3'}
+
+        for _ in range(5000):
+            docs = [random_citation(r, i, 30) for i in range(r.randint(2, 8))]
+            base = r.choice(BASES)
+
+            self.assertEqual(normalized(merge_solr.merge_cluster(dc, copy.deepcopy(docs), base)),
+                             normalized(baseline.merge_cluster(dc, copy.deepcopy(docs), base)))
+
+    def test_values_in_first_seen_order(self):
+        docs = [{'id': 'c0', 'document_fk': ['d2', 'd1'], 'in': ['scl']},
+                {'id': 'c1', 'document_fk': ['d1', 'd3'], 'in': ['arg', 'scl'], 'document_fk_ta': ['t1']},
+                {'id': 'c2', 'document_fk': ['d0'], 'in': ['scl']}]
+
+        merged_citation, ids_to_remove = merge_solr.merge_cluster({}, docs, 'book')
+
+        self.assertEqual(merged_citation['document_fk'], ['d2', 'd1', 'd3', 'd0'])
+        self.assertEqual(merged_citation['total_received'], '4')
+        self.assertEqual(merged_citation['in'], ['scl', 'arg'])
+        self.assertEqual(merged_citation['document_fk_ta'], ['t1'])
+        self.assertEqual(ids_to_remove, {'c1', 'c2'})
+
+
+class BuildMergePlanTest(unittest.TestCase):
+
+    def test_overlapping_groups_of_different_bases(self):
+        client = mongomock.MongoClient()
+        client['citations']['dedup-book'].insert_many([
+            {'_id': 'h1', 'cit_full_ids': ['c1', 'c2'], 'citing_docs': ['d1', 'd2']},
+            {'_id': 'h2', 'cit_full_ids': ['c4', 'c5'], 'citing_docs': ['d4']},
+            {'_id': 'h3', 'cit_full_ids': ['c8'], 'citing_docs': ['d8']}])
+        client['citations']['dedup-chapter'].insert_many([
+            {'_id': 'h4', 'cit_full_ids': ['c3', 'c2'], 'citing_docs': ['d3', 'd1']},
+            {'_id': 'h5', 'cit_full_ids': ['c6', 'c7'], 'citing_docs': ['d5', 'd4']}])
+
+        plan = merge_solr.build_merge_plan(client, ['book', 'chapter'])
+
+        self.assertEqual(sorted(plan, key=lambda dc: dc['_id']),
+                         [{'_id': 'c1', 'cit_full_ids': ['c1', 'c2', 'c3'], 'citing_docs': ['d1', 'd2', 'd3']},
+                          {'_id': 'c4', 'cit_full_ids': ['c4', 'c5'], 'citing_docs': ['d4']},
+                          {'_id': 'c6', 'cit_full_ids': ['c6', 'c7'], 'citing_docs': ['d4', 'd5']}])
+
+        # A ordem das bases nao altera o plano
+        self.assertEqual(sorted(merge_solr.build_merge_plan(client, ['chapter', 'book']), key=lambda dc: dc['_id']),
+                         sorted(plan, key=lambda dc: dc['_id']))
+
+
+class ArgumentsTest(unittest.TestCase):
+
+    def test_base_with_bases(self):
+        old_argv = sys.argv
+        sys.argv = ['merge_solr.py', '--base', 'book', '--bases', 'all']
+        try:
+            error = run_with_timeout(merge_solr.main)
+        finally:
+            sys.argv = old_argv
+
+        self.assertIsInstance(error, SystemExit)
+        self.assertEqual(error.code, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
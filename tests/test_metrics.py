@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+
+import mongomock
+
+from tests.helpers import load_generate_dedup_keys, make_client, run_main
+from utils.metrics import Metrics
+from utils.mongo_writer import DedupCollectionsWriter
+from utils.standardizer import StandardizedCitations
+
+
+class FakeTime(object):
+    """
+    Relogio que avança um segundo a cada leitura, tornando deterministicos os tempos registrados.
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def perf_counter(self):
+        self.now += 1
+        return self.now
+
+    time = perf_counter
+
+
+class MongoWriterMetricsTest(unittest.TestCase):
+
+    def test_each_bulk_write_is_counted(self):
+        metrics = Metrics()
+        writer = DedupCollectionsWriter(mongomock.MongoClient(), 'citations', 'dedup-', batch_size=3, metrics=metrics)
+
+        docs = {'h%d' % i: {'cit_keys': {}, 'update_date': '2024-01-01', 'cit_full_ids': ['c%d' % i], 'citing_docs': ['d']}
+                for i in range(7)}
+        writer.write({'book': docs, 'chapter': dict(list(docs.items())[:2])})
+        writer.write({'book': dict(list(docs.items())[:1])})
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['mongo_write_requests_total'], 3 + 1 + 1)
+        self.assertEqual(snapshot['counters']['mongo_write_operations_total'], 7 + 2 + 1)
+        self.assertEqual(snapshot['histograms']['mongo_write_seconds']['count'], 5)
+
+        stats = writer.stats()
+        self.assertEqual((stats['dedup-book']['flushes'], stats['dedup-book']['requests']), (2, 4))
+
+
+class ExtractionMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = make_client(n_docs=20)
+        self.documents = list(self.client['ami']['articles-issues'].find())
+        self.g = load_generate_dedup_keys(self.client)
+        self.g.citation_types.update({'article', 'book'})
+        self.g.metrics = Metrics()
+
+    def test_cached_standardizer_batch_is_not_a_lookup(self):
+        self.g.standardizer = StandardizedCitations(self.client['citations']['standardized'], cache_size=100000)
+
+        self.g.extract_documents_ids_keys(self.documents)
+        self.g.extract_documents_ids_keys(self.documents)
+
+        snapshot = self.g.metrics.snapshot()
+        self.assertEqual(snapshot['counters']['standardizer_lookups_total'], 1)
+        self.assertEqual(snapshot['histograms']['standardizer_lookup_seconds']['count'], 1)
+
+    def test_raw_extractor_check_is_not_timed(self):
+        self.g.standardizer = StandardizedCitations(None)
+        self.g.raw_extractor = True
+        self.g.time = FakeTime()
+        self.g.extract_documents_ids_keys(self.documents)
+        expected = self.g.metrics.snapshot(reset=True)['counters']
+
+        self.g.check_raw_extractor = True
+        self.g.extract_documents_ids_keys(self.documents)
+        checked = self.g.metrics.snapshot()['counters']
+
+        self.assertGreater(expected['clean_seconds_total'], 0)
+        self.assertEqual(checked['clean_seconds_total'], expected['clean_seconds_total'])
+        self.assertEqual(checked['hash_seconds_total'], expected['hash_seconds_total'])
+        self.assertNotIn('raw_extractor_mismatches_total', checked)
+
+    def test_raw_extractor_mismatches(self):
+        self.g.standardizer = StandardizedCitations(None)
+        self.g.raw_extractor = True
+        self.g.check_raw_extractor = True
+        self.g.get_mismatched_citations = lambda citations_keys, expected_keys: [('c1', 'book')]
+
+        with self.assertLogs(level='WARNING') as logs:
+            self.g.extract_documents_ids_keys(self.documents)
+
+        self.assertEqual(self.g.metrics.snapshot()['counters']['raw_extractor_mismatches_total'], len(self.documents))
+        self.assertIn('c1 (book)', logs.output[0])
+
+
+class MainMetricsTest(unittest.TestCase):
+
+    def test_write_requests(self):
+        client = make_client(n_docs=30)
+        g = load_generate_dedup_keys(client)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'metrics.jsonl')
+            self.assertIsNone(run_main(g, ['-b', '--skip_standardizer', '-c', '10', '--write_batch_size', '2',
+                                           '--metrics_file', path]))
+            with open(path) as f:
+                final = [json.loads(line) for line in f][-1]
+
+        book_groups = client['citations']['dedup-book'].count_documents({})
+        counters = final['counters']
+        self.assertTrue(final['final'])
+        self.assertGreaterEqual(counters['mongo_write_requests_total'], book_groups // 2)
+        self.assertEqual(counters['mongo_write_requests_total'], final['histograms']['mongo_write_seconds']['count'])
@@ -0,0 +1,111 @@
+import random
+import unittest
+import warnings
+
+import mongomock
+
+from tests.synthetic import generate_articles
+from tests.helpers import load_generate_dedup_keys
+from utils.raw_document import RawArticle, RawCitation
+from xylose.scielodocument import Article, Citation
+
+
+CITATION_PROPERTIES = ['publication_type', 'first_author', 'analytic_authors', 'monographic_authors', 'source',
+                       'chapter_title', 'publication_date', 'start_page', 'volume', 'issue', 'publisher',
+                       'publisher_address']
+
+VALUES = ['Ana &amp; Cia', 'S&#227;o Paulo', '&lt;i&gt;Title&lt;/i&gt;', 'São\x07Paulo', 'Ab\nCd', 'x​y',
+          '  Rev. Bras. (SP) ', '', '12-19', 'v.3', '1999', '19990315', '2001ab', 'plain text']
+
+TEXT_FIELDS = ['v30', 'v53', 'v18', 'v51', 'v150', 'v37', 'v12', 'v65', 'v45', 'v55', 'v31', 'v32', 'v62', 'v67', 'v14']
+
+
+def random_citation(r, number):
+    """
+    Gera uma citaçao com uma combinaçao aleatoria dos campos ISIS lidos pelo extrator, incluindo entidades HTML,
+    caracteres de controle, datas vazias, autores sem sobrenome e v514 sem o subcampo f.
+    """
+    citation = {'v880': [{'_': 'S0000-000000000000000%05d' % number}]}
+    for field in TEXT_FIELDS:
+        if r.random() < 0.35:
+            citation[field] = [{'_': r.choice(VALUES)}]
+
+    if r.random() < 0.2:
+        citation['v514'] = [{'f': r.choice(VALUES)} if r.random() < 0.7 else {'l': '10'}]
+
+    if r.random() < 0.3:
+        citation['v66'] = [{'_': r.choice(VALUES), 'e': r.choice(VALUES)} if r.random() < 0.5 else {'_': r.choice(VALUES)}]
+
+    for field in ('v10', 'v16'):
+        if r.random() < 0.6:
+            citation[field] = [{k: r.choice(VALUES) for k in r.sample(['s', 'n'], r.randint(0, 2))}
+                               for _ in range(r.randint(0, 3))]
+
+    return citation
+
+
+EDGE_CASES = [{'v30': [{'_': 'Rev. Sa&#250;de P&#250;blica'}], 'v65': [{'_': ''}], 'v10': [{'n': 'João'}]},
+              {'v18': [{'_': 'Manual\x0b de\x1f saúde'}], 'v514': [{'l': '20'}], 'v14': [{'_': '5-9'}]},
+              {'v18': [{'_': 'Livro'}], 'v12': [{'_': 'Capítulo &amp; notas'}], 'v16': [{'n': 'A'}, {'s': 'Silva'}]},
+              {'v30': [{'_': 'J. Biol. Chem.'}], 'v514': [{'f': '123', 'l': '130'}], 'v65': [{'_': '2001ab'}]},
+              {'v53': [{'_': 'Congresso'}], 'v55': [{'_': ''}]},
+              {'v18': [{'_': 'Tese'}], 'v51': [{'_': 'Doutorado'}], 'v45': [{'_': '19990315'}]},
+              {'v66': [{'_': 'Rio de Janeiro', 'e': 'RJ'}], 'v67': [{'_': 'Brasil'}], 'v62': [{'_': 'Fiocruz'}]},
+              {}]
+
+
+class RawDocumentParityTest(unittest.TestCase):
+    """
+    Compara o extrator de registros brutos (utils/raw_document.py) com o xylose.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.g = load_generate_dedup_keys(mongomock.MongoClient())
+        cls.g.citation_types.update({'article', 'book'})
+
+        r = random.Random(5)
+        cls.citations = [dict(c, v880=[{'_': 'S0000-00000000000000%06d' % i}]) for i, c in enumerate(EDGE_CASES)]
+        cls.citations += [random_citation(r, i) for i in range(5000)]
+
+        cls.documents = generate_articles(n_docs=300, seed=3)
+        for i in range(0, len(cls.citations), 20):
+            document = generate_articles(n_docs=1, seed=i)[0]
+            document['citations'] = cls.citations[i:i + 20]
+            cls.documents.append(document)
+
+    def setUp(self):
+        warnings.simplefilter('ignore')
+
+    def test_citation_properties(self):
+        for data in self.citations:
+            raw, citation = RawCitation(data), Citation(data)
+            for name in CITATION_PROPERTIES:
+                self.assertEqual(getattr(raw, name), getattr(citation, name), '%s of %r' % (name, data))
+            self.assertEqual(raw.title(), citation.title(), 'title of %r' % data)
+
+    def test_document_properties(self):
+        for data in self.documents:
+            raw, article = RawArticle(data), Article(data)
+            self.assertEqual(raw.publisher_id, article.publisher_id)
+            self.assertEqual(raw.collection_acronym, article.collection_acronym)
+
+    def test_citations_keys(self):
+        for data in self.documents:
+            self.assertEqual(self.g.extract_citations_ids_keys(RawArticle(data), {}),
+                             self.g.extract_citations_ids_keys(Article(data), {}),
+                             data['_id'])
+
+    def test_mismatched_citations(self):
+        CitationKey = self.g.CitationKey
+        expected = [CitationKey('c1', 'book', 'h1', ('a',)), CitationKey('c2', 'book', 'h2', ('b',))]
+
+        self.assertEqual(self.g.get_mismatched_citations(list(expected), expected), [])
+        self.assertEqual(self.g.get_mismatched_citations([expected[0], CitationKey('c2', 'book', 'h3', ('c',))], expected),
+                         [('c2', 'book')])
+        self.assertEqual(self.g.get_mismatched_citations([CitationKey('c3', 'chapter', 'h4', ('d',))], expected),
+                         [('c1', 'book'), ('c2', 'book'), ('c3', 'chapter')])
+
+
+if __name__ == '__main__':
+    unittest.main()
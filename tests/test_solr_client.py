@@ -0,0 +1,192 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from contextlib import redirect_stdout
+
+import mongomock
+
+import merge_solr
+
+from tests.fake_solr import FakeSolr
+from tests.helpers import load_generate_dedup_keys, run_main
+from tests.synthetic import generate_articles, generate_solr_documents
+from utils.solr_client import PooledSolr, SubmissionBuffer, UpdateDispatcher, json_dumps
+
+
+class BlockingSolr(object):
+    """
+    Cliente Solr cujas requisiçoes aguardam a liberaçao de release.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.received = []
+
+    def post_json(self, data, commit_within=None):
+        self.release.wait(10)
+        self.received.append(data)
+
+
+def ids_by_lane(dispatcher, lane, count):
+    ids = (str(i) for i in range(10000))
+    return [i for i in ids if dispatcher._lane(i) == lane][:count]
+
+
+class UpdateDispatcherTest(unittest.TestCase):
+
+    def test_pending_requests_are_bounded_per_lane(self):
+        solr = BlockingSolr()
+        dispatcher = UpdateDispatcher(solr, lanes=2)
+        lane_0 = ids_by_lane(dispatcher, 0, 3)
+        lane_1 = ids_by_lane(dispatcher, 1, 2)
+
+        dispatcher.update([(lane_0[0], b'{}')])
+        dispatcher.update([(lane_0[1], b'{}')])
+
+        third = threading.Thread(target=dispatcher.update, args=([(lane_0[2], b'{}')],), daemon=True)
+        third.start()
+        third.join(0.2)
+        self.assertTrue(third.is_alive())
+
+        # A fila 1 continua aceitando requisiçoes enquanto a fila 0 esta cheia
+        other = threading.Thread(target=lambda: [dispatcher.update([(i, b'{}')]) for i in lane_1], daemon=True)
+        other.start()
+        other.join(1)
+        self.assertFalse(other.is_alive())
+
+        solr.release.set()
+        third.join(5)
+        dispatcher.close()
+        self.assertEqual(len(solr.received), 5)
+
+    def test_updates_of_a_document_are_applied_in_order(self):
+        solr_server = FakeSolr([{'id': 'd%d' % i, 'values': []} for i in range(20)]).start()
+        solr = PooledSolr(solr_server.url, pool_size=8)
+        try:
+            dispatcher = UpdateDispatcher(solr, lanes=4)
+            for step in range(10):
+                dispatcher.update([('d%d' % i, json_dumps({'id': 'd%d' % i, 'values': {'add': [step]}})) for i in range(20)])
+            dispatcher.close()
+        finally:
+            solr.close()
+            solr_server.stop()
+
+        for doc in solr_server.index.values():
+            self.assertEqual(doc['values'], list(range(10)))
+
+
+class MergeCitationsTest(unittest.TestCase):
+    """
+    Executa merge_citations contra um Solr local (FakeSolr) e compara o indice resultante das execuçoes sequencial e
+    concorrente.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        documents = generate_articles(n_docs=150, seed=4, duplication_rate=0.5)
+        cls.solr_docs = generate_solr_documents(documents)
+
+        client = mongomock.MongoClient()
+        client['ami']['articles-issues'].insert_many(documents)
+        error = run_main(load_generate_dedup_keys(client), ['-a', '-b', '--skip_standardizer', '--rebuild'])
+        if error:
+            raise error
+
+        cls.plan = merge_solr.build_merge_plan(client, merge_solr.BASES)
+
+    def merge(self, max_inflight_selects, max_inflight_updates, latency=0.0):
+        solr_server = FakeSolr(self.solr_docs, latency).start()
+        solr = PooledSolr(solr_server.url, timeout=30, pool_size=8)
+
+        # merge_citations grava os arquivos de acompanhamento no diretorio corrente
+        cwd = os.getcwd()
+        try:
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                os.chdir(tempfile.mkdtemp())
+                merge_solr.merge_citations(solr, self.plan, merge_solr.CROSS_BASE_NAME, lookup_batch_size=10,
+                                           max_inflight_selects=max_inflight_selects,
+                                           max_inflight_updates=max_inflight_updates, flush_sizes=(20, 20, 20))
+        finally:
+            os.chdir(cwd)
+            solr.close()
+            solr_server.stop()
+
+        return solr_server
+
+    def test_concurrent_merge_matches_sequential(self):
+        self.assertTrue(any(len(dc['cit_full_ids']) > 1 for dc in self.plan))
+
+        sequential = self.merge(1, 1)
+        concurrent = self.merge(4, 3, latency=0.005)
+
+        self.assertEqual(concurrent.index, sequential.index)
+        self.assertLess(len(sequential.index), len(self.solr_docs))
+        self.assertGreater(concurrent.requests['update'], 1)
+
+
+class FailingSolr(FakeSolr):
+    """
+    Solr local cujas consultas falham a partir da consulta de numero fail_on.
+    """
+
+    def __init__(self, docs, fail_on):
+        super().__init__(docs)
+        self.fail_on = fail_on
+
+    def select(self, params):
+        if self.requests['select'] + 1 >= self.fail_on:
+            raise IOError('select failed')
+        return super().select(params)
+
+
+class MergeFailureTest(unittest.TestCase):
+
+    def test_citations_are_removed_only_after_their_merge(self):
+        docs, clusters = [], []
+        for k in range(10):
+            ids = ['c%d-%d' % (k, j) for j in range(3)]
+            citing = ['d%d-%d' % (k, j) for j in range(3)]
+            for cit_id, doc_id in zip(ids, citing):
+                docs.append({'id': cit_id, 'entity': 'citation', 'document_fk': [doc_id], 'in': ['scl'], 'total_received': '1'})
+                docs.append({'id': doc_id, 'entity': 'document', 'in': ['scl'], 'citation_fk': [cit_id]})
+            clusters.append({'_id': 'k%d' % k, 'cit_full_ids': ids, 'citing_docs': citing})
+
+        solr_server = FailingSolr(docs, fail_on=5).start()
+        solr = PooledSolr(solr_server.url, pool_size=4)
+
+        cwd = os.getcwd()
+        try:
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                os.chdir(tempfile.mkdtemp())
+                with self.assertRaises(Exception):
+                    merge_solr.merge_citations(solr, clusters, 'book', lookup_batch_size=1, max_inflight_updates=2,
+                                               flush_sizes=(5, 5, 4))
+        finally:
+            os.chdir(cwd)
+            solr.close()
+            solr_server.stop()
+
+        self.assertGreater(solr_server.requests['delete'], 0)
+        for cluster in clusters:
+            survivor, *removed = cluster['cit_full_ids']
+            if any(i not in solr_server.index for i in removed):
+                self.assertEqual(sorted(solr_server.index[survivor]['document_fk']), sorted(cluster['citing_docs']))
+
+
+class SubmissionBufferTest(unittest.TestCase):
+
+    def test_flush_by_items_and_bytes(self):
+        flushed = []
+        buffer = SubmissionBuffer(lambda items: flushed.append([i for i, _ in items]), max_items=3, max_bytes=40)
+        for i in range(4):
+            buffer.add('a%d' % i, {'id': 'a%d' % i})
+        buffer.add('big', {'id': 'x' * 50})
+        buffer.flush()
+
+        self.assertEqual(flushed, [['a0', 'a1', 'a2'], ['a3', 'big']])
+
+
+if __name__ == '__main__':
+    unittest.main()
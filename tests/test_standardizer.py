@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import mongomock
+
+from tests.helpers import load_generate_dedup_keys, make_client, run_main
+from utils.standardizer import StandardizedCitationsSnapshot, export_snapshot, get_snapshot_age
+
+
+def standardized(collection, title):
+    collection.delete_many({})
+    collection.insert_many([{'_id': 'c1', 'status': 1, 'official-journal-title': [title]},
+                            {'_id': 'c2', 'status': 0, 'official-journal-title': ['INVALID']}])
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'standardized.sqlite')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_export(self):
+        collection = mongomock.MongoClient()['citations']['standardized']
+        standardized(collection, 'REVISTA X')
+
+        self.assertEqual(export_snapshot(collection, self.path), 1)
+        self.assertLess(get_snapshot_age(self.path), 60)
+        self.assertEqual(StandardizedCitationsSnapshot(self.path).get_many(['c1', 'c2', 'c3']),
+                         {'c1': {'_id': 'c1', 'official-journal-title': ['REVISTA X']}})
+
+    def test_age_without_metadata(self):
+        self.assertIsNone(get_snapshot_age(self.path))
+
+        connection = sqlite3.connect(self.path)
+        connection.execute('CREATE TABLE standardized (_id TEXT PRIMARY KEY, official_journal_title TEXT)')
+        connection.close()
+        self.assertIsNone(get_snapshot_age(self.path))
+
+    def test_main_exports_by_default(self):
+        client = make_client(n_docs=5)
+        collection = client['citations']['standardized']
+
+        standardized(collection, 'REVISTA X')
+        self.assertIsNone(run_main(load_generate_dedup_keys(client), ['-a', '--standardizer_snapshot', self.path]))
+
+        standardized(collection, 'REVISTA Y')
+        self.assertIsNone(run_main(load_generate_dedup_keys(client), ['-a', '--standardizer_snapshot', self.path,
+                                                                       '--standardizer_snapshot_max_age', '1']))
+        self.assertEqual(StandardizedCitationsSnapshot(self.path).get_many(['c1'])['c1']['official-journal-title'], ['REVISTA X'])
+
+        self.assertIsNone(run_main(load_generate_dedup_keys(client), ['-a', '--standardizer_snapshot', self.path]))
+        self.assertEqual(StandardizedCitationsSnapshot(self.path).get_many(['c1'])['c1']['official-journal-title'], ['REVISTA Y'])
+
+
+if __name__ == '__main__':
+    unittest.main()
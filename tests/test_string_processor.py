@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from tests import baseline_string_processor as baseline
+from utils import string_processor
+
+
+SAMPLES = ['Rev. Saúde Pública',
+           'Rev. Saúde Pública (São Paulo)',
+           'Cad.  Saúde  Pública  (Online)  ',
+           'Ciência &amp; Saúde Coletiva',
+           'J   Biol  Chem ONLINE',
+           'Arq. bras. med. vet. zootec(IMPRESSO)',
+           'Silva, João da',
+           'MÜLLER, J.-P.',
+           '\t a  \t  b\x0b c\x7f',
+           'a(b(c)d)e f(g h) (i',
+           '((x)) y) (z',
+           'ﬁnal ½ ① 한국 😀',
+           ' 2005 ',
+           '']
+
+
+def random_texts(seed=0, size=20000):
+    """
+    Gera textos aleatorios com predominancia de espaços, parenteses, caracteres especiais e acentuados.
+    """
+    r = random.Random(seed)
+    alphabet = [chr(i) for i in range(0x3000)] + list('  ()&@ÀÉçãõ-|_.') * 200 + ['\U0001F600', 'ﬁ', '①', '가', '\U00010000']
+    return [''.join(r.choice(alphabet) for _ in range(r.randint(0, 40))) for _ in range(size)]
+
+
+class StringProcessorEquivalenceTest(unittest.TestCase):
+    """
+    Compara as funçoes de limpeza com as implementaçoes originais (tests/baseline_string_processor.py).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.texts = SAMPLES + [chr(i) for i in range(0x30000) if not 0xD800 <= i < 0xE000 or i % 64 == 0] + random_texts()
+
+    def assertEquivalent(self, name, *args):
+        for text in self.texts:
+            self.assertEqual(getattr(string_processor, name)(text, *args), getattr(baseline, name)(text, *args),
+                             '%s(%r)' % (name, text))
+
+    def test_preprocess_default(self):
+        self.assertEquivalent('preprocess_default')
+
+    def test_preprocess_author_name(self):
+        self.assertEquivalent('preprocess_author_name')
+
+    def test_preprocess_journal_title(self):
+        self.assertEquivalent('preprocess_journal_title')
+        self.assertEquivalent('preprocess_journal_title', True)
+
+    def test_alpha_num_space(self):
+        self.assertEquivalent('alpha_num_space')
+        self.assertEquivalent('alpha_num_space', True)
+
+    def test_remove_double_spaces(self):
+        self.assertEquivalent('remove_double_spaces')
+
+    def test_remove_accents(self):
+        self.assertEquivalent('remove_accents')
+
+    def test_remove_invalid_chars(self):
+        self.assertEquivalent('remove_invalid_chars')
+
+    def test_preprocess_default_batch(self):
+        for size in (1, 2, 37, 1000):
+            for i in range(0, len(self.texts), size):
+                batch = self.texts[i:i + size]
+                self.assertEqual(string_processor.preprocess_default_batch(batch), [baseline.preprocess_default(t) for t in batch])
+
+        self.assertEqual(string_processor.preprocess_default_batch([]), [])
+        self.assertEqual(string_processor.preprocess_default_batch(['a\x00b', ' c ']), ['a b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import threading
+
+from bson import json_util
+from datetime import datetime
+
+
+class FileStateStore(object):
+    """
+    Armazena o estado de execuçao em um arquivo JSON local.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        with open(self.path) as f:
+            return json_util.loads(f.read())
+
+    def save(self, state):
+        # Escreve em arquivo temporario e renomeia, para que uma interrupçao nao corrompa o estado anterior
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json_util.dumps(state))
+        os.replace(tmp_path, self.path)
+
+
+class MongoStateStore(object):
+    """
+    Armazena o estado de execuçao em um documento de uma coleçao Mongo.
+    """
+
+    def __init__(self, collection, state_id):
+        self.collection = collection
+        self.state_id = state_id
+
+    def load(self):
+        state = self.collection.find_one({'_id': self.state_id}) or {}
+        state.pop('_id', None)
+        return state
+
+    def save(self, state):
+        self.collection.replace_one({'_id': self.state_id}, state, upsert=True)
+
+
+class RunCheckpoint(object):
+    """
+    Controla o progresso de uma execuçao de geraçao de chaves.
+
+    Os lotes de documentos sao numerados na ordem de leitura (ordenada por _id). A medida que sao persistidos,
+    o ultimo _id do maior prefixo contiguo de lotes concluidos e salvo, de modo que uma execuçao interrompida
+    seja retomada a partir dele. Em modo incremental, ao final da execuçao a marca d'agua passa a ser o maior
+    valor do campo watermark_field entre os documentos processados.
+    """
+
+    def __init__(self, store, watermark_field=None):
+        """
+        :param store: Armazenamento do estado (FileStateStore ou MongoStateStore)
+        :param watermark_field: Campo de data de atualizaçao dos documentos (None desativa o modo incremental)
+        """
+        self.store = store
+        self.watermark_field = watermark_field
+        self.state = store.load()
+        self.resumed_from = None
+
+        self._lock = threading.Lock()
+        self._last_ids = {}
+        self._completed = set()
+        self._next_number = 0
+        self._max_watermark = None
+
+    @property
+    def watermark(self):
+        return self.state.get('watermark')
+
+    def start(self, mongo_filter):
+        """
+        Inicia ou retoma uma execuçao.
+        A execuçao anterior e retomada apenas se tiver sido iniciada com o mesmo filtro.
+
+        :param mongo_filter: Filtro Mongo da execuçao
+        :return: Filtro Mongo acrescido das condiçoes de marca d'agua e de retomada
+        """
+        run_filter = dict(mongo_filter)
+        if self.watermark_field and self.watermark is not None:
+            run_filter[self.watermark_field] = {'$gte': self.watermark}
+
+        filter_key = json_util.dumps(run_filter, sort_keys=True)
+
+        run = self.state.get('run')
+        if run and run.get('filter_key') == filter_key:
+            self.resumed_from = run.get('last_id')
+            self._max_watermark = run.get('max_watermark')
+        else:
+            self.state['run'] = {'filter_key': filter_key,
+                                 'last_id': None,
+                                 'max_watermark': None,
+                                 'started_at': datetime.now()}
+            self.store.save(self.state)
+
+        if self.resumed_from is not None:
+            run_filter['_id'] = {'$gt': self.resumed_from}
+
+        return run_filter
+
+    def projection(self):
+        """
+        :return: Projeçao Mongo necessaria para a leitura dos ids
+        """
+        projection = {'_id': 1}
+        if self.watermark_field:
+            projection[self.watermark_field] = 1
+        return projection
+
+    def register_batch(self, number, docs):
+        """
+        Registra um lote enviado aos workers.
+
+        :param number: Numero sequencial do lote
+        :param docs: Documentos do lote, com _id e, se for o caso, o campo de marca d'agua
+        """
+        with self._lock:
+            self._last_ids[number] = docs[-1]['_id']
+
+            if self.watermark_field:
+                for d in docs:
+                    value = d.get(self.watermark_field)
+                    if value is not None and (self._max_watermark is None or value > self._max_watermark):
+                        self._max_watermark = value
+
+    def complete_batches(self, numbers):
+        """
+        Marca lotes como persistidos e salva o ponto de retomada, caso ele tenha avançado.
+
+        :param numbers: Numeros dos lotes persistidos
+        """
+        with self._lock:
+            self._completed.update(numbers)
+
+            last_id = None
+            while self._next_number in self._completed:
+                self._completed.remove(self._next_number)
+                last_id = self._last_ids.pop(self._next_number)
+                self._next_number += 1
+
+            if last_id is not None:
+                self.state['run']['last_id'] = last_id
+                self.state['run']['max_watermark'] = self._max_watermark
+                self.store.save(self.state)
+
+    def finish(self):
+        """
+        Conclui a execuçao, descartando o ponto de retomada e atualizando a marca d'agua.
+        """
+        with self._lock:
+            if self.watermark_field and self._max_watermark is not None:
+                if self.watermark is None or self._max_watermark > self.watermark:
+                    self.state['watermark'] = self._max_watermark
+
+            self.state['run'] = None
+            self.state['last_finished_at'] = datetime.now()
+            self.store.save(self.state)
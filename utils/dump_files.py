@@ -0,0 +1,177 @@
+import glob
+import gzip
+import json
+import os
+import struct
+
+from bson import decode as bson_decode, json_util
+from hashlib import md5
+
+
+def get_dump_format(path):
+    """
+    Identifica o formato de um arquivo de dump pela extensao (.bson ou .jsonl, opcionalmente compactados com gzip).
+
+    :param path: Caminho do arquivo
+    :return: 'bson' ou 'jsonl'
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.bson'):
+        return 'bson'
+    return 'jsonl'
+
+
+def _open_binary(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_raw_records(path):
+    """
+    Le sequencialmente os registros de um arquivo de dump, sem decodifica-los.
+    A decodificaçao (decode_raw_record) fica a cargo dos workers.
+
+    :param path: Caminho do arquivo (JSONL, JSONL gzip ou BSON gerado pelo mongodump)
+    :return: Gerador de registros em bytes (uma linha JSON ou um documento BSON)
+    """
+    dump_format = get_dump_format(path)
+
+    with _open_binary(path) as f:
+        if dump_format == 'bson':
+            while True:
+                size_data = f.read(4)
+                if not size_data:
+                    break
+
+                size = struct.unpack('<i', size_data)[0]
+                record = size_data + f.read(size - 4)
+                if len(record) != size:
+                    raise ValueError('Registro BSON incompleto em %s' % path)
+
+                yield record
+        else:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def decode_raw_record(record, dump_format):
+    """
+    Decodifica um registro lido por iter_raw_records.
+
+    As linhas JSONL podem estar no formato Extended JSON do mongoexport: {"$oid": ...}, {"$date": ...} etc. sao
+    convertidos nos tipos BSON correspondentes, de modo que os documentos sejam identicos aos lidos do Mongo.
+
+    :param record: Registro em bytes
+    :param dump_format: Formato do arquivo de origem ('bson' ou 'jsonl')
+    :return: Dicionario do documento
+    """
+    if dump_format == 'bson':
+        return bson_decode(record)
+
+    # O json_util e mais lento e so e necessario quando ha chaves do Extended JSON
+    if b'"$' in record:
+        return json_util.loads(record)
+    return json.loads(record)
+
+
+def get_partition(cit_hash, partitions):
+    """
+    :param cit_hash: Hash da citaçao (texto hexadecimal ou digest binario)
+    :param partitions: Quantidade de partiçoes
+    :return: Numero da partiçao do hash
+    """
+    if isinstance(cit_hash, bytes):
+        return int.from_bytes(cit_hash[:4], 'big') % partitions
+    return int(cit_hash[:8], 16) % partitions
+
+
+def get_shard(doc_id, shard_count):
+    """
+    Define, de forma deterministica e independente do processo, o shard de um documento.
+
+    :param doc_id: Id (_id) do documento
+    :param shard_count: Quantidade de shards
+    :return: Numero do shard do documento
+    """
+    return int(md5(str(doc_id).encode()).hexdigest()[:8], 16) % shard_count
+
+
+def find_keys_files(dirs):
+    """
+    :param dirs: Diretorios de saida de KeysFileWriter
+    :return: Caminhos ordenados de todos os arquivos de chaves dos diretorios
+    """
+    paths = []
+    for d in dirs:
+        paths.extend(glob.glob(os.path.join(d, '*', '*.jsonl')))
+        paths.extend(glob.glob(os.path.join(d, '*', '*.jsonl.gz')))
+    return sorted(paths)
+
+
+def read_keys_file(path):
+    """
+    Le um arquivo escrito por KeysFileWriter.
+
+    :param path: Caminho do arquivo
+    :return: Gerador de quintuplas (hash, base, id completo de citaçao, id do documento citante, campos da citaçao)
+    """
+    with _open_binary(path) as f:
+        for line in f:
+            if line.strip():
+                yield tuple(json.loads(line))
+
+
+class KeysFileWriter(object):
+    """
+    Escreve registros de chaves de de-duplicaçao em arquivos JSONL locais, um diretorio por base e,
+    em cada diretorio, partiçoes definidas pelo hash da citaçao.
+    Cada linha e a lista [hash, base, id completo de citaçao, id do documento citante, campos da citaçao].
+    Hashes binarios sao gravados em texto hexadecimal.
+    """
+
+    def __init__(self, output_dir, partitions=16, compress=False, prefix='part'):
+        """
+        :param output_dir: Diretorio de saida
+        :param partitions: Quantidade de partiçoes por base
+        :param compress: Indica se os arquivos devem ser compactados com gzip
+        :param prefix: Prefixo dos nomes dos arquivos de partiçao
+        """
+        self.output_dir = output_dir
+        self.partitions = partitions
+        self.compress = compress
+        self.prefix = prefix
+        self._files = {}
+
+    def get_path(self, base, partition):
+        extension = '.jsonl.gz' if self.compress else '.jsonl'
+        return os.path.join(self.output_dir, base, '%s-%05d%s' % (self.prefix, partition, extension))
+
+    def _get_file(self, base, partition):
+        f = self._files.get((base, partition))
+        if f is None:
+            path = self.get_path(base, partition)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if self.compress:
+                f = gzip.open(path, 'wt')
+            else:
+                f = open(path, 'w')
+            self._files[(base, partition)] = f
+        return f
+
+    def write(self, records):
+        """
+        :param records: Iteravel de quintuplas (hash, base, id completo de citaçao, id do documento citante, campos da citaçao)
+        """
+        for cit_hash, base, cit_full_id, citing_doc, cit_keys in records:
+            f = self._get_file(base, get_partition(cit_hash, self.partitions))
+            if isinstance(cit_hash, bytes):
+                cit_hash = cit_hash.hex()
+            f.write(json.dumps([cit_hash, base, cit_full_id, citing_doc, cit_keys]))
+            f.write('\n')
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
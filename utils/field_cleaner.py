@@ -1,11 +1,77 @@
+import functools
+
+from utils.lru_cache import LRUCache
 from utils.string_processor import preprocess_author_name, preprocess_default, preprocess_journal_title
 
 
+MEMOIZED_FUNCTIONS = ['get_cleaned_default', 'get_cleaned_first_author_name', 'get_cleaned_journal_title']
+
+# Caches por funçao, ativados por enable_cache; cada processo (worker) mantem os seus
+caches = {}
+
+_MISSING = object()
+
+
+def enable_cache(maxsize=100000):
+    """
+    Ativa a memoizaçao das funçoes de limpeza em MEMOIZED_FUNCTIONS no processo corrente.
+
+    :param maxsize: Quantidade maxima de valores mantidos em cache por funçao (descarte LRU)
+    """
+    for name in MEMOIZED_FUNCTIONS:
+        caches[name] = LRUCache(maxsize)
+
+
+def disable_cache():
+    caches.clear()
+
+
+def get_cache_stats():
+    """
+    :return: Dicionario composto pelos pares nome da funçao: estatisticas de uso do cache
+    """
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def author_cache_key(author: dict):
+    return author.get('surname', ''), author.get('given_names', '')
+
+
+def _memoize(key=None):
+    """
+    Decorador que consulta o cache da funçao, se ativado, antes de executar a limpeza.
+    Valores vazios nao sao armazenados em cache.
+
+    :param key: Funçao que obtem do valor recebido uma chave hashable (padrao: o proprio valor)
+    """
+    def decorator(function):
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(value):
+            cache = caches.get(name)
+            if cache is None or not value:
+                return function(value)
+
+            cache_key = key(value) if key else value
+            cleaned = cache.get(cache_key, _MISSING)
+            if cleaned is _MISSING:
+                cleaned = function(value)
+                cache.put(cache_key, cleaned)
+            return cleaned
+
+        return wrapper
+
+    return decorator
+
+
+@_memoize()
 def get_cleaned_default(field_value: str):
     if field_value:
         return preprocess_default(field_value).lower()
 
 
+@_memoize(key=author_cache_key)
 def get_cleaned_first_author_name(first_author: dict):
     if first_author:
         initial = ''
@@ -38,6 +104,7 @@ def get_cleaned_last_page(first_page: str, last_page: str):
         return preprocess_default(last_page)
 
 
+@_memoize()
 def get_cleaned_journal_title(journal_title: str):
     if journal_title:
         return preprocess_journal_title(journal_title)
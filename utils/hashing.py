@@ -0,0 +1,74 @@
+from hashlib import sha3_224
+
+
+class _KeyNode(object):
+    __slots__ = ('key', 'children', 'bases')
+
+    def __init__(self, key=None):
+        self.key = key
+        self.children = []
+        self.bases = []
+
+    def get_child(self, key):
+        for child in self.children:
+            if child.key == key:
+                return child
+
+        child = _KeyNode(key)
+        self.children.append(child)
+        return child
+
+
+class SchemaHasher(object):
+    """
+    Calcula, em uma unica passagem, os hashes SHA3_224 de uma citaçao para varias bases.
+
+    As listas de campos das bases sao organizadas em uma arvore de prefixos. O estado do hash de um prefixo comum
+    (por exemplo, os campos compartilhados pelas bases de artigos) e calculado uma unica vez e reaproveitado com
+    copy() por cada base que o estende. O hash de cada base e identico ao de sha3_224 sobre a concatenaçao dos pares
+    nome + valor de seus campos, e a base e descartada caso algum de seus campos esteja ausente ou vazio.
+    """
+
+    def __init__(self, bases_keys):
+        """
+        :param bases_keys: Dicionario composto pelos pares nome da base: lista ordenada de nomes de campos
+        """
+        self.bases_keys = dict(bases_keys)
+        self.root = _KeyNode()
+
+        for base, keys in self.bases_keys.items():
+            if not keys:
+                raise ValueError('Base sem campos: %s' % base)
+
+            node = self.root
+            for k in keys:
+                node = node.get_child(k)
+            node.bases.append(base)
+
+    def hash(self, cit_data):
+        """
+        :param cit_data: Dicionario de pares de nome de campo e valor de campo de citaçao
+        :return: Dicionario composto pelos pares nome da base: digest (bytes), apenas para as bases com todos os campos
+        """
+        digests = {}
+        self._visit(self.root, sha3_224(), cit_data, digests)
+        return digests
+
+    def _visit(self, node, state, cit_data, digests):
+        last = len(node.children) - 1
+        for i, child in enumerate(node.children):
+            value = cit_data.get(child.key)
+            if not value:
+                continue
+
+            # O ultimo filho pode continuar o estado do pai, que nao sera mais usado
+            child_state = state.copy() if i < last else state
+            child_state.update((child.key + value).encode())
+
+            if child.bases:
+                digest = child_state.digest()
+                for base in child.bases:
+                    digests[base] = digest
+
+            if child.children:
+                self._visit(child, child_state, cit_data, digests)
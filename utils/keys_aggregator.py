@@ -0,0 +1,104 @@
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+
+from itertools import groupby
+from operator import itemgetter
+
+
+# Ordem dos registros: base, hash, id completo de citaçao e id do documento citante
+_sort_key = itemgetter(1, 0, 2, 3)
+_group_key = itemgetter(1, 0)
+
+
+class KeysAggregator(object):
+    """
+    Agregador externo (baseado em ordenaçao) de registros de chaves de de-duplicaçao.
+
+    Os registros recebidos sao acumulados em memoria e, a cada run_size registros, ordenados e gravados em um
+    arquivo temporario (run). Ao final, os runs sao intercalados (k-way merge) e os registros de mesma base e hash
+    sao agrupados, de modo que cada documento de de-duplicaçao e produzido uma unica vez.
+    """
+
+    def __init__(self, run_size=500000, tmp_dir=None, block_size=10000):
+        """
+        :param run_size: Quantidade de registros mantidos em memoria antes de cada gravaçao em disco
+        :param tmp_dir: Diretorio no qual os runs sao gravados (padrao: diretorio temporario do sistema)
+        :param block_size: Quantidade de registros serializados por bloco nos arquivos de run
+        """
+        self.run_size = run_size
+        self.block_size = block_size
+        self.tmp_dir = tempfile.mkdtemp(prefix='dedup-keys-', dir=tmp_dir)
+        self.runs = []
+        self.total_records = 0
+        self._buffer = []
+
+    def write(self, records):
+        """
+        :param records: Iteravel de quintuplas (hash, base, id completo de citaçao, id do documento citante, campos da citaçao)
+        """
+        for r in records:
+            self._buffer.append(r)
+            if len(self._buffer) >= self.run_size:
+                self._spill()
+
+    def _spill(self):
+        self._buffer.sort(key=_sort_key)
+
+        path = os.path.join(self.tmp_dir, 'run-%05d.pickle' % len(self.runs))
+        with open(path, 'wb') as f:
+            for i in range(0, len(self._buffer), self.block_size):
+                pickle.dump(self._buffer[i:i + self.block_size], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.runs.append(path)
+        self.total_records += len(self._buffer)
+        self._buffer = []
+
+    @staticmethod
+    def _iter_run(path):
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    break
+                yield from block
+
+    def iter_records(self):
+        """
+        :return: Gerador de todos os registros recebidos, ordenados por base, hash, id de citaçao e documento citante
+        """
+        if self._buffer:
+            self._spill()
+
+        return heapq.merge(*[self._iter_run(r) for r in self.runs], key=_sort_key)
+
+    def iter_groups(self):
+        """
+        Agrupa os registros de mesma base e hash.
+
+        :return: Gerador de quintuplas (base, hash, ids completos de citaçoes, ids de documentos citantes, campos da citaçao),
+        com ids ordenados e sem repetiçao
+        """
+        for (base, cit_hash), records in groupby(self.iter_records(), key=_group_key):
+            cit_full_ids = []
+            citing_docs = set()
+            cit_keys = None
+
+            for r in records:
+                if not cit_full_ids or cit_full_ids[-1] != r[2]:
+                    cit_full_ids.append(r[2])
+                citing_docs.add(r[3])
+                cit_keys = r[4]
+
+            yield base, cit_hash, cit_full_ids, sorted(citing_docs), cit_keys
+
+    def close(self):
+        """
+        Remove os arquivos temporarios.
+        """
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        self.runs = []
+        self._buffer = []
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Cache de tamanho limitado com politica de descarte LRU (menos recentemente usado).
+    Mantem contadores de acertos (hits) e falhas (misses).
+    """
+
+    def __init__(self, maxsize=None):
+        """
+        :param maxsize: Quantidade maxima de itens mantidos em cache (None para ilimitado)
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        Obtem o valor associado a key, contabilizando acerto ou falha.
+
+        :param key: Chave a ser consultada
+        :param default: Valor retornado caso key nao esteja em cache
+        :return: Valor em cache ou default
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Armazena value em cache, descartando o item menos recentemente usado caso o limite seja excedido.
+
+        :param key: Chave do item
+        :param value: Valor do item
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Retorna as estatisticas de uso do cache.
+
+        :return: Dicionario com hits, misses, hit_rate, size e maxsize
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize}
@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Limites (em segundos) dos histogramas de latencia
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Limites dos histogramas de tamanho (por exemplo, quantidade de citaçoes de um grupo)
+SIZE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+class Metrics(object):
+    """
+    Registro de metricas de um processo: contadores (inteiros ou somas de segundos) e histogramas.
+    Pode ser usado por varias threads. Os workers de um Pool mantem registros proprios, cujos valores sao enviados ao
+    processo principal com snapshot(reset=True) e acumulados com merge.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        """
+        Registra um valor em um histograma.
+
+        :param name: Nome do histograma
+        :param value: Valor observado
+        :param buckets: Limites superiores das faixas, usados apenas na criaçao do histograma
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1),
+                                                     'sum': 0, 'count': 0, 'max': value}
+            self._add(histogram, value)
+
+    @staticmethod
+    def _add(histogram, value):
+        i = 0
+        for limit in histogram['buckets']:
+            if value <= limit:
+                break
+            i += 1
+        histogram['counts'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+        histogram['max'] = max(histogram['max'], value)
+
+    def time(self, name):
+        """
+        :return: Gerenciador de contexto que registra, no histograma name, a duraçao do bloco em segundos
+        """
+        return _Timer(self, name)
+
+    def snapshot(self, reset=False):
+        """
+        :param reset: Indica se as metricas devem ser zeradas (envio incremental dos workers)
+        :return: Copia das metricas, no formato {'counters': {...}, 'histograms': {...}}
+        """
+        with self.lock:
+            snapshot = {'counters': dict(self.counters),
+                        'histograms': {k: dict(h, buckets=list(h['buckets']), counts=list(h['counts'])) for k, h in self.histograms.items()}}
+            if reset:
+                self.counters = {}
+                self.histograms = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """
+        Acumula as metricas de um snapshot (por exemplo, de um worker).
+        """
+        with self.lock:
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+            for name, other in snapshot['histograms'].items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    self.histograms[name] = dict(other, buckets=list(other['buckets']), counts=list(other['counts']))
+                    continue
+
+                histogram['counts'] = [a + b for a, b in zip(histogram['counts'], other['counts'])]
+                histogram['sum'] += other['sum']
+                histogram['count'] += other['count']
+                histogram['max'] = max(histogram['max'], other['max'])
+
+
+class _Timer(object):
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+def get_derived_metrics(counters, elapsed):
+    """
+    Calcula as taxas por segundo dos contadores *_total e as taxas de acerto dos pares *_hits_total/*_misses_total.
+
+    :param counters: Contadores
+    :param elapsed: Tempo de execuçao, em segundos
+    :return: Dicionario composto pelos pares nome: valor
+    """
+    derived = {}
+    for name, value in counters.items():
+        if name.endswith('_total') and not name.endswith('_seconds_total') and elapsed:
+            derived[name[:-len('_total')] + '_per_second'] = value / elapsed
+
+        if name.endswith('_hits_total'):
+            prefix = name[:-len('_hits_total')]
+            total = value + counters.get(prefix + '_misses_total', 0)
+            derived[prefix + '_hit_rate'] = value / total if total else 0.0
+
+    return derived
+
+
+def format_prometheus(snapshot, prefix, gauges=None):
+    """
+    Formata as metricas no formato de texto do Prometheus.
+
+    :param snapshot: Metricas (ver Metrics.snapshot)
+    :param prefix: Prefixo dos nomes das metricas
+    :param gauges: Dicionario de valores instantaneos, como taxas de acerto (opcional)
+    :return: Texto
+    """
+    lines = []
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append('# TYPE %s_%s counter' % (prefix, name))
+        lines.append('%s_%s %s' % (prefix, name, repr(value)))
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append('# TYPE %s_%s gauge' % (prefix, name))
+        lines.append('%s_%s %s' % (prefix, name, repr(value)))
+
+    for name, histogram in sorted(snapshot['histograms'].items()):
+        lines.append('# TYPE %s_%s histogram' % (prefix, name))
+        cumulative = 0
+        for limit, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+            cumulative += count
+            lines.append('%s_%s_bucket{le="%s"} %d' % (prefix, name, limit, cumulative))
+        lines.append('%s_%s_sum %s' % (prefix, name, repr(histogram['sum'])))
+        lines.append('%s_%s_count %d' % (prefix, name, histogram['count']))
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsReporter(threading.Thread):
+    """
+    Publica as metricas de uma execuçao: a cada interval segundos (e ao final) acrescenta uma linha JSON ao arquivo de
+    metricas e, opcionalmente, serve a versao mais recente no formato de texto do Prometheus em localhost:port/metrics.
+    """
+
+    def __init__(self, metrics, pipeline, path=None, interval=10, port=None):
+        """
+        :param metrics: Registro de metricas (Metrics)
+        :param pipeline: Nome da etapa, incluido em cada linha e usado como prefixo no Prometheus
+        :param path: Arquivo JSON lines de metricas (opcional)
+        :param interval: Intervalo, em segundos, entre as linhas do arquivo
+        :param port: Porta local do endpoint Prometheus (opcional)
+        """
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.pipeline = pipeline
+        self.path = path
+        self.interval = interval
+        self.start_time = time.time()
+        self.stopped = threading.Event()
+
+        self.server = None
+        if port:
+            self.server = ThreadingHTTPServer(('127.0.0.1', port), _make_prometheus_handler(self))
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def report(self, final=False):
+        """
+        :param final: Indica se e a linha de encerramento da execuçao
+        :return: Linha de metricas (dicionario)
+        """
+        snapshot = self.metrics.snapshot()
+        elapsed = time.time() - self.start_time
+
+        line = {'time': datetime.now().isoformat(),
+                'pipeline': self.pipeline,
+                'elapsed_seconds': elapsed,
+                'final': final,
+                'counters': snapshot['counters'],
+                'derived': get_derived_metrics(snapshot['counters'], elapsed),
+                'histograms': snapshot['histograms']}
+
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(line) + '\n')
+
+        return line
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def close(self):
+        """
+        Encerra a publicaçao periodica e grava a linha final.
+        """
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        self.report(final=True)
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def _make_prometheus_handler(reporter):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            snapshot = reporter.metrics.snapshot()
+            elapsed = time.time() - reporter.start_time
+            gauges = {k: v for k, v in get_derived_metrics(snapshot['counters'], elapsed).items() if k.endswith('_hit_rate')}
+
+            data = format_prometheus(snapshot, reporter.pipeline, gauges).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
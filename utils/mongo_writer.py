@@ -0,0 +1,100 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import UpdateOne
+
+
+class DedupCollectionsWriter(object):
+    """
+    Escritor reutilizavel das coleçoes de de-duplicaçao.
+    Mantem um unico cliente Mongo (com pool de conexoes), envia bulk writes nao ordenados em lotes de batch_size
+    operaçoes e escreve as coleçoes das diferentes bases em paralelo. Registra a latencia de escrita por coleçao.
+    """
+
+    def __init__(self, client, db_name, prefix, batch_size=1000, ordered=False, max_workers=5, metrics=None):
+        """
+        :param client: Cliente Mongo
+        :param db_name: Nome da base Mongo das coleçoes de de-duplicaçao
+        :param prefix: Prefixo dos nomes das coleçoes de de-duplicaçao
+        :param batch_size: Quantidade de operaçoes por bulk write
+        :param ordered: Indica se os bulk writes devem ser ordenados
+        :param max_workers: Quantidade maxima de coleçoes escritas em paralelo
+        :param metrics: Registro (utils.metrics.Metrics) no qual cada bulk write e sua latencia sao registrados (opcional)
+        """
+        self.client = client
+        self.db_name = db_name
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.metrics = metrics
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _write_collection(self, base, mgdocs):
+        collection = self.client[self.db_name][self.prefix + base]
+
+        operations = []
+        for cit_hash, new_doc in mgdocs.items():
+            operations.append(UpdateOne(
+                filter={'_id': cit_hash},
+                update={
+                    '$set': {
+                        'cit_keys': new_doc['cit_keys'],
+                        'update_date': new_doc['update_date']
+                    },
+                    '$addToSet': {
+                        'cit_full_ids': {'$each': new_doc['cit_full_ids']},
+                        'citing_docs': {'$each': new_doc['citing_docs']},
+                    }
+                },
+                upsert=True
+            ))
+
+        start = time.time()
+        requests = 0
+        for i in range(0, len(operations), self.batch_size):
+            batch = operations[i:i + self.batch_size]
+            request_start = time.perf_counter()
+            collection.bulk_write(batch, ordered=self.ordered)
+            requests += 1
+
+            if self.metrics:
+                self.metrics.incr('mongo_write_requests_total')
+                self.metrics.incr('mongo_write_operations_total', len(batch))
+                self.metrics.observe('mongo_write_seconds', time.perf_counter() - request_start)
+        elapsed = time.time() - start
+
+        with self._lock:
+            stats = self._stats.setdefault(collection.name, {'operations': 0, 'flushes': 0, 'requests': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stats['operations'] += len(operations)
+            stats['flushes'] += 1
+            stats['requests'] += requests
+            stats['seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+
+    def write(self, mongo_data):
+        """
+        Escreve, em paralelo, os documentos de cada base.
+
+        :param mongo_data: Dicionario composto pelos pares base: documentos de de-duplicaçao (ver convert_to_mongodoc)
+        """
+        futures = [self.executor.submit(self._write_collection, base, mgdocs) for base, mgdocs in mongo_data.items() if mgdocs]
+
+        # Aguarda todas as escritas e propaga o primeiro erro, caso exista
+        for f in futures:
+            f.result()
+
+    def stats(self):
+        """
+        :return: Dicionario composto pelos pares nome da coleçao: operaçoes, escritas, bulk writes, tempo total e tempo
+        maximo por escrita
+        """
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+    def close(self):
+        self.executor.shutdown()
+        self.client.close()
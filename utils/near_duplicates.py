@@ -0,0 +1,142 @@
+import random
+
+from utils.union_find import UnionFind
+from zlib import crc32
+
+
+def get_shingles(text: str, size=4):
+    """
+    Obtem os shingles (substrings de size caracteres) de um texto.
+
+    :param text: Texto
+    :param size: Tamanho de cada shingle
+    :return: Conjunto de shingles (o proprio texto, caso seja menor do que size)
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: set, b: set):
+    """
+    :return: Indice de Jaccard entre dois conjuntos
+    """
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class MinHasher(object):
+    """
+    Calcula assinaturas MinHash de conjuntos de shingles. Cada uma das num_perm funçoes de hash e o CRC32 do shingle
+    combinado (XOR) com uma mascara aleatoria de 32 bits, o que evita a aritmetica de inteiros longos das
+    permutaçoes (a * x + b) mod p. A fraçao de posiçoes iguais entre duas assinaturas estima o indice de Jaccard.
+    """
+
+    def __init__(self, num_perm=40, seed=1):
+        """
+        :param num_perm: Quantidade de permutaçoes, ou seja, tamanho das assinaturas
+        :param seed: Semente das permutaçoes (assinaturas so sao comparaveis entre MinHashers de mesma semente)
+        """
+        r = random.Random(seed)
+        self.num_perm = num_perm
+        self.masks = [r.getrandbits(32) for _ in range(num_perm)]
+
+    def signature(self, shingles):
+        """
+        :param shingles: Conjunto de shingles
+        :return: Tupla de num_perm inteiros, ou None caso o conjunto seja vazio
+        """
+        if not shingles:
+            return None
+
+        hashes = [crc32(s.encode()) for s in shingles]
+        return tuple(min([h ^ m for h in hashes]) for m in self.masks)
+
+
+class NearDuplicateClusters(object):
+    """
+    Agrupa textos quase duplicados com blocking LSH (locality-sensitive hashing).
+
+    A assinatura MinHash de cada texto e dividida em bands faixas. Cada faixa indexa o texto em um bucket, e apenas os
+    textos que compartilham algum bucket sao comparados (indice de Jaccard entre os shingles, a verificaçao). Pares
+    com indice maior ou igual a threshold sao unidos em um UnionFind. Buckets com max_bucket_size textos nao recebem
+    novas comparaçoes, o que mantem a quantidade de comparaçoes linear na quantidade de textos.
+    """
+
+    def __init__(self, hasher: MinHasher, bands=10, threshold=0.8, shingle_size=4, max_bucket_size=50):
+        """
+        :param hasher: Calculador de assinaturas MinHash (num_perm deve ser multiplo de bands)
+        :param bands: Quantidade de faixas das assinaturas
+        :param threshold: Indice de Jaccard minimo para que dois textos sejam considerados quase duplicados
+        :param shingle_size: Tamanho dos shingles
+        :param max_bucket_size: Quantidade maxima de textos comparados por bucket
+        """
+        if hasher.num_perm % bands:
+            raise ValueError('A quantidade de permutaçoes (%d) deve ser multipla de bands (%d)' % (hasher.num_perm, bands))
+
+        self.hasher = hasher
+        self.bands = bands
+        self.rows = hasher.num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_bucket_size = max_bucket_size
+
+        self.union_find = UnionFind()
+        self.texts = []
+        self.buckets = {}
+        self.stats = {'texts': 0, 'comparisons': 0, 'matches': 0, 'full_buckets': 0}
+
+    def add(self, text):
+        """
+        Inclui um texto e o compara com os textos que compartilham algum de seus buckets.
+
+        :param text: Texto
+        :return: Indice do texto
+        """
+        index = self.union_find.add()
+        self.texts.append(text)
+        self.stats['texts'] += 1
+
+        shingles = get_shingles(text, self.shingle_size)
+        signature = self.hasher.signature(shingles)
+        if signature is None:
+            return index
+
+        find = self.union_find.find
+        compared = set()
+        for band in range(self.bands):
+            key = (band, signature[band * self.rows:(band + 1) * self.rows])
+
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = [index]
+                continue
+
+            if len(bucket) >= self.max_bucket_size:
+                self.stats['full_buckets'] += 1
+                continue
+
+            for other in bucket:
+                if other in compared or find(other) == find(index):
+                    continue
+                compared.add(other)
+
+                self.stats['comparisons'] += 1
+                if jaccard(shingles, get_shingles(self.texts[other], self.shingle_size)) >= self.threshold:
+                    self.union_find.union(index, other)
+                    self.stats['matches'] += 1
+
+            bucket.append(index)
+
+        return index
+
+    def components(self):
+        """
+        :return: Lista de componentes com mais de um texto, cada um uma lista de indices em ordem crescente
+        """
+        components = {}
+        for index in range(len(self.texts)):
+            components.setdefault(self.union_find.find(index), []).append(index)
+        return [c for c in components.values() if len(c) > 1]
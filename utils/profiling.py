@@ -0,0 +1,71 @@
+import cProfile
+import io
+import pstats
+
+
+def profile_call(function, *args):
+    """
+    Executa function sob o cProfile.
+
+    :return: Par (resultado de function, estatisticas do cProfile no formato de pstats.Stats.stats)
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = function(*args)
+    finally:
+        profiler.disable()
+
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+class _RawStats(object):
+    """
+    Adaptador que permite carregar em pstats.Stats as estatisticas recebidas de outro processo.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfileAggregator(object):
+    """
+    Acumula as estatisticas do cProfile de varios processos (por exemplo, dos workers de um Pool) em um unico relatorio.
+    """
+
+    def __init__(self):
+        self.stats = None
+        self.samples = 0
+
+    def add(self, stats):
+        """
+        :param stats: Estatisticas no formato de pstats.Stats.stats (ver profile_call)
+        """
+        if self.stats is None:
+            self.stats = pstats.Stats(_RawStats(stats))
+        else:
+            self.stats.add(_RawStats(stats))
+        self.samples += 1
+
+    def dump(self, path):
+        """
+        Grava as estatisticas acumuladas no formato do pstats (legivel por pstats, snakeviz etc.).
+        """
+        if self.stats is not None:
+            self.stats.dump_stats(path)
+
+    def report(self, sort='cumulative', limit=30):
+        """
+        :return: Texto com as limit funçoes de maior custo, ordenadas por sort
+        """
+        if self.stats is None:
+            return ''
+
+        stream = io.StringIO()
+        self.stats.stream = stream
+        self.stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
@@ -0,0 +1,175 @@
+from xylose import tools
+from xylose.scielodocument import html_decode
+
+
+def _decode(text):
+    """
+    Equivalente ao html_decode do xylose, evitando o custo do unescape e da remoçao de caracteres de controle
+    quando o texto nao contem entidades HTML nem caracteres nao imprimiveis.
+    """
+    if isinstance(text, str) and '&' not in text and text.isprintable():
+        return text
+    return html_decode(text)
+
+
+def _person_authors(data, field):
+    authors = []
+    for author in data.get(field, []):
+        author_dict = {}
+        if 's' in author:
+            author_dict['surname'] = _decode(author['s'])
+        if 'n' in author:
+            author_dict['given_names'] = _decode(author['n'])
+        if author_dict:
+            authors.append(author_dict)
+
+    if authors:
+        return authors
+
+
+def _get_publication_type(data):
+    if 'v30' in data:
+        return 'article'
+    if 'v53' in data:
+        return 'conference'
+    if 'v18' in data:
+        if 'v51' in data:
+            return 'thesis'
+        return 'book'
+    if 'v150' in data:
+        return 'patent'
+    if 'v37' in data:
+        return 'link'
+    return 'undefined'
+
+
+class RawCitation(object):
+    """
+    Citaçao lida diretamente dos campos ISIS (v*) do registro bruto.
+    Expoe, com a mesma semantica, apenas os atributos de xylose.scielodocument.Citation usados na extraçao das chaves
+    de de-duplicaçao, sem os avisos de deprecaçao e as listas intermediarias criadas a cada acesso.
+    """
+    __slots__ = ('data', 'publication_type')
+
+    def __init__(self, data):
+        self.data = data
+        self.publication_type = _get_publication_type(data)
+
+    def _first_decoded(self, field):
+        if field in self.data:
+            return _decode(self.data[field][0]['_'])
+
+    @property
+    def analytic_authors(self):
+        return _person_authors(self.data, 'v10')
+
+    @property
+    def monographic_authors(self):
+        return _person_authors(self.data, 'v16')
+
+    @property
+    def first_author(self):
+        authors = self.analytic_authors or self.monographic_authors
+        if authors:
+            return authors[0]
+
+    @property
+    def source(self):
+        if self.publication_type == 'article':
+            return self._first_decoded('v30')
+        if self.publication_type in ('book', 'conference'):
+            return self._first_decoded('v18')
+
+    @property
+    def chapter_title(self):
+        if self.publication_type == 'book':
+            return self._first_decoded('v12')
+
+    def title(self):
+        if self.publication_type in ('article', 'conference', 'link'):
+            return self._first_decoded('v12') or ''
+        if self.publication_type == 'thesis':
+            return self._first_decoded('v18') or ''
+        return ''
+
+    @property
+    def publication_date(self):
+        if 'v65' in self.data:
+            return tools.get_date(self.data['v65'][0]['_'])
+
+        date_field = {'thesis': 'v45', 'conference': 'v55'}.get(self.publication_type)
+        if date_field in self.data:
+            return tools.get_date(self.data[date_field][0]['_']) or None
+
+    @property
+    def start_page(self):
+        if 'v514' in self.data:
+            return _decode(self.data['v514'][0].get('f', None))
+
+        if 'v14' in self.data:
+            return _decode(self.data['v14'][0]['_'].split('-')[0])
+
+    @property
+    def volume(self):
+        if self.publication_type in ('article', 'book') and 'v31' in self.data:
+            return self.data['v31'][0]['_']
+
+    @property
+    def issue(self):
+        if self.publication_type == 'article' and 'v32' in self.data:
+            return self.data['v32'][0]['_']
+
+    @property
+    def publisher(self):
+        return self._first_decoded('v62')
+
+    @property
+    def publisher_address(self):
+        address = []
+        if 'v66' in self.data:
+            address.append(_decode(self.data['v66'][0]['_']))
+            if 'e' in self.data['v66'][0]:
+                address.append(_decode(self.data['v66'][0]['e']))
+
+        if 'v67' in self.data:
+            address.append(_decode(self.data['v67'][0]['_']))
+
+        if address:
+            return '; '.join(address)
+
+
+class RawArticle(object):
+    """
+    Documento citante lido diretamente do registro bruto.
+    Expoe apenas os atributos de xylose.scielodocument.Article usados na extraçao das chaves de de-duplicaçao.
+    As citaçoes sao construidas uma unica vez.
+    """
+    __slots__ = ('data', '_citations')
+
+    def __init__(self, data):
+        self.data = data
+        self._citations = None
+
+    @property
+    def publisher_id(self):
+        return self.data['article']['v880'][0]['_']
+
+    @property
+    def collection_acronym(self):
+        if 'collection' in self.data:
+            return self.data['collection']
+
+        for section in ('article', 'title'):
+            if 'v992' in self.data[section]:
+                value = self.data[section]['v992']
+                if isinstance(value, list):
+                    return value[0]['_']
+                return value
+
+    @property
+    def citations(self):
+        if self._citations is None:
+            self._citations = [RawCitation(c) for c in self.data.get('citations', [])]
+
+        if self._citations:
+            return self._citations
@@ -0,0 +1,225 @@
+import json
+import requests
+import SolrAPI
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from zlib import crc32
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Codificador e decodificador JSON (orjson, caso esteja instalado)
+if orjson:
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+else:
+    json_loads = json.loads
+
+    def json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class PooledSolr(SolrAPI.Solr):
+    """
+    Cliente Solr com as mesmas operaçoes de SolrAPI.Solr, que reutiliza conexoes HTTP (keep-alive) de um pool
+    compartilhado entre threads. As consultas sao enviadas via POST, o que permite consultas com muitos ids.
+    """
+
+    def __init__(self, url, timeout=5, pool_size=10, metrics=None):
+        """
+        :param url: Endereço do core Solr
+        :param timeout: Tempo maximo, em segundos, de cada requisiçao
+        :param pool_size: Quantidade maxima de conexoes mantidas abertas
+        :param metrics: Registro (utils.metrics.Metrics) no qual as latencias das requisiçoes sao registradas (opcional)
+        """
+        super().__init__(url, timeout)
+        self.metrics = metrics
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _record(self, name, start, size=0):
+        if self.metrics:
+            self.metrics.incr('solr_%s_requests_total' % name)
+            self.metrics.observe('solr_%s_seconds' % name, time.perf_counter() - start)
+            if size:
+                self.metrics.incr('solr_%s_bytes_total' % name, size)
+
+    def select(self, params, format='json'):
+        params['wt'] = format
+
+        start = time.perf_counter()
+        response = self.session.post(self.url + '/select', data=params, timeout=self.timeout)
+        response.raise_for_status()
+        self._record('select', start)
+
+        return response.text
+
+    def post_json(self, data, commit_within=None):
+        """
+        Envia um comando JSON (lista de documentos ou objeto de comandos, como delete) ao Solr.
+
+        :param data: Comando JSON serializado (bytes)
+        :param commit_within: Prazo, em milissegundos, para que o Solr efetive o comando (opcional)
+        :return: Resposta do Solr
+        """
+        params = {}
+        if commit_within:
+            params['commitWithin'] = commit_within
+
+        headers = {'Content-Type': 'application/json'}
+
+        start = time.perf_counter()
+        response = self.session.post(self.url + '/update', params=params, headers=headers, data=data, timeout=self.timeout)
+        response.raise_for_status()
+        self._record('update', start, len(data))
+
+        return response.text
+
+    def commit(self, waitsearcher=False, soft=False):
+        start = time.perf_counter()
+
+        if soft:
+            params = {'softCommit': 'true', 'waitSearcher': str(waitsearcher).lower()}
+            response = self.session.post(self.url + '/update', params=params, timeout=self.timeout)
+        else:
+            headers = {'Content-Type': 'text/xml; charset=utf-8'}
+            data = '<commit waitSearcher="' + str(waitsearcher).lower() + '"/>'
+            response = self.session.post(self.url + '/update', headers=headers, data=data, timeout=self.timeout)
+
+        self._record('commit', start)
+        response.raise_for_status()
+
+        return response.text
+
+    def close(self):
+        self.session.close()
+
+
+class UpdateDispatcher(object):
+    """
+    Envia atualizaçoes ao Solr em paralelo, sem que atualizaçoes de um mesmo documento concorram entre si.
+
+    Os documentos sao distribuidos em filas (lanes) pelo hash do id, e cada fila e atendida por uma unica thread, de
+    modo que as atualizaçoes de um documento sao aplicadas na ordem de envio. A quantidade de requisiçoes pendentes
+    (em envio ou aguardando a thread da fila) e limitada a duas por fila: quando uma fila esta cheia, o envio aguarda
+    mesmo que as demais filas estejam livres.
+    Os itens sao recebidos ja serializados em JSON (pares id, item serializado), e cada fila envia seus itens em uma
+    unica requisiçao.
+    """
+
+    def __init__(self, solr, lanes=1, commit_within=None):
+        """
+        :param solr: Cliente Solr (PooledSolr)
+        :param lanes: Quantidade de filas, ou seja, de requisiçoes de atualizaçao simultaneas
+        :param commit_within: Prazo, em milissegundos, para que o Solr efetive cada requisiçao (opcional)
+        """
+        self.solr = solr
+        self.lanes = lanes
+        self.commit_within = commit_within
+        self.executors = [ThreadPoolExecutor(max_workers=1) for _ in range(lanes)]
+        self.semaphores = [threading.BoundedSemaphore(2) for _ in range(lanes)]
+        self.futures = []
+
+    def _lane(self, doc_id):
+        return crc32(doc_id.encode()) % self.lanes
+
+    def _submit(self, lane, fn, *args, **kwargs):
+        semaphore = self.semaphores[lane]
+        semaphore.acquire()
+        future = self.executors[lane].submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda f: semaphore.release())
+        self.futures.append(future)
+
+        # Propaga erros das requisiçoes ja concluidas
+        if len(self.futures) > 4 * self.lanes:
+            done = [f for f in self.futures if f.done()]
+            self.futures = [f for f in self.futures if not f.done()]
+            for f in done:
+                f.result()
+
+    def _split(self, items):
+        lanes_items = [[] for _ in range(self.lanes)]
+        for doc_id, encoded in items:
+            lanes_items[self._lane(doc_id)].append(encoded)
+        return lanes_items
+
+    def update(self, items):
+        """
+        :param items: Lista de pares (id, documento ou atualizaçao atomica serializado em JSON)
+        """
+        for lane, encoded in enumerate(self._split(items)):
+            if encoded:
+                self._submit(lane, self.solr.post_json, b'[' + b','.join(encoded) + b']', self.commit_within)
+
+    def delete(self, items):
+        """
+        Remove documentos pela lista de ids (sem consulta).
+
+        :param items: Lista de pares (id, id serializado em JSON)
+        """
+        for lane, encoded in enumerate(self._split(items)):
+            if encoded:
+                self._submit(lane, self.solr.post_json, b'{"delete":[' + b','.join(encoded) + b']}', self.commit_within)
+
+    def wait(self):
+        """
+        Aguarda a conclusao das requisiçoes ja enviadas e propaga o primeiro erro, caso exista.
+        """
+        futures, self.futures = self.futures, []
+        for f in futures:
+            f.result()
+
+    def close(self):
+        """
+        Aguarda todas as requisiçoes pendentes e propaga o primeiro erro, caso exista.
+        """
+        for e in self.executors:
+            e.shutdown(wait=True)
+
+        self.wait()
+
+
+class SubmissionBuffer(object):
+    """
+    Acumula itens serializados em JSON e os entrega a flush_function sempre que max_items itens ou max_bytes bytes
+    sao atingidos.
+    """
+
+    def __init__(self, flush_function, max_items=1000, max_bytes=10 * 1024 * 1024):
+        """
+        :param flush_function: Funçao que recebe a lista de pares (id, item serializado) acumulados
+        :param max_items: Quantidade maxima de itens acumulados
+        :param max_bytes: Tamanho maximo, em bytes, dos itens acumulados
+        """
+        self.flush_function = flush_function
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.items = []
+        self.size = 0
+
+    def add(self, doc_id, item):
+        """
+        :param doc_id: Id do documento ao qual o item se refere
+        :param item: Item a ser serializado e enviado
+        """
+        encoded = json_dumps(item)
+        self.items.append((doc_id, encoded))
+        self.size += len(encoded)
+
+        if len(self.items) >= self.max_items or self.size >= self.max_bytes:
+            self.flush()
+
+    def flush(self):
+        if self.items:
+            self.flush_function(self.items)
+            self.items = []
+            self.size = 0
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import time
+
+from utils.lru_cache import LRUCache
+
+
+_MISSING = object()
+
+# Limite de parametros por consulta em versoes antigas do SQLite
+_SQLITE_MAX_VARIABLES = 900
+
+
+class StandardizedCitations(object):
+    """
+    Acesso em lote aos dados do padronizador de titulos de periodicos citados.
+    Os registros de varias citaçoes sao obtidos com uma unica consulta $in e, opcionalmente, mantidos em cache LRU.
+    """
+
+    def __init__(self, collection, cache_size=0):
+        """
+        :param collection: Coleçao Mongo do padronizador (None desativa a padronizaçao)
+        :param cache_size: Quantidade de registros mantidos em cache (0 desativa o cache)
+        """
+        self.collection = collection
+        self.enabled = collection is not None
+        self.cache = LRUCache(cache_size) if cache_size else None
+
+        # Quantidade de consultas efetivamente enviadas a origem dos dados (lotes nao resolvidos apenas pelo cache)
+        self.lookups = 0
+
+    def _find(self, cit_full_ids):
+        """
+        :param cit_full_ids: IDs completos das citaçoes
+        :return: Dicionario composto pelos pares id completo de citaçao: registro padronizado (status > 0)
+        """
+        found = {}
+        for record in self.collection.find({'_id': {'$in': cit_full_ids}, 'status': {'$gt': 0}}, {'official-journal-title': 1}):
+            found[record['_id']] = record
+        return found
+
+    def get_many(self, cit_full_ids):
+        """
+        Obtem os dados padronizados (status > 0) das citaçoes indicadas.
+
+        :param cit_full_ids: IDs completos das citaçoes
+        :return: Dicionario composto pelos pares id completo de citaçao: registro padronizado (apenas ids com registro)
+        """
+        standardized_data = {}
+        missing = []
+
+        if not self.enabled:
+            return standardized_data
+
+        for cit_full_id in set(cit_full_ids):
+            if self.cache is not None:
+                cached = self.cache.get(cit_full_id, _MISSING)
+                if cached is not _MISSING:
+                    if cached:
+                        standardized_data[cit_full_id] = cached
+                    continue
+            missing.append(cit_full_id)
+
+        if missing:
+            found = self._find(missing)
+            self.lookups += 1
+
+            for cit_full_id in missing:
+                record = found.get(cit_full_id)
+                if self.cache is not None:
+                    self.cache.put(cit_full_id, record)
+                if record:
+                    standardized_data[cit_full_id] = record
+
+        return standardized_data
+
+    def stats(self):
+        if self.cache is not None:
+            return self.cache.stats()
+        return {}
+
+
+def export_snapshot(collection, path, batch_size=10000):
+    """
+    Exporta os registros validos (status > 0) do padronizador para um indice SQLite local, somente leitura.
+    O arquivo e escrito em um caminho temporario e movido para path ao final. O momento da exportaçao e a quantidade
+    de registros sao gravados na tabela metadata (ver get_snapshot_age).
+
+    :param collection: Coleçao Mongo do padronizador
+    :param path: Caminho do arquivo SQLite
+    :param batch_size: Quantidade de registros inseridos por transaçao
+    :return: Quantidade de registros exportados
+    """
+    start = time.time()
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute('CREATE TABLE standardized (_id TEXT PRIMARY KEY, official_journal_title TEXT) WITHOUT ROWID')
+
+        total = 0
+        rows = []
+        for record in collection.find({'status': {'$gt': 0}}, {'official-journal-title': 1}).batch_size(batch_size):
+            rows.append((record['_id'], json.dumps(record.get('official-journal-title'))))
+            if len(rows) >= batch_size:
+                connection.executemany('INSERT OR REPLACE INTO standardized VALUES (?, ?)', rows)
+                connection.commit()
+                total += len(rows)
+                rows = []
+
+        if rows:
+            connection.executemany('INSERT OR REPLACE INTO standardized VALUES (?, ?)', rows)
+            connection.commit()
+            total += len(rows)
+
+        connection.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)')
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', [('exported_at', repr(start)), ('records', str(total))])
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, path)
+    return total
+
+
+def get_snapshot_age(path):
+    """
+    :param path: Caminho do arquivo SQLite gerado por export_snapshot
+    :return: Tempo, em segundos, desde o inicio da exportaçao do arquivo ou None, caso o arquivo nao exista ou nao
+    registre o momento da exportaçao
+    """
+    if not os.path.exists(path):
+        return None
+
+    connection = sqlite3.connect('file:%s?mode=ro' % path, uri=True)
+    try:
+        row = connection.execute("SELECT value FROM metadata WHERE key = 'exported_at'").fetchone()
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        connection.close()
+
+    if row:
+        return time.time() - float(row[0])
+
+
+class StandardizedCitationsSnapshot(StandardizedCitations):
+    """
+    Acesso em lote a um indice local (gerado por export_snapshot) dos dados do padronizador.
+    O arquivo e aberto como imutavel e mapeado em memoria, de modo que os processos que o consultam compartilham
+    as mesmas paginas do page cache do sistema operacional.
+    Cada processo deve criar sua propria instancia (conexoes SQLite nao devem ser herdadas via fork).
+    """
+
+    def __init__(self, path, cache_size=0, mmap_size=1 << 30):
+        """
+        :param path: Caminho do arquivo SQLite
+        :param cache_size: Quantidade de registros mantidos em cache (0 desativa o cache)
+        :param mmap_size: Quantidade maxima de bytes do arquivo mapeados em memoria
+        """
+        super().__init__(None, cache_size)
+        self.enabled = True
+        self.path = path
+        self.connection = sqlite3.connect('file:%s?mode=ro&immutable=1' % path, uri=True, check_same_thread=False)
+        self.connection.execute('PRAGMA mmap_size = %d' % mmap_size)
+
+    def _find(self, cit_full_ids):
+        found = {}
+        for i in range(0, len(cit_full_ids), _SQLITE_MAX_VARIABLES):
+            chunk = cit_full_ids[i:i + _SQLITE_MAX_VARIABLES]
+            query = 'SELECT _id, official_journal_title FROM standardized WHERE _id IN (%s)' % ','.join('?' * len(chunk))
+            for cit_full_id, titles in self.connection.execute(query, chunk):
+                found[cit_full_id] = {'_id': cit_full_id, 'official-journal-title': json.loads(titles)}
+        return found
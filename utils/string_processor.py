@@ -4,9 +4,63 @@ import unicodedata
 
 
 parenthesis_pattern = re.compile(r'[-a-zA-ZÀ-ÖØ-öø-ÿ|0-9]*\([-a-zA-ZÀ-ÖØ-öø-ÿ|\W|0-9]*\)[-a-zA-ZÀ-ÖØ-öø-ÿ|0-9]*', re.UNICODE)
+parenthesis_outer_run_pattern = re.compile(r'[-a-zA-ZÀ-ÖØ-öø-ÿ|0-9]*', re.UNICODE)
+parenthesis_inner_run_pattern = re.compile(r'[-a-zA-ZÀ-ÖØ-öø-ÿ|\W|0-9]*', re.UNICODE)
+parenthesis_outer_chars = frozenset(c for c in map(chr, range(256)) if parenthesis_outer_run_pattern.fullmatch(c))
 doi_pattern = re.compile(r'\d{2}\.\d+/.*$')
+double_spaces_pattern = re.compile(' {2,}')
 special_chars = ['@', '&']
 special_words = ['IMPRESSO', 'ONLINE', 'CDROM', 'PRINT', 'ELECTRONIC']
+special_words_pattern = re.compile('|'.join(special_words))
+
+# Separador usado pelas funçoes em lote; e mantido pela tabela de traduçao em lote
+BATCH_SEPARATOR = '\x00'
+
+
+class TranslationTable(dict):
+    """
+    Tabela de traduçao para str.translate construida sob demanda.
+    Cada caractere e convertido pela funçao convert apenas na primeira vez em que aparece.
+    """
+
+    def __init__(self, convert):
+        super().__init__()
+        self.convert = convert
+
+    def __missing__(self, ordinal):
+        value = self.convert(chr(ordinal))
+        self[ordinal] = value
+        return value
+
+
+def _alpha_num_space_char(character, include_special_chars=False):
+    if character.isalnum() or character.isspace() or (include_special_chars and character in special_chars):
+        return character
+    return ' '
+
+
+def _ascii_table(include_special_chars=False, keep=''):
+    """
+    Monta a tabela de bytes.translate equivalente a alpha_num_space para textos ASCII.
+    :param include_special_chars: booleano que indica se os caracteres especiais devem ou não ser mantidos
+    :param keep: caracteres que sao mantidos sem traduçao
+    :return: tabela de traduçao de 256 bytes
+    """
+    table = bytearray(range(256))
+    for i in range(128):
+        if chr(i) not in keep:
+            table[i] = ord(_alpha_num_space_char(chr(i), include_special_chars))
+    return bytes(table)
+
+
+invalid_chars_table = {i: None for i in list(range(32)) + [127]}
+invalid_chars_table[11] = ' '
+
+alpha_num_space_table = TranslationTable(_alpha_num_space_char)
+alpha_num_space_special_table = TranslationTable(lambda c: _alpha_num_space_char(c, include_special_chars=True))
+ascii_alpha_num_space_table = _ascii_table()
+ascii_alpha_num_space_special_table = _ascii_table(include_special_chars=True)
+ascii_alpha_num_space_batch_table = _ascii_table(keep=BATCH_SEPARATOR)
 
 
 def remove_invalid_chars(text):
@@ -15,13 +69,7 @@ def remove_invalid_chars(text):
     :param text: texto a ser tratada
     :return: texto com caracteres ASCII < 32 e = 127 removidos
     """
-    vchars = []
-    for t in text:
-        if ord(t) == 11:
-            vchars.append(' ')
-        elif ord(t) >= 32 and ord(t) != 127:
-            vchars.append(t)
-    return ''.join(vchars)
+    return text.translate(invalid_chars_table)
 
 
 def remove_accents(text):
@@ -30,6 +78,8 @@ def remove_accents(text):
     :param text: texto a ser tratado
     :return: texto sem caracteres acentuados
     """
+    if text.isascii():
+        return text
     return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
 
 
@@ -41,13 +91,13 @@ def alpha_num_space(text, include_special_chars=False):
     :param include_special_chars: booleano que indica se os caracteres especiais devem ou não ser mantidos
     :return: texto com apenas caracteres alpha e espaço mantidos (e especiais, caso solicitado)
     """
-    new_str = []
-    for character in text:
-        if character.isalnum() or character.isspace() or (include_special_chars and character in special_chars):
-            new_str.append(character)
-        else:
-            new_str.append(' ')
-    return ''.join(new_str)
+    if text.isascii():
+        table = ascii_alpha_num_space_special_table if include_special_chars else ascii_alpha_num_space_table
+        return text.encode('ASCII').translate(table).decode('ASCII')
+
+    if include_special_chars:
+        return text.translate(alpha_num_space_special_table)
+    return text.translate(alpha_num_space_table)
 
 
 def remove_double_spaces(text):
@@ -56,8 +106,27 @@ def remove_double_spaces(text):
     :param text: texto a ser tratado
     :return: texto sem espaços duplos
     """
-    while '  ' in text:
-        text = text.replace('  ', ' ')
+    if '  ' in text:
+        text = double_spaces_pattern.sub(' ', text)
+    return text.strip()
+
+
+def _clean(text, ascii_table):
+    """
+    Aplica, com uma unica traduçao de bytes, remoçao de acentos e manutençao de alpha e espaço e, em seguida,
+    remove espaços duplos. Equivale a remove_double_spaces(alpha_num_space(remove_accents(text))).
+    :param text: texto a ser tratado
+    :param ascii_table: tabela de traduçao de bytes (ver _ascii_table)
+    :return: texto tratado
+    """
+    if text.isascii():
+        data = text.encode('ASCII')
+    else:
+        data = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore')
+
+    text = data.translate(ascii_table).decode('ASCII')
+    if '  ' in text:
+        text = double_spaces_pattern.sub(' ', text)
     return text.strip()
 
 
@@ -71,7 +140,24 @@ def preprocess_default(text):
     :param text: string a ser tratada
     :return: string tratada
     """
-    return remove_double_spaces(alpha_num_space((remove_accents(text))))
+    return _clean(text, ascii_alpha_num_space_table)
+
+
+def preprocess_default_batch(texts):
+    """
+    Aplica preprocess_default a uma lista de strings.
+    As strings sao unidas por BATCH_SEPARATOR e tratadas com uma unica traduçao e uma unica remoçao de espaços duplos.
+    :param texts: lista de strings a serem tratadas
+    :return: lista de strings tratadas, na mesma ordem
+    """
+    if not texts:
+        return []
+
+    joined = BATCH_SEPARATOR.join(texts)
+    if joined.count(BATCH_SEPARATOR) != len(texts) - 1:
+        return [preprocess_default(t) for t in texts]
+
+    return [c.strip() for c in _clean(joined, ascii_alpha_num_space_batch_table).split(BATCH_SEPARATOR)]
 
 
 def preprocess_author_name(text):
@@ -84,7 +170,7 @@ def preprocess_author_name(text):
     :param text: nome do autor a ser tratado
     :return: nome tratado do autor
     """
-    return remove_double_spaces(alpha_num_space(remove_accents(text)))
+    return _clean(text, ascii_alpha_num_space_table)
 
 
 def preprocess_doi(text):
@@ -99,6 +185,60 @@ def preprocess_doi(text):
         return doi[0]
 
 
+def remove_parenthesis(text):
+    """
+    Remove de text os trechos que casam com parenthesis_pattern (parenteses, conteudo interno e palavras adjacentes).
+    Produz o mesmo resultado que remover, repetidamente, a primeira ocorrencia de parenthesis_pattern ate que nao
+    haja mais ocorrencias, mas percorre text uma unica vez, em tempo linear.
+    :param text: texto a ser tratado
+    :return: texto sem os trechos entre parenteses
+    """
+    if '(' not in text:
+        return text
+
+    pieces = []
+    last = 0
+    position = 0
+
+    while True:
+        opening = text.find('(', position)
+        if opening == -1:
+            break
+
+        # O conteudo interno se estende ate o ultimo ')' da sequencia de caracteres permitidos apos '('
+        inner_end = parenthesis_inner_run_pattern.match(text, opening + 1).end()
+        closing = text.rfind(')', opening + 1, inner_end)
+        if closing == -1:
+            # Nenhum '(' dessa sequencia pode ser fechado
+            position = inner_end
+            continue
+
+        start = opening
+        while start > last and text[start - 1] in parenthesis_outer_chars:
+            start -= 1
+        end = parenthesis_outer_run_pattern.match(text, closing + 1).end()
+
+        pieces.append(text[last:start])
+        last = position = end
+
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+
+def remove_special_words(text):
+    """
+    Remove de text as palavras especiais, na ordem de special_words.
+    :param text: texto a ser tratado
+    :return: texto sem palavras especiais
+    """
+    if special_words_pattern.search(text) is None:
+        return text
+
+    for sw in special_words:
+        text = text.replace(sw, '')
+    return text
+
+
 def preprocess_journal_title(text, use_remove_invalid_chars=False):
     """
     Procedimento para tratar título de periódico.
@@ -123,12 +263,8 @@ def preprocess_journal_title(text, use_remove_invalid_chars=False):
         text = remove_invalid_chars(text)
 
     # Remove parenteses e conteúdo interno
-    parenthesis_search = re.search(parenthesis_pattern, text)
-    while parenthesis_search is not None:
-        text = text[:parenthesis_search.start()] + text[parenthesis_search.end():]
-        parenthesis_search = re.search(parenthesis_pattern, text)
+    text = remove_parenthesis(text)
 
     # Remove palavras especiais
-    for sw in special_words:
-        text = text.replace(sw, '')
-    return remove_double_spaces(alpha_num_space(remove_accents(text), include_special_chars=True)).lower()
+    text = remove_special_words(text)
+    return _clean(text, ascii_alpha_num_space_special_table).lower()
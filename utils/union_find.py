@@ -0,0 +1,99 @@
+from array import array
+
+
+class UnionFind(object):
+    """
+    Union-find (conjuntos disjuntos) sobre indices inteiros, armazenado em arrays compactos.
+    Usa uniao por tamanho e compressao de caminho por halving.
+    """
+
+    def __init__(self):
+        self.parent = array('q')
+        self.size = array('q')
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self):
+        """
+        :return: Indice do novo elemento, que forma um conjunto unitario
+        """
+        index = len(self.parent)
+        self.parent.append(index)
+        self.size.append(1)
+        return index
+
+    def find(self, index):
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, a, b):
+        """
+        :return: Raiz do conjunto resultante
+        """
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return root_a
+
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+
+class KeyClusters(object):
+    """
+    Componentes conexos de chaves (por exemplo, ids completos de citaçoes) agrupadas por diferentes criterios.
+    Cada chave recebe um indice inteiro, e os grupos sao unidos em um UnionFind.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.keys = []
+        self.union_find = UnionFind()
+
+    def _index(self, key):
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.union_find.add()
+            self.indexes[key] = index
+            self.keys.append(key)
+        return index
+
+    def add_group(self, keys):
+        """
+        Une as chaves de um grupo (e os componentes dos quais elas ja fazem parte).
+
+        :param keys: Chaves do grupo
+        """
+        it = iter(keys)
+        first = next(it, None)
+        if first is None:
+            return
+
+        root = self._index(first)
+        for k in it:
+            root = self.union_find.union(root, self._index(k))
+
+    def get_root(self, key):
+        """
+        :return: Indice da raiz do componente da chave, ou None caso a chave nao pertença a nenhum grupo
+        """
+        index = self.indexes.get(key)
+        if index is not None:
+            return self.union_find.find(index)
+
+    def components(self):
+        """
+        :return: Dicionario composto pelos pares raiz: lista de chaves do componente (na ordem de inclusao)
+        """
+        components = {}
+        for index, key in enumerate(self.keys):
+            components.setdefault(self.union_find.find(index), []).append(key)
+        return components